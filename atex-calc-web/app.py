@@ -1,6 +1,12 @@
 from flask import Flask, render_template, request, jsonify, send_file
 import os
 import json
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+import zlib
 from datetime import datetime
 import sqlite3
 from werkzeug.utils import secure_filename
@@ -13,19 +19,72 @@ app = Flask(__name__, template_folder='app/templates', static_folder='app/static
 app.secret_key = 'your-secret-key-change-in-production'
 app.config['UPLOAD_FOLDER'] = os.path.join(BASE_DIR, 'uploads')
 app.config['DATABASE'] = os.path.join(BASE_DIR, 'database', 'atex_calculations.db')
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_UPLOAD_MB', '48')) * 1024 * 1024  # request body, possibly compressed
+app.config['DXF_MAX_BYTES'] = int(os.getenv('DXF_MAX_MB', '128')) * 1024 * 1024  # DXF size after decompression
+app.config['DXF_UPLOAD_MEMORY_BYTES'] = int(os.getenv('DXF_UPLOAD_MEMORY_MB', '4')) * 1024 * 1024  # larger uploads spool to disk
+app.config['DXF_REPAIR_INVALID'] = os.getenv('DXF_REPAIR_INVALID', '').strip().lower() in ('1', 'true', 'yes')
+app.config['JOB_DATABASE'] = os.getenv('JOB_DATABASE', os.path.join(BASE_DIR, 'database', 'jobs.db'))
+app.config['JOB_QUEUE_ENABLED'] = os.getenv('JOB_QUEUE_ENABLED', '1').strip().lower() in ('1', 'true', 'yes')
+app.config['JOB_FILES_FOLDER'] = os.path.join(app.config['UPLOAD_FOLDER'], 'jobs')
+app.config['CHUNKED_UPLOAD_FOLDER'] = os.path.join(app.config['UPLOAD_FOLDER'], 'chunked')
+app.config['BATCH_MAX_FILES'] = int(os.getenv('BATCH_MAX_FILES', '50'))
 
 # Ensure upload folder exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs(os.path.dirname(app.config['DATABASE']), exist_ok=True)
+os.makedirs(app.config['JOB_FILES_FOLDER'], exist_ok=True)
 
 # Import utilities
-from app.utils.dxf_processor import process_dxf_file
+from app.utils.dxf_pool import DxfProcessPool, DxfPoolBusy, DxfTaskError, DxfTaskLimitExceeded, process_upload
+from app.utils.layer_mapping import get_layer_resolver, list_layer_profiles, save_layer_profile
+from app.utils.dxf_cache import DxfResultCache, dxf_cache_key_from_digest, DEFAULT_CACHE_MAX_BYTES
+from app.utils.dxf_upload import CHUNK_SIZE, SpooledDxfUpload, UploadError, upload_encoding, dxf_filename
+from app.utils.dxf_batch import zip_dxf_entries, batch_job_result, combine_geometries
+from app.utils.chunked_upload import ChunkedUploadStore, ChunkOffsetMismatch, DEFAULT_SESSION_TTL
+from app.utils.job_queue import JobQueue, JobFailed, run_job, default_worker_id, DEFAULT_LEASE_SECONDS, DEFAULT_RESULT_TTL
 from app.utils.pdf_generator import generate_pdf_report
 from app.utils.calculations import calculate_atex_quantities
-from app.utils.geometry_plotter import generate_geometry_preview
-from app.utils.section_plotter import generate_section_plot
-from app.utils.homologation import generate_homologation_analysis
+from app.utils.section_plotter import generate_section_plot, compute_section_properties
+from app.utils.homologation import (
+    generate_homologation_analysis, generate_batch_homologation, homologation_cache_stats, HOMOLOGATION_MODES
+)
+from app.utils.caseton_catalog import get_caseton_catalog
+from app.utils.caseton_instances import caseton_totals
+from app.utils.area_engine import slab_areas
+
+# DXF parsing runs in separate, limited processes so a pathological file cannot stall or bloat web workers
+dxf_pool = DxfProcessPool(
+    size=int(os.getenv('DXF_POOL_SIZE', '2')),
+    max_tasks=int(os.getenv('DXF_POOL_MAX_TASKS', '50')),
+    timeout=float(os.getenv('DXF_TASK_TIMEOUT', '25')),
+    cpu_seconds=int(os.getenv('DXF_TASK_CPU_SECONDS', '20')),
+    memory_mb=int(os.getenv('DXF_WORKER_MEMORY_MB', '1024'))
+)
+# With the job queue on, uploads are parsed by worker.py and this pool stays cold
+if os.getenv('DXF_POOL_PREWARM', '1') == '1' and not app.config['JOB_QUEUE_ENABLED']:
+    dxf_pool.prewarm()
+
+dxf_result_cache = DxfResultCache(
+    os.path.join(app.config['UPLOAD_FOLDER'], 'dxf-cache'),
+    max_bytes=int(os.getenv('DXF_CACHE_MAX_BYTES', DEFAULT_CACHE_MAX_BYTES))
+)
+
+# DXF processing and PDF generation are queued here and run by worker.py processes
+job_queue = JobQueue(
+    app.config['JOB_DATABASE'],
+    lease_seconds=float(os.getenv('JOB_LEASE_SECONDS', DEFAULT_LEASE_SECONDS)),
+    result_ttl=float(os.getenv('JOB_RESULT_TTL', DEFAULT_RESULT_TTL))
+)
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '0.5'))
+
+# Resumable uploads for large plans, assembled on disk and shared by all web workers
+chunked_uploads = ChunkedUploadStore(
+    app.config['CHUNKED_UPLOAD_FOLDER'],
+    chunk_size=int(os.getenv('UPLOAD_CHUNK_MB', '2')) * 1024 * 1024,
+    max_bytes=app.config['DXF_MAX_BYTES'],
+    ttl=float(os.getenv('UPLOAD_SESSION_TTL', DEFAULT_SESSION_TTL))
+)
 
 
 def _get_plate_thickness_values_cm():
@@ -46,18 +105,32 @@ def _get_plate_thickness_values_cm():
     return [5, 6, 7, 7.5, 8, 9, 10, 11, 12]
 
 
+def _parse_hf_options_cm(slab_thicknesses):
+    """Convert slab thicknesses in meters to a sorted list of hf options in cm."""
+    if not isinstance(slab_thicknesses, list) or not slab_thicknesses:
+        return None
+    converted = []
+    for value in slab_thicknesses:
+        try:
+            converted.append(float(value) * 100.0)
+        except (TypeError, ValueError):
+            continue
+    return sorted(set(round(v, 3) for v in converted)) or None
+
+
+def _parse_optional_int(value):
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
 def _fetch_caseton(caseton_id=None, caseton_name=None):
     if not caseton_id and not caseton_name:
         return None
-    conn = sqlite3.connect(app.config['DATABASE'])
-    cursor = conn.cursor()
-    if caseton_id:
-        cursor.execute("SELECT * FROM casetones WHERE id = ?", (caseton_id,))
-    else:
-        cursor.execute("SELECT * FROM casetones WHERE name = ?", (caseton_name,))
-    row = cursor.fetchone()
-    conn.close()
-    return row
+    catalog = get_caseton_catalog(app.config['DATABASE'])
+    record = catalog.get(caseton_id) if caseton_id else catalog.find(caseton_name)
+    return record.row if record else None
 
 
 def _build_section_preview(caseton_row, slab_thickness_m):
@@ -140,18 +213,14 @@ def _build_geometry_analysis(geometry_data):
     if not geometry_data:
         return None
 
-    areas = geometry_data.get('areas', {})
-    area_total = float(areas.get('superficieTotal') or 0.0)
-    area_vacios = float((areas.get('superficieVacios') or {}).get('total') or 0.0)
-    area_macizos = float((areas.get('superficieMacizos') or {}).get('total') or 0.0)
-    casetones = geometry_data.get('casetones', [])
-    area_casetones = sum(float(c.get('area') or 0.0) for c in casetones)
-    area_vacios = min(max(area_vacios, 0.0), max(area_total, 0.0))
-    area_neta = max(area_total - area_vacios, 0.0)
-    area_macizos = min(max(area_macizos, 0.0), area_neta)
-    max_casetones_area = max(area_neta - area_macizos, 0.0)
-    area_casetones = min(area_casetones, max_casetones_area)
-    area_vigas = max(area_neta - area_macizos - area_casetones, 0.0)
+    areas = slab_areas(geometry_data)
+    caseton_count, _ = caseton_totals(geometry_data)
+    area_total = areas['bruta']
+    area_vacios = areas['vacios']
+    area_neta = areas['neta']
+    area_macizos = areas['macizos']
+    area_casetones = areas['casetones']
+    area_vigas = areas['vigas']
 
     def pct(value):
         return (value / area_neta * 100.0) if area_neta else 0.0
@@ -172,18 +241,97 @@ def _build_geometry_analysis(geometry_data):
             'vigas_pct': pct(area_vigas),
         },
         'counts': {
-            'casetones': len(casetones),
+            'casetones': caseton_count,
         }
     }
 
 
+def _queue_jobs(kind):
+    """Whether ``kind`` jobs go to the queue: it is enabled and a live worker.py serves them.
+
+    Deployments that never start a worker (passenger, ``python app.py``) run the work inline instead.
+    """
+    return app.config['JOB_QUEUE_ENABLED'] and job_queue.has_worker(kind)
+
+
+def _job_accepted(job_id):
+    return jsonify({
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': f'/api/jobs/{job_id}',
+        'result_url': f'/api/jobs/{job_id}/result',
+    }), 202
+
+
+def _pdf_download_name(project_data):
+    timestamp = datetime.now().strftime('%Y-%m-%d-%H-%M')
+    client_raw = project_data.get('cliente') or 'Sin especificar'
+    project_raw = project_data.get('nombre') or 'Sin nombre'
+    client = secure_filename('-'.join(str(client_raw).replace('_', ' ').strip().split())).replace('_', '-').strip('-')
+    project = secure_filename('-'.join(str(project_raw).replace('_', ' ').strip().split())).replace('_', '-').strip('-')
+    return f"{client}-{project}-{timestamp}.pdf"
+
+
+def _dxf_cache_key(upload, layer_resolver):
+    repair_invalid = app.config['DXF_REPAIR_INVALID']
+    mapping_version = f"{layer_resolver.version}:repair" if repair_invalid else layer_resolver.version
+    return dxf_cache_key_from_digest(upload.digest, mapping_version)
+
+
+def _enqueue_dxf_job(upload, filename, layer_profile, cache_key, batch=None):
+    """Queue a received DXF for worker.py; the worker reads the file, removed when the job expires."""
+    unique_filename = f"{uuid.uuid4()}_{secure_filename(dxf_filename(filename))}"
+    filepath = os.path.join(app.config['JOB_FILES_FOLDER'], unique_filename)
+    upload.save_to(filepath)
+    return job_queue.enqueue('dxf', {
+        'filepath': filepath,
+        'filename': dxf_filename(filename),
+        'layer_profile': layer_profile,
+        'repair_invalid': app.config['DXF_REPAIR_INVALID'],
+        'cache_key': cache_key,
+    }, max_attempts=JOB_MAX_ATTEMPTS, files=[filepath], batch=batch)
+
+
+def _process_dxf_upload(upload, layer_resolver, cache_key):
+    """Process a DXF in the process pool (its bytes, or the spooled file for large uploads); returns the JSON payload."""
+    result = dxf_pool.run(
+        process_upload, upload.source,
+        repair_invalid=app.config['DXF_REPAIR_INVALID'], layer_resolver=layer_resolver
+    )
+    return dxf_result_cache.put(cache_key, result)
+
+
+def _dispatch_dxf_upload(upload, filename, layer_profile, layer_resolver):
+    """Answer a received DXF upload from the cache, the job queue or the process pool."""
+    cache_key = _dxf_cache_key(upload, layer_resolver)
+    cached_payload = dxf_result_cache.get(cache_key)
+    if cached_payload is not None:
+        upload.discard()
+        response = app.response_class(cached_payload, mimetype='application/json')
+        response.headers['X-DXF-Cache'] = 'hit'
+        return response
+
+    if _queue_jobs('dxf'):
+        return _job_accepted(_enqueue_dxf_job(upload, filename, layer_profile, cache_key))
+
+    try:
+        payload = _process_dxf_upload(upload, layer_resolver, cache_key)
+        response = app.response_class(payload, mimetype='application/json')
+        response.headers['X-DXF-Cache'] = 'miss'
+        return response
+    except DxfPoolBusy as e:
+        return jsonify({'error': str(e)}), 503
+    except DxfTaskLimitExceeded as e:
+        return jsonify({'error': str(e)}), 422
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        upload.discard()
+
+
 def _fetch_default_caseton():
-    conn = sqlite3.connect(app.config['DATABASE'])
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM casetones ORDER BY id LIMIT 1")
-    row = cursor.fetchone()
-    conn.close()
-    return row
+    record = get_caseton_catalog(app.config['DATABASE']).first()
+    return record.row if record else None
 
 
 def _caseton_row_to_params(caseton_row, slab_thickness_m):
@@ -221,35 +369,338 @@ def calculator():
 
 @app.route('/api/upload-dxf', methods=['POST'])
 def upload_dxf():
-    """Process DXF file and extract geometry"""
-    if 'file' not in request.files:
-        return jsonify({'error': 'No file provided'}), 400
-    
-    file = request.files['file']
-    if file.filename == '':
+    """Process DXF file and extract geometry
+
+    Takes a multipart ``file`` field, or the file itself as the request body
+    with its name in ``X-Filename``. Gzip/zstd uploads (``Content-Encoding``
+    or a ``.dxf.gz``/``.dxf.zst`` name) are decompressed while reading.
+    """
+    if request.mimetype == 'multipart/form-data':
+        if 'file' not in request.files:
+            return jsonify({'error': 'No file provided'}), 400
+        file = request.files['file']
+        filename, stream, content_encoding = file.filename, file.stream, None
+    else:
+        # Raw body: read straight from the socket, no multipart spooling
+        filename = request.headers.get('X-Filename') or request.args.get('filename') or ''
+        stream, content_encoding = request.stream, request.headers.get('Content-Encoding')
+
+    if filename == '':
         return jsonify({'error': 'No file selected'}), 400
-    
-    if file and file.filename.lower().endswith('.dxf'):
-        filename = secure_filename(file.filename)
-        unique_filename = f"{uuid.uuid4()}_{filename}"
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-        file.save(filepath)
-        
+    try:
+        encoding = upload_encoding(filename, content_encoding)
+    except UploadError as e:
+        return jsonify({'error': str(e)}), 400
+    if not dxf_filename(filename).lower().endswith('.dxf'):
+        return jsonify({'error': 'Invalid file format'}), 400
+
+    layer_profile = request.values.get('layer_profile') or request.values.get('layerProfile')
+    layer_resolver = get_layer_resolver(app.config['DATABASE'], layer_profile)
+    if layer_resolver is None:
+        return jsonify({'error': f'Unknown layer mapping profile: {layer_profile}'}), 400
+
+    # Small files stay in memory; larger ones are spooled where their consumer reads them
+    spool_dir = app.config['JOB_FILES_FOLDER'] if app.config['JOB_QUEUE_ENABLED'] else app.config['UPLOAD_FOLDER']
+    try:
+        upload = SpooledDxfUpload.receive(
+            stream, spool_dir, encoding=encoding,
+            memory_threshold=app.config['DXF_UPLOAD_MEMORY_BYTES'],
+            max_bytes=app.config['DXF_MAX_BYTES']
+        )
+    except UploadError as e:
+        return jsonify({'error': str(e)}), 400
+    if upload.size == 0:
+        upload.discard()
+        return jsonify({'error': 'El archivo está vacío'}), 400
+
+    return _dispatch_dxf_upload(upload, filename, layer_profile, layer_resolver)
+
+def _upload_session_view(status):
+    return {key: status[key] for key in ('upload_id', 'filename', 'size', 'offset', 'chunk_size', 'complete')}
+
+@app.route('/api/uploads', methods=['POST'])
+def create_chunked_upload():
+    """Start a resumable DXF upload: {filename, size, sha256?, layer_profile?}"""
+    data = request.get_json() or {}
+    filename = str(data.get('filename') or '')
+    try:
+        size = int(data.get('size'))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'size es requerido'}), 400
+    try:
+        upload_encoding(filename)
+    except UploadError as e:
+        return jsonify({'error': str(e)}), 400
+    if not dxf_filename(filename).lower().endswith('.dxf'):
+        return jsonify({'error': 'Invalid file format'}), 400
+    layer_profile = data.get('layer_profile') or data.get('layerProfile')
+    if get_layer_resolver(app.config['DATABASE'], layer_profile) is None:
+        return jsonify({'error': f'Unknown layer mapping profile: {layer_profile}'}), 400
+    try:
+        status = chunked_uploads.create(filename, size, sha256=data.get('sha256'), layer_profile=layer_profile)
+    except UploadError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(_upload_session_view(status)), 201
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+def chunked_upload_status(upload_id):
+    """Offset reached by a resumable upload, to resume after a disconnect"""
+    try:
+        return jsonify(_upload_session_view(chunked_uploads.get(upload_id)))
+    except KeyError:
+        return jsonify({'error': 'Carga no encontrada o expirada'}), 404
+
+@app.route('/api/uploads/<upload_id>', methods=['PUT'])
+def put_upload_chunk(upload_id):
+    """Append the request body at ?offset= (optionally checked against X-Chunk-SHA256)"""
+    try:
+        offset = int(request.args.get('offset', request.headers.get('Upload-Offset', '')))
+    except ValueError:
+        return jsonify({'error': 'offset es requerido'}), 400
+    try:
+        status = chunked_uploads.write_chunk(
+            upload_id, offset, request.stream, sha256=request.headers.get('X-Chunk-SHA256')
+        )
+    except KeyError:
+        return jsonify({'error': 'Carga no encontrada o expirada'}), 404
+    except ChunkOffsetMismatch as e:
+        return jsonify({'error': str(e), 'offset': e.offset}), 409
+    except UploadError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(_upload_session_view(status))
+
+@app.route('/api/uploads/<upload_id>', methods=['DELETE'])
+def delete_chunked_upload(upload_id):
+    """Abandon a resumable upload"""
+    try:
+        chunked_uploads.discard(upload_id)
+    except KeyError:
+        return jsonify({'error': 'Carga no encontrada o expirada'}), 404
+    return '', 204
+
+@app.route('/api/uploads/<upload_id>/finalize', methods=['POST'])
+def finalize_chunked_upload(upload_id):
+    """Verify the assembled upload and process it like /api/upload-dxf"""
+    try:
+        status, part_path, digest = chunked_uploads.finalize(upload_id)
+    except KeyError:
+        return jsonify({'error': 'Carga no encontrada o expirada'}), 404
+    except UploadError as e:
+        return jsonify({'error': str(e)}), 400
+
+    filename = status['filename']
+    layer_profile = status.get('layer_profile')
+    layer_resolver = get_layer_resolver(app.config['DATABASE'], layer_profile)
+    if layer_resolver is None:
+        os.remove(part_path)
+        return jsonify({'error': f'Unknown layer mapping profile: {layer_profile}'}), 400
+
+    encoding = upload_encoding(filename)
+    if encoding is None:
+        # Already the plain DXF: hand the assembled file over as is
+        upload = SpooledDxfUpload.from_file(part_path, digest)
+    else:
+        spool_dir = app.config['JOB_FILES_FOLDER'] if app.config['JOB_QUEUE_ENABLED'] else app.config['UPLOAD_FOLDER']
         try:
-            # Process DXF file
-            result = process_dxf_file(filepath)
-            preview_data = generate_geometry_preview(result)
-            if preview_data:
-                result['preview'] = preview_data
-            return jsonify(result)
-        except Exception as e:
-            return jsonify({'error': str(e)}), 500
+            with open(part_path, 'rb') as fp:
+                upload = SpooledDxfUpload.receive(
+                    fp, spool_dir, encoding=encoding,
+                    memory_threshold=app.config['DXF_UPLOAD_MEMORY_BYTES'],
+                    max_bytes=app.config['DXF_MAX_BYTES']
+                )
+        except UploadError as e:
+            return jsonify({'error': str(e)}), 400
         finally:
-            # Clean up uploaded file
-            if os.path.exists(filepath):
-                os.remove(filepath)
-    
-    return jsonify({'error': 'Invalid file format'}), 400
+            os.remove(part_path)
+    return _dispatch_dxf_upload(upload, filename, layer_profile, layer_resolver)
+
+def _handle_batch_dxf_job(payload):
+    """Process a batch file's job in this process's pool (no worker.py is serving DXF jobs)."""
+    cached_payload = dxf_result_cache.get(payload['cache_key'])
+    if cached_payload is None:
+        layer_resolver = get_layer_resolver(app.config['DATABASE'], payload.get('layer_profile'))
+        if layer_resolver is None:
+            raise JobFailed(f"Unknown layer mapping profile: {payload.get('layer_profile')}")
+        try:
+            result = dxf_pool.run(
+                process_upload, payload['filepath'],
+                repair_invalid=payload.get('repair_invalid', False), layer_resolver=layer_resolver
+            )
+        except DxfPoolBusy:
+            raise
+        except DxfTaskError as e:
+            raise JobFailed(str(e))
+        cached_payload = dxf_result_cache.put(payload['cache_key'], result)
+    return batch_job_result(cached_payload)
+
+
+def _run_batch_inline(batch_id):
+    """Work through a batch's jobs on background threads, as worker.py would.
+
+    The request that uploaded the batch returns at once; the client polls
+    ``/api/dxf-batches/<id>``, answered from jobs.db by any web process.
+    """
+    handlers = {'dxf': _handle_batch_dxf_job}
+
+    def drain(worker_id):
+        while True:
+            try:
+                job = job_queue.claim(['dxf'], worker_id, batch=batch_id)
+                if job is not None:
+                    run_job(job_queue, handlers, job, worker_id)
+                    continue
+                # Jobs waiting out a retry backoff are still pending
+                if all(job['status'] in ('done', 'failed') for job in job_queue.batch_jobs(batch_id)):
+                    return
+            except sqlite3.Error as e:
+                app.logger.warning(f"Batch {batch_id}: job queue error: {str(e)}")
+            time.sleep(JOB_POLL_INTERVAL)
+
+    for slot in range(max(dxf_pool.size, 1)):
+        threading.Thread(
+            target=drain, args=(f'{default_worker_id()}:batch-{slot}',),
+            name=f'dxf-batch-{slot}', daemon=True
+        ).start()
+
+
+def _batch_status(batch_id, jobs):
+    """Status of a batch: every file's status and, once all finished, the combined geometry."""
+    files = []
+    for index, job in enumerate(jobs):
+        status = job['status'] if job['status'] in ('done', 'failed', 'running') else 'queued'
+        files.append({
+            'index': index,
+            'filename': job['payload'].get('filename'),
+            'status': status,
+            'job_id': job['id'],
+            'error': job['error'] if status == 'failed' else None,
+        })
+    body = {
+        'batch_id': batch_id,
+        'status': 'running',
+        'files': files,
+        'done': sum(1 for file in files if file['status'] == 'done'),
+        'failed': sum(1 for file in files if file['status'] == 'failed'),
+        'status_url': f'/api/dxf-batches/{batch_id}',
+    }
+    if body['done'] + body['failed'] < len(files):
+        return body
+
+    processed = []
+    for file in files:
+        if file['status'] != 'done':
+            continue
+        stored = job_queue.get(file['job_id'])
+        if stored is None:
+            file.update(status='failed', error='Resultado expirado')
+            continue
+        processed.append((file['filename'], json.loads(stored['result'])))
+    body.update(
+        status='done',
+        done=len(processed),
+        failed=len(files) - len(processed),
+        geometry=combine_geometries(processed) if processed else None,
+    )
+    return body
+
+
+@app.route('/api/dxf-batches', methods=['POST'])
+def upload_dxf_batch():
+    """Process a ZIP with a project's DXF files (typically one per floor) as one batch
+
+    The ZIP comes as a multipart ``file`` field or as the request body. Every
+    DXF inside becomes its own job, processed concurrently by the worker
+    processes (or by this process's DXF pool when no worker.py is running).
+    The response is 202 with the batch id and a ``status_url`` to poll; once
+    every file finished the status carries the combined geometry for
+    ``/api/calculate``.
+    """
+    if request.mimetype == 'multipart/form-data':
+        if 'file' not in request.files:
+            return jsonify({'error': 'No file provided'}), 400
+        file = request.files['file']
+        filename, stream = file.filename, file.stream
+    else:
+        filename = request.headers.get('X-Filename') or request.args.get('filename') or ''
+        stream = request.stream
+    if filename == '':
+        return jsonify({'error': 'No file selected'}), 400
+    if not filename.lower().endswith('.zip'):
+        return jsonify({'error': 'Invalid file format'}), 400
+
+    layer_profile = request.values.get('layer_profile') or request.values.get('layerProfile')
+    layer_resolver = get_layer_resolver(app.config['DATABASE'], layer_profile)
+    if layer_resolver is None:
+        return jsonify({'error': f'Unknown layer mapping profile: {layer_profile}'}), 400
+
+    # Batch files are always jobs, whether a worker or this process runs them
+    spool_dir = app.config['JOB_FILES_FOLDER']
+    # Reading a ZIP needs random access, so the archive itself always goes to disk
+    fd, zip_path = tempfile.mkstemp(dir=spool_dir, suffix='.zip')
+    uploads = []
+    try:
+        with os.fdopen(fd, 'wb') as fp:
+            shutil.copyfileobj(stream, fp, CHUNK_SIZE)
+        with zipfile.ZipFile(zip_path) as archive:
+            for info in zip_dxf_entries(archive, app.config['BATCH_MAX_FILES']):
+                try:
+                    with archive.open(info) as entry:
+                        upload = SpooledDxfUpload.receive(
+                            entry, spool_dir, encoding=upload_encoding(info.filename),
+                            memory_threshold=app.config['DXF_UPLOAD_MEMORY_BYTES'],
+                            max_bytes=app.config['DXF_MAX_BYTES']
+                        )
+                except (zipfile.BadZipFile, zlib.error, NotImplementedError, RuntimeError) as e:
+                    raise UploadError(f'No se pudo leer {info.filename} del ZIP: {str(e)}')
+                except UploadError as e:
+                    raise UploadError(f'{info.filename}: {str(e)}')
+                uploads.append((info.filename, upload))
+                if upload.size == 0:
+                    raise UploadError(f'{info.filename}: El archivo está vacío')
+    except (UploadError, zipfile.BadZipFile) as e:
+        for _, upload in uploads:
+            upload.discard()
+        message = str(e) if isinstance(e, UploadError) else 'El archivo no es un ZIP válido'
+        return jsonify({'error': message}), 400
+    except BaseException:
+        for _, upload in uploads:
+            upload.discard()
+        raise
+    finally:
+        os.remove(zip_path)
+
+    batch_id = uuid.uuid4().hex
+    for filename, upload in uploads:
+        # Files already in the result cache are answered from the cache
+        _enqueue_dxf_job(upload, filename, layer_profile, _dxf_cache_key(upload, layer_resolver), batch=batch_id)
+    if not _queue_jobs('dxf'):
+        _run_batch_inline(batch_id)
+    return jsonify(_batch_status(batch_id, job_queue.batch_jobs(batch_id))), 202
+
+@app.route('/api/dxf-batches/<batch_id>')
+def dxf_batch_status(batch_id):
+    """Status of a DXF batch, with the combined geometry once every file finished"""
+    jobs = job_queue.batch_jobs(batch_id)
+    if not jobs:
+        return jsonify({'error': 'Lote no encontrado o expirado'}), 404
+    return jsonify(_batch_status(batch_id, jobs))
+
+@app.route('/api/layer-profiles')
+def layer_profiles():
+    """Layer mapping profiles selectable on upload"""
+    return jsonify(list_layer_profiles(app.config['DATABASE']))
+
+@app.route('/api/layer-profiles/<name>', methods=['PUT'])
+def put_layer_profile(name):
+    """Create or replace a layer mapping profile; its regex patterns are checked before anything is stored"""
+    data = request.get_json(silent=True) or {}
+    rules = data.get('rules')
+    if not isinstance(rules, list):
+        return jsonify({'error': 'Debe enviar la lista de reglas (rules)'}), 400
+    try:
+        return jsonify(save_layer_profile(app.config['DATABASE'], name, rules, data.get('description')))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
 @app.route('/api/calculate', methods=['POST'])
 def calculate():
@@ -275,16 +726,11 @@ def calculate():
         if not atex_system and isinstance(data.get('atexOptions'), dict):
             atex_system = data['atexOptions'].get('system')
         slab_geometry = data.get('slabGeometry') or data.get('slab_geometry') or {}
+        homologation_mode = data.get('homologation_mode') or data.get('homologationMode') or 'full'
+        if homologation_mode not in HOMOLOGATION_MODES:
+            return jsonify({'error': f'Modo de homologación no soportado: {homologation_mode}'}), 400
 
-        hf_options_cm = None
-        if isinstance(slab_thicknesses, list) and slab_thicknesses:
-            converted = []
-            for value in slab_thicknesses:
-                try:
-                    converted.append(float(value) * 100.0)
-                except (TypeError, ValueError):
-                    continue
-            hf_options_cm = sorted(set(round(v, 3) for v in converted)) or None
+        hf_options_cm = _parse_hf_options_cm(slab_thicknesses)
 
         def _to_float(value):
             try:
@@ -361,7 +807,7 @@ def calculate():
                 except (TypeError, ValueError):
                     he_cm = 0.0
                 if he_cm > 0:
-                    maciza_section = generate_section_plot('maciza', 100.0, 0.0, 0.0, 0.0, 0.0, he_cm)
+                    maciza_section = compute_section_properties('maciza', 100.0, 0.0, 0.0, 0.0, 0.0, he_cm)
                     target_section_metrics = {
                         'bf_cm': 100.0,
                         'bs_cm': 0.0,
@@ -388,7 +834,7 @@ def calculate():
                     slab_height_cm = hv_cm + hf_cm
 
                 if all(v is not None for v in (bf_cm, bs_cm, bw_cm, hv_cm, hf_cm)):
-                    aligerada_section = generate_section_plot('aligerada', bf_cm, bs_cm, bw_cm, hv_cm, hf_cm, hv_cm + hf_cm)
+                    aligerada_section = compute_section_properties('aligerada', bf_cm, bs_cm, bw_cm, hv_cm, hf_cm, hv_cm + hf_cm)
                     target_section_metrics = {
                         'bf_cm': bf_cm,
                         'bs_cm': bs_cm,
@@ -443,6 +889,9 @@ def calculate():
             allowed_casetones=allowed_casetones,
             hf_options_cm=hf_options_cm,
             system=atex_system,
+            country=data.get('country'),
+            mode=homologation_mode,
+            top_k=_parse_optional_int(data.get('homologation_top_k') or data.get('homologationTopK')),
         )
         results.setdefault('homologation', homologation)
         if homologation.get('original_metrics'):
@@ -473,6 +922,7 @@ def calculate():
             'allowed_casetones_type': type(allowed_casetones).__name__ if allowed_casetones is not None else None,
             'allowed_casetones_count': len(allowed_casetones) if isinstance(allowed_casetones, list) else None,
             'allowed_casetones_sample': allowed_casetones[:10] if isinstance(allowed_casetones, list) else None,
+            'homologation_unresolved_casetones': homologation.get('unresolved_casetones') if isinstance(homologation, dict) else None,
             'homologation_options_count': len(homologation.get('options') or []) if isinstance(homologation, dict) else None,
             'homologation_recommended': (homologation.get('recommended') if isinstance(homologation, dict) else None),
         }
@@ -484,6 +934,79 @@ def calculate():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/homologation/options', methods=['POST'])
+def homologation_options():
+    """Page through homologation options for a known target value ratio"""
+    try:
+        data = request.get_json() or {}
+        try:
+            target_value_ratio = float(data.get('target_value_ratio'))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'target_value_ratio es requerido'}), 400
+
+        allowed_casetones = data.get('country_available_casetones')
+        if allowed_casetones is None:
+            allowed_casetones = data.get('countryAvailableCasetones')
+        if allowed_casetones is not None and not isinstance(allowed_casetones, list):
+            allowed_casetones = None
+
+        homologation = generate_homologation_analysis(
+            database_path=app.config['DATABASE'],
+            section_metrics={'value_ratio': target_value_ratio},
+            allowed_casetones=allowed_casetones,
+            hf_options_cm=_parse_hf_options_cm(data.get('slabThicknesses') or data.get('slab_thicknesses')),
+            system=data.get('atex_system') or data.get('atexSystem'),
+            country=data.get('country'),
+            mode=data.get('mode') or 'full',
+            top_k=_parse_optional_int(data.get('top_k')),
+            offset=_parse_optional_int(data.get('offset')) or 0,
+            limit=_parse_optional_int(data.get('limit')),
+        )
+        return jsonify({
+            'options': homologation['options'],
+            'total_options': homologation['total_options'],
+            'next_offset': homologation['next_offset'],
+            'recommended': homologation['recommended'],
+        })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/homologate/batch', methods=['POST'])
+def homologate_batch():
+    """Homologate several slab zones against the caseton catalog in one pass"""
+    try:
+        data = request.get_json() or {}
+        sections = data.get('sections') or data.get('zones')
+        if not isinstance(sections, list) or not sections:
+            return jsonify({'error': 'Debe enviar al menos una sección (sections)'}), 400
+
+        allowed_casetones = data.get('country_available_casetones')
+        if allowed_casetones is None:
+            allowed_casetones = data.get('countryAvailableCasetones')
+        if allowed_casetones is not None and not isinstance(allowed_casetones, list):
+            allowed_casetones = None
+
+        result = generate_batch_homologation(
+            database_path=app.config['DATABASE'],
+            sections=sections,
+            allowed_casetones=allowed_casetones,
+            hf_options_cm=_parse_hf_options_cm(data.get('slabThicknesses') or data.get('slab_thicknesses')),
+            system=data.get('atex_system') or data.get('atexSystem'),
+            country=data.get('country'),
+        )
+        return jsonify(result)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/homologation/cache-stats')
+def homologation_cache_stats_view():
+    """Hit/miss counters of this worker's homologation result cache"""
+    return jsonify(homologation_cache_stats())
+
 @app.route('/api/generate-pdf', methods=['POST'])
 def generate_pdf():
     """Generate PDF report"""
@@ -492,26 +1015,70 @@ def generate_pdf():
         
         # Get calculation results from request payload
         results = data.get('results', {})
-        
+        project_data = data.get('project_data', {}) or {}
+        download_name = _pdf_download_name(project_data)
+
+        if _queue_jobs('pdf'):
+            job_id = job_queue.enqueue('pdf', {
+                'results': results,
+                'project_data': project_data,
+                'download_name': download_name,
+            }, max_attempts=JOB_MAX_ATTEMPTS)
+            return _job_accepted(job_id)
+
         # Generate PDF
         pdf_path = generate_pdf_report(
             results=results,
-            project_data=data.get('project_data', {}),
+            project_data=project_data,
             output_dir=app.config['UPLOAD_FOLDER']
         )
 
-        project_data = data.get('project_data', {}) or {}
-        timestamp = datetime.now().strftime('%Y-%m-%d-%H-%M')
-        client_raw = project_data.get('cliente') or 'Sin especificar'
-        project_raw = project_data.get('nombre') or 'Sin nombre'
-        client = secure_filename('-'.join(str(client_raw).replace('_', ' ').strip().split())).replace('_', '-').strip('-')
-        project = secure_filename('-'.join(str(project_raw).replace('_', ' ').strip().split())).replace('_', '-').strip('-')
-        download_name = f"{client}-{project}-{timestamp}.pdf"
-
         return send_file(pdf_path, as_attachment=True, download_name=download_name)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/jobs/<job_id>')
+def job_status(job_id):
+    """Status of a queued DXF or PDF job"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Trabajo no encontrado o expirado'}), 404
+    response = {
+        'job_id': job['id'],
+        'kind': job['kind'],
+        'status': job['status'],
+        'attempts': job['attempts'],
+        'max_attempts': job['max_attempts'],
+        'error': job['error'],
+        'created_at': job['created_at'],
+        'updated_at': job['updated_at'],
+    }
+    if job['status'] == 'done':
+        response['result_url'] = f'/api/jobs/{job_id}/result'
+    return jsonify(response)
+
+@app.route('/api/jobs/<job_id>/result')
+def job_result(job_id):
+    """Result of a finished job: the DXF geometry JSON or the PDF file"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Trabajo no encontrado o expirado'}), 404
+    if job['status'] == 'failed':
+        return jsonify({'error': job['error'] or 'El trabajo falló', 'status': 'failed'}), 422
+    if job['status'] != 'done':
+        return jsonify({'status': job['status'], 'status_url': f'/api/jobs/{job_id}'}), 409
+    if job['kind'] == 'pdf':
+        result = json.loads(job['result'])
+        if not os.path.exists(result['file']):
+            return jsonify({'error': 'El archivo del informe ya no está disponible'}), 410
+        return send_file(result['file'], as_attachment=True, download_name=result['download_name'])
+    return app.response_class(job['result'], mimetype='application/json')
+
+@app.route('/api/jobs/stats')
+def job_stats():
+    """Number of jobs per status in the shared queue"""
+    return jsonify(job_queue.stats())
+
 @app.route('/api/countries')
 def get_countries():
     """Get list of available countries"""
@@ -546,26 +1113,8 @@ def get_countries():
 @app.route('/api/casetones')
 def get_casetones():
     """Get list of available casetones"""
-    conn = sqlite3.connect(app.config['DATABASE'])
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM casetones ORDER BY name")
-    casetones = [
-        {
-            'id': row[0],
-            'name': row[1],
-            'side1': row[2],
-            'side2': row[3],
-            'height': row[4],
-            'bw': row[5],
-            'bs': row[6],
-            'system': row[7],
-            'consumption': row[8],
-            'rental_price': row[9],
-        }
-        for row in cursor.fetchall()
-    ]
-    conn.close()
-    return jsonify(casetones)
+    catalog = get_caseton_catalog(app.config['DATABASE'])
+    return jsonify([record.to_dict() for record in catalog.records])
 
 @app.route('/api/save-calculation', methods=['POST'])
 def save_calculation():
@@ -0,0 +1,88 @@
+import math
+from typing import List, Sequence, Tuple
+
+# Largest distance between an arc and the chords replacing it: an absolute floor in drawing units, or this
+# fraction of the radius if larger. Plans come in m, cm or mm, so the relative part keeps a full circle at
+# 32 chords at most whatever the unit; small circles in metre drawings get fewer.
+DEFAULT_CHORD_TOLERANCE = 0.005
+RELATIVE_CHORD_TOLERANCE = 0.005
+# Below this |bulge| a polyline segment is straight
+MIN_BULGE = 1e-9
+MAX_ARC_SEGMENTS = 512
+
+
+def arc_segments(radius: float, sweep: float, tolerance: float = DEFAULT_CHORD_TOLERANCE) -> int:
+    """Chords needed so none is further than the chord tolerance from an arc of ``radius`` sweeping ``sweep`` radians.
+
+    The tolerance is ``tolerance`` or ``RELATIVE_CHORD_TOLERANCE * radius``,
+    whichever is larger.
+    """
+    if radius <= 0:
+        return MAX_ARC_SEGMENTS
+    tolerance = max(tolerance, RELATIVE_CHORD_TOLERANCE * radius)
+    max_step = 2 * math.acos(max(1.0 - tolerance / radius, -1.0))
+    return min(max(int(math.ceil(abs(sweep) / max_step)), 1), MAX_ARC_SEGMENTS)
+
+
+def circle_ring(cx: float, cy: float, radius: float,
+                tolerance: float = DEFAULT_CHORD_TOLERANCE) -> List[Tuple[float, float]]:
+    """Regular polygon for a circle whose area is exactly pi * r².
+
+    The vertex count follows the chord tolerance (at least 8) and the vertices
+    sit on a slightly larger radius so the polygon keeps the analytic area.
+    """
+    n = max(arc_segments(radius, 2 * math.pi, tolerance), 8)
+    step = 2 * math.pi / n
+    vertex_radius = radius * math.sqrt(step / math.sin(step))
+    return [(cx + vertex_radius * math.cos(i * step), cy + vertex_radius * math.sin(i * step)) for i in range(n)]
+
+
+def _arc_points(start: Tuple[float, float], end: Tuple[float, float], bulge: float,
+                tolerance: float) -> List[Tuple[float, float]]:
+    """Intermediate vertices of a bulged segment from ``start`` to ``end`` (endpoints excluded).
+
+    The sweep is ``4 * atan(bulge)``, counter-clockwise when positive. The
+    intermediate vertices are placed so the polygonal fan around the centre
+    has the sector's analytic area r² * sweep / 2.
+    """
+    dx, dy = end[0] - start[0], end[1] - start[1]
+    chord = math.hypot(dx, dy)
+    if chord == 0.0:
+        return []
+    sweep = 4 * math.atan(bulge)
+    half = abs(sweep) / 2
+    radius = chord / (2 * math.sin(half))
+    # Centre lies left of the chord for counter-clockwise arcs
+    offset = 0.5 / math.tan(sweep / 2)
+    cx = (start[0] + end[0]) / 2 - dy * offset
+    cy = (start[1] + end[1]) / 2 + dx * offset
+
+    n = max(arc_segments(radius, sweep, tolerance), 2)
+    step = abs(sweep) / n
+    ratio = abs(sweep) / math.sin(step)
+    # Fan area with inner vertices on radius R: sin(step)/2 * (2rR + (n-2)R²) = r² sweep / 2
+    vertex_radius = radius * ratio / 2 if n == 2 else radius * (math.sqrt(1 + (n - 2) * ratio) - 1) / (n - 2)
+
+    start_angle = math.atan2(start[1] - cy, start[0] - cx)
+    return [
+        (cx + vertex_radius * math.cos(start_angle + sweep * k / n),
+         cy + vertex_radius * math.sin(start_angle + sweep * k / n))
+        for k in range(1, n)
+    ]
+
+
+def bulge_ring(points: Sequence[Tuple[float, float]], bulges: Sequence[float],
+               tolerance: float = DEFAULT_CHORD_TOLERANCE) -> List[Tuple[float, float]]:
+    """Closed polyline with bulged (arc) segments as a ring of straight segments.
+
+    ``bulges[i]`` belongs to the segment from ``points[i]`` to the next vertex
+    (the last one closes back to the first). Straight segments add no vertices.
+    """
+    ring: List[Tuple[float, float]] = []
+    count = len(points)
+    for i in range(count):
+        start = points[i]
+        ring.append(start)
+        if abs(bulges[i]) > MIN_BULGE:
+            ring.extend(_arc_points(start, points[(i + 1) % count], bulges[i], tolerance))
+    return ring
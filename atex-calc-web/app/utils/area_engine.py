@@ -0,0 +1,93 @@
+from typing import Dict
+
+import numpy as np
+import shapely
+
+from app.utils.caseton_instances import caseton_totals
+
+SLAB_AREA_KEYS = ('bruta', 'vacios', 'neta', 'macizos', 'casetones', 'vigas')
+
+
+def _union(polygons: np.ndarray, disjoint: bool = False):
+    if len(polygons) == 0:
+        return None
+    if len(polygons) == 1:
+        return polygons[0]
+    # A coverage union only dissolves shared edges, far cheaper than the general overlay
+    return shapely.coverage_union_all(polygons) if disjoint else shapely.union_all(polygons)
+
+
+def _area_within(polygons: np.ndarray, region, disjoint: bool = False) -> float:
+    """Area of the union of ``polygons`` inside the prepared ``region``."""
+    union = _union(polygons, disjoint)
+    if union is None or shapely.is_empty(region):
+        return 0.0
+    if shapely.covers(region, polygons).all():
+        return float(shapely.area(union))
+    return float(shapely.area(shapely.intersection(union, region)))
+
+
+def exact_slab_areas(total: np.ndarray, vacios: np.ndarray, macizos: np.ndarray,
+                     casetones: np.ndarray, casetones_disjoint: bool = False) -> Dict[str, float]:
+    """Exact slab areas from the layer polygons, with overlaps counted once.
+
+    ``neta`` is superficieTotal minus the union of vacíos; macizos are measured
+    inside the net area and casetones inside what the macizos leave, so the
+    three parts never overlap and ``vigas`` (ribs) is the exact remainder.
+    ``casetones_disjoint`` allows a coverage union when the casetones are known
+    not to overlap (see ``caseton_validation``).
+    """
+    outline = _union(total)
+    if outline is None:
+        return {key: 0.0 for key in SLAB_AREA_KEYS}
+
+    voids = _union(vacios)
+    net = shapely.difference(outline, voids) if voids is not None else outline
+    shapely.prepare(net)
+    area_bruta = float(shapely.area(outline))
+    area_neta = float(shapely.area(net))
+
+    area_macizos = _area_within(macizos, net)
+    solids = _union(macizos)
+    panels = shapely.difference(net, solids) if solids is not None else net
+    shapely.prepare(panels)
+    area_casetones = _area_within(casetones, panels, casetones_disjoint)
+
+    return {
+        'bruta': area_bruta,
+        'vacios': max(area_bruta - area_neta, 0.0),
+        'neta': area_neta,
+        'macizos': area_macizos,
+        'casetones': area_casetones,
+        'vigas': max(area_neta - area_macizos - area_casetones, 0.0),
+    }
+
+
+def slab_areas(geometry_data: Dict) -> Dict[str, float]:
+    """Slab areas of a processed DXF, as used by quantities and the geometry analysis.
+
+    Uses the exact areas computed once during DXF processing (``areas.losa``);
+    results from before that existed fall back to subtracting layer totals,
+    which assumes the layers do not overlap.
+    """
+    areas = geometry_data.get('areas') or {}
+    exact = areas.get('losa')
+    if exact:
+        return {key: float(exact.get(key) or 0.0) for key in SLAB_AREA_KEYS}
+
+    area_total = float(areas.get('superficieTotal') or 0.0)
+    area_vacios = float((areas.get('superficieVacios') or {}).get('total') or 0.0)
+    area_macizos = float((areas.get('superficieMacizos') or {}).get('total') or 0.0)
+    _, area_casetones = caseton_totals(geometry_data)
+    area_vacios = min(max(area_vacios, 0.0), max(area_total, 0.0))
+    area_neta = max(area_total - area_vacios, 0.0)
+    area_macizos = min(max(area_macizos, 0.0), area_neta)
+    area_casetones = min(area_casetones, max(area_neta - area_macizos, 0.0))
+    return {
+        'bruta': area_total,
+        'vacios': area_vacios,
+        'neta': area_neta,
+        'macizos': area_macizos,
+        'casetones': area_casetones,
+        'vigas': max(area_neta - area_macizos - area_casetones, 0.0),
+    }
@@ -3,6 +3,9 @@ import os
 import sqlite3
 from datetime import datetime
 
+from app.utils.area_engine import slab_areas
+from app.utils.caseton_catalog import get_caseton_catalog
+
 
 def _parse_float(value, default=None):
     if value is None:
@@ -83,19 +86,14 @@ def calculate_atex_quantities(geometry_data, country='Colombia', slab_thickness=
     """, (country,))
     apu_items = cursor.fetchall()
     
-    # Calculate areas provided by the DXF
-    areas = geometry_data.get('areas', {})
-    area_total = float(areas.get('superficieTotal') or 0.0)
-    area_vacios = float((areas.get('superficieVacios') or {}).get('total') or 0.0)
-    area_macizos = float((areas.get('superficieMacizos') or {}).get('total') or 0.0)
-    area_casetones = sum(float(c.get('area') or 0.0) for c in geometry_data.get('casetones', []))
-
-    area_neta = max(area_total - area_vacios, 0.0)
-    # Caseton area cannot exceed the usable net area after subtracting macizos
-    max_casetones_area = max(area_neta - area_macizos, 0.0)
-    area_casetones = min(area_casetones, max_casetones_area)
-
-    area_vigas = max(area_neta - area_macizos - area_casetones, 0.0)
+    # Areas provided by the DXF (exact, overlaps counted once)
+    areas = slab_areas(geometry_data)
+    area_total = areas['bruta']
+    area_vacios = areas['vacios']
+    area_macizos = areas['macizos']
+    area_casetones = areas['casetones']
+    area_neta = areas['neta']
+    area_vigas = areas['vigas']
     
     # Calculate concrete volume
     # Base slab (5cm) + waffle portion
@@ -115,8 +113,8 @@ def calculate_atex_quantities(geometry_data, country='Colombia', slab_thickness=
     # Calculate formwork (casetones)
     caseton_height_m = None
     if selected_caseton:
-        cursor.execute("SELECT * FROM casetones WHERE id = ?", (selected_caseton,))
-        caseton_data = cursor.fetchone()
+        caseton_record = get_caseton_catalog(database_path).get(selected_caseton)
+        caseton_data = caseton_record.row if caseton_record else None
         if caseton_data:
             (
                 _,
@@ -0,0 +1,294 @@
+import re
+import sqlite3
+import threading
+import unicodedata
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+CASETON_COLUMNS = "id, name, side1, side2, height, bw, bs, system, consumption, rental_price"
+
+
+def _normalize_caseton_name(value: Optional[str]) -> str:
+    if not value:
+        return ''
+    normalized = str(value).strip().lower()
+    normalized = normalized.replace('á', 'a').replace('é', 'e').replace('í', 'i').replace('ó', 'o').replace('ú', 'u')
+    normalized = normalized.replace('atex', '')
+    normalized = normalized.replace('casetón', '').replace('caseton', '')
+    normalized = normalized.replace(' ', '')
+    normalized = normalized.replace('-', '')
+    return normalized
+
+
+_CASETON_NAME_PATTERN = re.compile(
+    r'^(?P<w>\d+(?:[\.,]\d+)?)(?P<suffix>[a-z]+)?x(?P<h>\d+(?:[\.,]\d+)?)$'
+)
+
+
+def _expand_caseton_keys(value: Optional[str]) -> List[str]:
+    normalized = _normalize_caseton_name(value)
+    if not normalized:
+        return []
+
+    keys = {normalized}
+    match = _CASETON_NAME_PATTERN.match(normalized)
+    if not match:
+        return list(keys)
+
+    raw_w = match.group('w')
+    raw_h = match.group('h')
+    suffix = match.group('suffix') or ''
+    try:
+        w = float(raw_w.replace(',', '.'))
+        h = float(raw_h.replace(',', '.'))
+    except ValueError:
+        return list(keys)
+
+    def _add_variant(w_value: float, h_value: float, suffix_value: str) -> None:
+        w_int = int(round(w_value))
+        h_int = int(round(h_value))
+        keys.add(_normalize_caseton_name(f"{w_int}{suffix_value}x{h_int}"))
+        keys.add(_normalize_caseton_name(f"{w_int}x{h_int}"))
+
+    _add_variant(w, h, suffix)
+
+    if w >= 200 and h >= 200:
+        _add_variant(w / 10.0, h / 10.0, suffix)
+
+    if w <= 200 and h <= 200:
+        _add_variant(w * 10.0, h * 10.0, suffix)
+
+    return list(keys)
+
+
+@lru_cache(maxsize=4096)
+def _alias_keys(value) -> FrozenSet[str]:
+    return frozenset(_expand_caseton_keys(value))
+
+
+def _system_key(value: Optional[str]) -> str:
+    return str(value or '').strip().lower()
+
+
+def _country_key(value: Optional[str]) -> str:
+    decomposed = unicodedata.normalize('NFKD', str(value or '').strip().lower())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+@dataclass(frozen=True)
+class CasetonRecord:
+    id: int
+    name: str
+    side1: float
+    side2: float
+    height: float
+    bw: float
+    bs: float
+    system: str
+    consumption: float
+    rental_price: float
+    row: tuple
+    normalized_name: str
+    match_keys: FrozenSet[str]
+
+    @property
+    def bf_cm(self) -> float:
+        return self.side1 if self.side1 else self.side2
+
+    def to_dict(self) -> Dict:
+        return {
+            'id': self.id,
+            'name': self.name,
+            'side1': self.side1,
+            'side2': self.side2,
+            'height': self.height,
+            'bw': self.bw,
+            'bs': self.bs,
+            'system': self.system,
+            'consumption': self.consumption,
+            'rental_price': self.rental_price,
+        }
+
+
+def _build_record(row: tuple) -> CasetonRecord:
+    caseton_id, name, side1, side2, height, bw, bs, system_label, consumption, rental_price = row
+    side1 = float(side1 or 0.0)
+    side2 = float(side2 or 0.0)
+    height = float(height or 0.0)
+
+    # Every key a client may use for this caseton: its name plus cm/mm size labels
+    match_keys = set(_expand_caseton_keys(name))
+    bf_cm = side1 if side1 else side2
+    if bf_cm > 0:
+        match_keys.update(_expand_caseton_keys(f"{int(round(bf_cm))}x{int(round(height))}"))
+        match_keys.update(_expand_caseton_keys(f"{int(round(bf_cm * 10.0))}x{int(round(height * 10.0))}"))
+
+    return CasetonRecord(
+        id=caseton_id,
+        name=name,
+        side1=side1,
+        side2=side2,
+        height=height,
+        bw=float(bw or 0.0),
+        bs=float(bs or 0.0),
+        system=system_label,
+        consumption=float(consumption or 0.0),
+        rental_price=float(rental_price or 0.0),
+        row=tuple(row),
+        normalized_name=_normalize_caseton_name(name),
+        match_keys=frozenset(match_keys),
+    )
+
+
+class CasetonCatalog:
+    """Immutable snapshot of the casetones table, ordered by name."""
+
+    def __init__(self, rows: List[tuple], version: int, country_rows: Iterable[Tuple[str, str]] = ()):
+        self.version = version
+        self.records: List[CasetonRecord] = [_build_record(row) for row in rows]
+        self._by_id: Dict[int, CasetonRecord] = {}
+        self._by_name: Dict[str, CasetonRecord] = {}
+        self._by_normalized_name: Dict[str, CasetonRecord] = {}
+        # Alias indexes built once per catalog version: normalized name / any accepted key -> ids
+        self._name_index: Dict[str, Set[int]] = {}
+        self._alias_index: Dict[str, Set[int]] = {}
+        self._system_ids: Dict[str, Set[int]] = {}
+        for record in self.records:
+            self._by_id[record.id] = record
+            self._by_name.setdefault(record.name, record)
+            self._by_normalized_name.setdefault(record.normalized_name, record)
+            self._name_index.setdefault(record.normalized_name, set()).add(record.id)
+            for key in record.match_keys:
+                self._alias_index.setdefault(key, set()).add(record.id)
+            self._system_ids.setdefault(_system_key(record.system), set()).add(record.id)
+        self._all_ids = frozenset(self._by_id)
+
+        # Country -> available caseton ids, used when the client only sends its country
+        country_ids: Dict[str, Set[int]] = {}
+        for country, caseton_name in country_rows:
+            record = self.find(caseton_name)
+            if record is not None:
+                country_ids.setdefault(_country_key(country), set()).add(record.id)
+        self._country_ids: Dict[str, FrozenSet[int]] = {
+            country: frozenset(ids) for country, ids in country_ids.items()
+        }
+
+    def get(self, caseton_id) -> Optional[CasetonRecord]:
+        try:
+            return self._by_id.get(int(caseton_id))
+        except (TypeError, ValueError):
+            return None
+
+    def find(self, name: Optional[str]) -> Optional[CasetonRecord]:
+        """Look up by exact name, then by normalized name."""
+        if not name:
+            return None
+        return self._by_name.get(name) or self._by_normalized_name.get(_normalize_caseton_name(name))
+
+    def ids_for_system(self, system: Optional[str] = None) -> FrozenSet[int]:
+        if system is None:
+            return self._all_ids
+        return frozenset(self._system_ids.get(_system_key(system), ()))
+
+    def country_ids(self, country: Optional[str], system: Optional[str] = None) -> Optional[FrozenSet[int]]:
+        """Return the casetones available by default in a country, or None when it has no availability data."""
+        ids = self._country_ids.get(_country_key(country))
+        if ids is None:
+            return None
+        return ids & self.ids_for_system(system)
+
+    def resolve_aliases(self, names: Iterable, system: Optional[str] = None) -> Tuple[Set[int], List[str]]:
+        """Map client caseton names to catalog ids.
+
+        When any name matches a caseton name exactly (after normalization) only
+        exact name matches count; otherwise cm/mm, 'U' suffix and accent
+        variants are accepted. Returns the matched ids and the names that
+        matched nothing.
+        """
+        system_ids = self.ids_for_system(system)
+        normalized = {name: _normalize_caseton_name(name) for name in names if name}
+        strict = any(
+            not system_ids.isdisjoint(self._name_index.get(key, ()))
+            for key in normalized.values()
+        )
+
+        allowed_ids: Set[int] = set()
+        unresolved: List[str] = []
+        for name, key in normalized.items():
+            if strict:
+                ids = system_ids.intersection(self._name_index.get(key, ()))
+            else:
+                ids = set()
+                for alias in _alias_keys(name):
+                    ids.update(self._alias_index.get(alias, ()))
+                ids &= system_ids
+            if ids:
+                allowed_ids |= ids
+            else:
+                unresolved.append(name)
+        return allowed_ids, unresolved
+
+    def first(self) -> Optional[CasetonRecord]:
+        """Return the caseton with the lowest id."""
+        return self._by_id[min(self._by_id)] if self._by_id else None
+
+
+def ensure_catalog_version(conn: sqlite3.Connection) -> None:
+    """Create the catalog_version row and the triggers that bump it on every catalog change."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS catalog_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    """)
+    conn.execute("INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, 0)")
+    tables = ['casetones']
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'country_casetones'").fetchone():
+        tables.append('country_casetones')
+    for table in tables:
+        prefix = 'catalog_version' if table == 'casetones' else f'{table}_version'
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {prefix}_on_{event.lower()} AFTER {event} ON {table}
+                BEGIN
+                    UPDATE catalog_version SET version = version + 1 WHERE id = 1;
+                END
+            """)
+
+
+def _read_catalog_version(conn: sqlite3.Connection) -> int:
+    try:
+        row = conn.execute("SELECT version FROM catalog_version WHERE id = 1").fetchone()
+    except sqlite3.OperationalError:
+        # Databases created before the version row existed
+        ensure_catalog_version(conn)
+        conn.commit()
+        row = conn.execute("SELECT version FROM catalog_version WHERE id = 1").fetchone()
+    return row[0] if row else 0
+
+
+_catalogs: Dict[str, CasetonCatalog] = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_caseton_catalog(database_path: str) -> CasetonCatalog:
+    """Return the process-wide catalog snapshot, reloading it when the version row changes."""
+    conn = sqlite3.connect(database_path)
+    try:
+        version = _read_catalog_version(conn)
+        cached = _catalogs.get(database_path)
+        if cached is not None and cached.version == version:
+            return cached
+        rows = conn.execute(f"SELECT {CASETON_COLUMNS} FROM casetones ORDER BY name").fetchall()
+        try:
+            country_rows = conn.execute("SELECT country, caseton_name FROM country_casetones").fetchall()
+        except sqlite3.OperationalError:
+            country_rows = []
+    finally:
+        conn.close()
+
+    catalog = CasetonCatalog(rows, version, country_rows)
+    with _catalogs_lock:
+        _catalogs[database_path] = catalog
+    return catalog
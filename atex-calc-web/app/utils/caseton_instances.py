@@ -0,0 +1,246 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import shapely
+
+# Coordinates closer than this fraction of the typical caseton's bounding-box diagonal are treated as equal,
+# so matching works the same for plans drawn in metres or millimetres
+INSTANCE_RELATIVE_TOLERANCE = 1e-5
+MIN_INSTANCE_TOLERANCE = 1e-9
+
+
+def _constant_step_runs(values: np.ndarray, tolerance: float) -> List[Tuple[float, float, int]]:
+    """Split sorted values into runs of constant step: ``(start, step, count)``."""
+    runs = []
+    start, step, count = values[0], 0.0, 1
+    last = values[0]
+    for value in values[1:]:
+        if count == 1:
+            step, count = value - start, 2
+        elif abs(value - last - step) <= tolerance:
+            count += 1
+        else:
+            runs.append((start, step, count))
+            start, step, count = value, 0.0, 1
+        last = value
+    runs.append((start, step, count))
+    return runs
+
+
+def _grid_groups(prototype: int, translations: np.ndarray, tolerance: float) -> List[Dict]:
+    """Cover a prototype's translations with regular grids (origin, pitch, count) plus loose points."""
+    quantized_y = np.round(translations[:, 1] / tolerance)
+    order = np.lexsort((translations[:, 0], quantized_y))
+    translations = translations[order]
+    row_starts = np.flatnonzero(np.diff(quantized_y[order])) + 1
+
+    # Equally spaced runs along each row, keyed by (x origin, x pitch, count)
+    columns: Dict[Tuple, List[float]] = {}
+    for row in np.split(translations, row_starts):
+        y = float(row[0, 1])
+        for x0, px, nx in _constant_step_runs(row[:, 0], tolerance):
+            key = (round(x0 / tolerance), round(px / tolerance) if nx > 1 else 0, nx)
+            columns.setdefault(key, []).append((float(x0), float(px), y))
+
+    groups = []
+    loose = []
+    for (_, _, nx), entries in columns.items():
+        x0, px = entries[0][0], entries[0][1]
+        ys = np.array([y for _, _, y in entries])
+        for y0, py, ny in _constant_step_runs(ys, tolerance):
+            if nx * ny == 1:
+                loose.append([x0, float(y0)])
+            else:
+                groups.append({
+                    "prototipo": prototype,
+                    "origen": [x0, float(y0)],
+                    "paso": [px if nx > 1 else 0.0, float(py) if ny > 1 else 0.0],
+                    "conteo": [nx, ny],
+                })
+    if loose:
+        groups.append({"prototipo": prototype, "traslaciones": loose})
+    return groups
+
+
+def instance_tolerance(polygons: np.ndarray) -> float:
+    """Matching tolerance for a set of casetones: a fraction of their median bounding-box diagonal."""
+    if len(polygons) == 0:
+        return MIN_INSTANCE_TOLERANCE
+    bounds = shapely.bounds(polygons)
+    diagonal = float(np.median(np.hypot(bounds[:, 2] - bounds[:, 0], bounds[:, 3] - bounds[:, 1])))
+    return max(diagonal * INSTANCE_RELATIVE_TOLERANCE, MIN_INSTANCE_TOLERANCE)
+
+
+def _canonical_holes(polygon, anchor: np.ndarray, tolerance: float) -> Tuple[tuple, List[List[List[float]]]]:
+    """Interior rings relative to ``anchor``: a hashable key and the closed rings, in canonical order."""
+    holes = []
+    for k in range(shapely.get_num_interior_rings(polygon)):
+        ring = shapely.get_coordinates(shapely.get_interior_ring(polygon, k))[:-1] - anchor
+        x, y = ring[:, 0], ring[:, 1]
+        if (x * np.roll(y, -1) - np.roll(x, -1) * y).sum() > 0:
+            ring = ring[::-1]
+        quantized = np.round(ring / tolerance).astype(np.int64)
+        first = np.lexsort((quantized[:, 1], quantized[:, 0]))[0]
+        ring, quantized = np.roll(ring, -first, axis=0), np.roll(quantized, -first, axis=0)
+        holes.append((tuple(quantized.ravel().tolist()), np.vstack([ring, ring[:1]]).tolist()))
+    holes.sort(key=lambda hole: hole[0])
+    return tuple(key for key, _ in holes), [ring for _, ring in holes]
+
+
+def build_caseton_instances(polygons: np.ndarray, tolerance: Optional[float] = None) -> Dict:
+    """Describe casetones as prototype shapes plus placements.
+
+    Polygons that are equal up to translation (same vertices, in any start
+    vertex or orientation, and the same holes) share one prototype, stored
+    relative to its bounding-box minimum; holes go in ``"huecos"``.
+    Placements of each prototype are emitted as regular grids
+    ``{"origen", "paso", "conteo"}`` where possible and as a
+    ``"traslaciones"`` list otherwise. ``tolerance`` defaults to
+    ``instance_tolerance(polygons)``.
+    """
+    if tolerance is None:
+        tolerance = instance_tolerance(polygons)
+    empty = {"tolerancia": tolerance, "prototipos": [], "grupos": [], "cantidad": 0, "area_total": 0.0}
+    if len(polygons) == 0:
+        return empty
+
+    coords, index = shapely.get_coordinates(shapely.get_exterior_ring(polygons), return_index=True)
+    counts = np.bincount(index, minlength=len(polygons))
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    areas = shapely.area(polygons)
+    # Casetones with holes are rare; their interiors are canonicalized one by one
+    holed = np.flatnonzero(shapely.get_num_interior_rings(polygons) > 0)
+    anchors_all = shapely.bounds(polygons)[:, :2]
+    holes = {index: _canonical_holes(polygons[index], anchors_all[index], tolerance) for index in holed.tolist()}
+    no_holes = ((), [])
+
+    prototypes: List[Dict] = []
+    groups: List[Dict] = []
+    # Rings with the same vertex count are canonicalized together: (k, n, 2) arrays
+    for n_closed in np.unique(counts):
+        members = np.flatnonzero(counts == n_closed)
+        n = int(n_closed) - 1
+        rings = coords[starts[members][:, None] + np.arange(n)]
+        anchors = rings.min(axis=1)
+        relative = rings - anchors[:, None, :]
+
+        # Counter-clockwise, starting at the lowest-left vertex
+        x, y = relative[:, :, 0], relative[:, :, 1]
+        signed_area = (x * np.roll(y, -1, axis=1) - np.roll(x, -1, axis=1) * y).sum(axis=1)
+        clockwise = signed_area < 0
+        relative[clockwise] = relative[clockwise, ::-1]
+        quantized = np.round(relative / tolerance).astype(np.int64)
+        first = np.lexsort((quantized[:, :, 1], quantized[:, :, 0]), axis=-1)[:, 0]
+        roll = (first[:, None] + np.arange(n)) % n
+        relative = np.take_along_axis(relative, roll[:, :, None], axis=1)
+        quantized = np.take_along_axis(quantized, roll[:, :, None], axis=1)
+
+        _, first_member, shape_of = np.unique(
+            quantized.reshape(len(members), -1), axis=0, return_index=True, return_inverse=True
+        )
+        shape_of = shape_of.reshape(-1)
+        for shape in range(len(first_member)):
+            same_exterior = np.flatnonzero(shape_of == shape)
+            by_holes: Dict[tuple, List[int]] = {}
+            for position in same_exterior.tolist():
+                by_holes.setdefault(holes.get(int(members[position]), no_holes)[0], []).append(position)
+            for positions in by_holes.values():
+                representative = positions[0]
+                prototype = len(prototypes)
+                ring = relative[representative]
+                entry = {
+                    "id": prototype,
+                    "coordenadas": np.vstack([ring, ring[:1]]).tolist(),
+                    "area": float(areas[members[representative]]),
+                    "distX": float(ring[:, 0].max()),
+                    "distY": float(ring[:, 1].max()),
+                }
+                interiors = holes.get(int(members[representative]), no_holes)[1]
+                if interiors:
+                    entry["huecos"] = interiors
+                prototypes.append(entry)
+                groups.extend(_grid_groups(prototype, anchors[positions], tolerance))
+
+    quantity = len(polygons)
+    return {
+        "tolerancia": tolerance,
+        "prototipos": prototypes,
+        "grupos": groups,
+        "cantidad": quantity,
+        "area_total": float(sum(prototype_area * count for prototype_area, count in _prototype_counts(prototypes, groups))),
+    }
+
+
+def _group_size(group: Dict) -> int:
+    if "traslaciones" in group:
+        return len(group["traslaciones"])
+    nx, ny = group["conteo"]
+    return int(nx) * int(ny)
+
+
+def _prototype_counts(prototypes: List[Dict], groups: List[Dict]) -> List[Tuple[float, int]]:
+    counts = [0] * len(prototypes)
+    for group in groups:
+        counts[group["prototipo"]] += _group_size(group)
+    return [(prototype["area"], count) for prototype, count in zip(prototypes, counts)]
+
+
+def expand_translations(instances: Dict) -> Tuple[np.ndarray, np.ndarray]:
+    """Prototype index and translation of every caseton, in group order."""
+    prototype_ids = []
+    translations = []
+    for group in instances.get("grupos", []):
+        if "traslaciones" in group:
+            points = np.asarray(group["traslaciones"], dtype=float).reshape(-1, 2)
+        else:
+            (x0, y0), (px, py), (nx, ny) = group["origen"], group["paso"], group["conteo"]
+            gx, gy = np.meshgrid(x0 + px * np.arange(nx), y0 + py * np.arange(ny))
+            points = np.column_stack([gx.ravel(), gy.ravel()])
+        translations.append(points)
+        prototype_ids.append(np.full(len(points), group["prototipo"], dtype=np.intp))
+    if not translations:
+        return np.empty(0, dtype=np.intp), np.empty((0, 2))
+    return np.concatenate(prototype_ids), np.concatenate(translations)
+
+
+def instance_rings(instances: Dict) -> Tuple[np.ndarray, np.ndarray]:
+    """Closed exterior ring coordinates of every caseton: flat (P, 2) coordinates and points per ring."""
+    prototype_ids, translations = expand_translations(instances)
+    prototypes = [np.asarray(p["coordenadas"], dtype=float).reshape(-1, 2) for p in instances.get("prototipos", [])]
+    if not len(prototype_ids):
+        return np.empty((0, 2)), np.empty(0, dtype=np.intp)
+    prototype_counts = np.array([len(p) for p in prototypes], dtype=np.intp)
+    prototype_starts = np.concatenate([[0], np.cumsum(prototype_counts)[:-1]])
+    counts = prototype_counts[prototype_ids]
+    ring_starts = np.repeat(np.cumsum(counts) - counts, counts)
+    point_index = np.arange(counts.sum()) - ring_starts + np.repeat(prototype_starts[prototype_ids], counts)
+    coords = np.concatenate(prototypes)[point_index] + np.repeat(translations, counts, axis=0)
+    return coords, counts
+
+
+def instance_polygons(instances: Dict) -> np.ndarray:
+    """Shapely polygons of every caseton, holes included, in the same order as ``expand_translations``."""
+    coords, counts = instance_rings(instances)
+    if not len(counts):
+        return np.empty(0, dtype=object)
+    polygons = shapely.polygons(shapely.linearrings(coords, indices=np.repeat(np.arange(len(counts)), counts)))
+
+    prototype_ids, translations = expand_translations(instances)
+    for prototype in instances.get("prototipos", []):
+        if not prototype.get("huecos"):
+            continue
+        placed = np.flatnonzero(prototype_ids == prototype["id"])
+        shape = shapely.Polygon(prototype["coordenadas"], prototype["huecos"])
+        points = len(shapely.get_coordinates(shape))
+        offsets = np.repeat(translations[placed], points, axis=0)
+        polygons[placed] = shapely.transform(np.full(len(placed), shape, dtype=object), lambda c: c + offsets)
+    return polygons
+
+
+def caseton_totals(geometry_data: Dict) -> Tuple[int, float]:
+    """Number of casetones and their total area, from the instanced or the per-caseton form."""
+    instances = (geometry_data.get('geometria') or {}).get('casetonesInstanciados')
+    if instances:
+        return int(instances.get('cantidad') or 0), float(instances.get('area_total') or 0.0)
+    casetones = geometry_data.get('casetones', [])
+    return len(casetones), sum(float(c.get('area') or 0.0) for c in casetones)
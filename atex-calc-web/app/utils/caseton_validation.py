@@ -0,0 +1,161 @@
+import logging
+from typing import Dict, List, Tuple
+
+import numpy as np
+import shapely
+
+logger = logging.getLogger(__name__)
+
+# Areas below this (drawing units², m² in our plans) are numeric noise, e.g. edges shared by neighbours
+AREA_TOLERANCE = 1e-6
+# Two casetones sharing at least this fraction of the larger one's area are the same caseton twice
+DUPLICATE_RATIO = 0.99
+# Per-caseton issues listed in the response; the summary always counts all of them
+MAX_REPORTED_ISSUES = 500
+
+
+def _overlapping_pairs(casetones: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Pairs ``i < j`` of casetones whose interiors overlap, with the overlap area.
+
+    The STRtree query yields every pair with touching bounding boxes; pairs whose
+    boxes only share an edge (grid neighbours) are dropped before any exact
+    intersection is computed.
+    """
+    tree = shapely.STRtree(casetones)
+    left, right = tree.query(casetones, predicate='intersects')
+    keep = left < right
+    left, right = left[keep], right[keep]
+
+    bounds = shapely.bounds(casetones)
+    overlap_w = np.minimum(bounds[left, 2], bounds[right, 2]) - np.maximum(bounds[left, 0], bounds[right, 0])
+    overlap_h = np.minimum(bounds[left, 3], bounds[right, 3]) - np.maximum(bounds[left, 1], bounds[right, 1])
+    keep = overlap_w * overlap_h > AREA_TOLERANCE
+    left, right = left[keep], right[keep]
+
+    overlap = shapely.area(shapely.intersection(casetones[left], casetones[right]))
+    keep = overlap > AREA_TOLERANCE
+    return left[keep], right[keep], overlap[keep]
+
+
+def validate_casetones(casetones: np.ndarray, total: np.ndarray, vacios: np.ndarray,
+                       macizos: np.ndarray) -> Tuple[np.ndarray, Dict]:
+    """Check casetones against each other and the usable slab area; return (casetones, report).
+
+    Duplicates (same footprint, typically a CAD copy/paste) are removed, keeping
+    the first. Casetones reaching outside ``superficieTotal`` or into a vacío or
+    macizo are clipped to the usable area (total minus vacíos and macizos) in one
+    vectorized intersection; casetones left with no area are dropped. Partial
+    overlaps between casetones are only reported. Ids in the report are indices
+    into the input ``casetones``.
+    """
+    n = len(casetones)
+    summary = {'revisados': n, 'duplicados': 0, 'superpuestos': 0, 'fueraDeLosa': 0,
+               'sobreVacios': 0, 'sobreMacizos': 0, 'recortados': 0, 'eliminados': 0, 'areaRecortada': 0.0}
+    issues: List[Dict] = []
+    if n == 0 or len(total) == 0:
+        return casetones, {'resumen': summary, 'incidencias': issues, 'truncado': False}
+
+    areas = shapely.area(casetones)
+    keep = np.ones(n, dtype=bool)
+
+    # Caseton vs caseton
+    left, right, overlap = _overlapping_pairs(casetones)
+    duplicate = overlap >= DUPLICATE_RATIO * np.maximum(areas[left], areas[right])
+    for i, j in zip(left[duplicate].tolist(), right[duplicate].tolist()):
+        if keep[j]:
+            keep[j] = False
+            summary['duplicados'] += 1
+            issues.append({'id': j, 'tipo': 'duplicado', 'duplicadoDe': i, 'area': float(areas[j])})
+    for i, j, area in zip(left[~duplicate].tolist(), right[~duplicate].tolist(), overlap[~duplicate].tolist()):
+        if keep[i] and keep[j]:
+            summary['superpuestos'] += 1
+            issues.append({'id': j, 'tipo': 'superpuesto', 'con': i, 'areaSuperpuesta': area})
+
+    # Caseton vs usable area
+    outline = shapely.union_all(total)
+    obstacles = np.concatenate([vacios, macizos])
+    usable = shapely.difference(outline, shapely.union_all(obstacles)) if len(obstacles) else outline
+    shapely.prepare(usable)
+    shapely.prepare(outline)
+
+    candidates = np.flatnonzero(keep)
+    candidates = candidates[~shapely.covers(usable, casetones[candidates])]
+    if len(candidates):
+        clipped = shapely.intersection(casetones[candidates], usable)
+        lost = areas[candidates] - shapely.area(clipped)
+        significant = lost > AREA_TOLERANCE
+        candidates, clipped, lost = candidates[significant], clipped[significant], lost[significant]
+
+        outside = ~shapely.covers(outline, casetones[candidates])
+        hits = {}
+        for name, layer in (('vacios', vacios), ('macizos', macizos)):
+            hits[name] = np.zeros(len(candidates), dtype=bool)
+            if len(layer):
+                shapely.prepare(layer)
+                pairs = shapely.STRtree(layer).query(casetones[candidates], predicate='intersects')
+                inside = shapely.area(shapely.intersection(casetones[candidates][pairs[0]], layer[pairs[1]]))
+                hits[name][np.unique(pairs[0][inside > AREA_TOLERANCE])] = True
+
+        # Clipping may split a caseton; keep its largest polygonal piece
+        parts, owners = shapely.get_parts(clipped, return_index=True)
+        is_polygon = shapely.get_type_id(parts) == shapely.GeometryType.POLYGON
+        part_areas = np.where(is_polygon, shapely.area(parts), 0.0)
+        best = np.full(len(candidates), -1)
+        best_area = np.zeros(len(candidates))
+        for k in np.argsort(part_areas):
+            if part_areas[k] > AREA_TOLERANCE:
+                best[owners[k]] = k
+                best_area[owners[k]] = part_areas[k]
+
+        casetones = casetones.copy()
+        for row, index in enumerate(candidates.tolist()):
+            kinds = [kind for kind, hit in (('fuera_de_losa', outside[row]), ('sobre_vacio', hits['vacios'][row]),
+                                            ('sobre_macizo', hits['macizos'][row])) if hit] or ['fuera_de_losa']
+            summary['fueraDeLosa'] += 'fuera_de_losa' in kinds
+            summary['sobreVacios'] += 'sobre_vacio' in kinds
+            summary['sobreMacizos'] += 'sobre_macizo' in kinds
+            if best[row] < 0:
+                keep[index] = False
+                summary['eliminados'] += 1
+                area_after = 0.0
+            else:
+                casetones[index] = parts[best[row]]
+                summary['recortados'] += 1
+                area_after = float(best_area[row])
+            # areaRecortada is the area removed, as in the summary; areaFinal what is left
+            area_removed = float(areas[index]) - area_after
+            summary['areaRecortada'] += area_removed
+            issues.append({'id': index, 'tipo': kinds[0], 'tipos': kinds, 'area': float(areas[index]),
+                           'areaRecortada': area_removed, 'areaFinal': area_after})
+
+    if summary['duplicados'] or summary['recortados'] or summary['eliminados']:
+        logger.info(f"Caseton validation: {summary}")
+    issues.sort(key=lambda issue: issue['id'])
+    report = {
+        'resumen': summary,
+        'incidencias': issues[:MAX_REPORTED_ISSUES],
+        'truncado': len(issues) > MAX_REPORTED_ISSUES,
+    }
+    return casetones[keep], report
+
+
+def validation_warnings(report: Dict) -> List[str]:
+    """User-facing warning lines for a validation report."""
+    summary = report['resumen']
+    messages = []
+    if summary['duplicados']:
+        messages.append(f"Se eliminaron {summary['duplicados']} casetones duplicados")
+    if summary['superpuestos']:
+        messages.append(f"Hay {summary['superpuestos']} pares de casetones superpuestos")
+    if summary['fueraDeLosa']:
+        messages.append(f"{summary['fueraDeLosa']} casetones salen de superficieTotal")
+    if summary['sobreVacios'] or summary['sobreMacizos']:
+        messages.append(
+            f"{summary['sobreVacios']} casetones invaden vacíos y {summary['sobreMacizos']} invaden macizos"
+        )
+    if summary['recortados'] or summary['eliminados']:
+        messages.append(
+            f"Se recortaron {summary['recortados']} casetones y se descartaron {summary['eliminados']} "
+            f"({summary['areaRecortada']:.2f} m² fuera del área útil)"
+        )
+    return messages
@@ -0,0 +1,172 @@
+import fcntl
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+from typing import Any, BinaryIO, Dict, Optional, Tuple
+
+from app.utils.dxf_upload import CHUNK_SIZE, UploadError
+
+DEFAULT_CHUNK_SIZE = 2 * 1024 * 1024
+DEFAULT_SESSION_TTL = 24 * 3600
+
+_UPLOAD_ID = re.compile(r'^[0-9a-f]{32}$')
+_SHA256 = re.compile(r'^[0-9a-f]{64}$')
+
+
+class ChunkOffsetMismatch(UploadError):
+    """A chunk was sent for an offset other than the upload's current one."""
+
+    def __init__(self, offset: int):
+        super().__init__(f'El fragmento no corresponde a la posición actual ({offset})')
+        self.offset = offset
+
+
+class ChunkedUploadStore:
+    """Resumable uploads assembled on disk, one ``<id>.part`` plus ``<id>.json`` per upload.
+
+    The bytes already on disk are the upload's offset, so every web worker
+    (and a client coming back after a disconnect) sees the same state. Chunks
+    are appended under an exclusive lock on the part file; a chunk whose
+    ``X-Chunk-SHA256`` does not match is rolled back. ``finalize`` checks the
+    size and the declared SHA-256 of the whole file. Sessions untouched for
+    ``ttl`` seconds are removed.
+    """
+
+    def __init__(self, directory: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 max_bytes: Optional[int] = None, ttl: float = DEFAULT_SESSION_TTL):
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, upload_id: str) -> Tuple[str, str]:
+        if not _UPLOAD_ID.match(upload_id or ''):
+            raise KeyError(upload_id)
+        base = os.path.join(self.directory, upload_id)
+        return f'{base}.part', f'{base}.json'
+
+    def create(self, filename: str, size: int, sha256: Optional[str] = None, **extra) -> Dict:
+        """Open an upload session for ``size`` bytes; ``extra`` is stored with it (e.g. the layer profile)."""
+        if size <= 0:
+            raise UploadError('El archivo está vacío')
+        if self.max_bytes is not None and size > self.max_bytes:
+            raise UploadError(f'El archivo supera el máximo de {self.max_bytes // (1024 * 1024)} MB')
+        if sha256 is not None:
+            sha256 = sha256.lower()
+            if not _SHA256.match(sha256):
+                raise UploadError('sha256 inválido')
+        self.purge_stale()
+
+        upload_id = uuid.uuid4().hex
+        part_path, meta_path = self._paths(upload_id)
+        meta = {'upload_id': upload_id, 'filename': filename, 'size': size, 'sha256': sha256,
+                'created_at': time.time(), **extra}
+        open(part_path, 'wb').close()
+        with open(meta_path, 'w', encoding='utf-8') as fp:
+            json.dump(meta, fp)
+        return self._status(meta, 0)
+
+    def _status(self, meta: Dict, offset: int) -> Dict:
+        return {**meta, 'offset': offset, 'chunk_size': self.chunk_size, 'complete': offset == meta['size']}
+
+    def _meta(self, upload_id: str) -> Dict:
+        _, meta_path = self._paths(upload_id)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as fp:
+                return json.load(fp)
+        except (OSError, ValueError):
+            raise KeyError(upload_id)
+
+    def get(self, upload_id: str) -> Dict:
+        """Session metadata and current ``offset``; KeyError when unknown or expired."""
+        meta = self._meta(upload_id)
+        part_path, _ = self._paths(upload_id)
+        try:
+            offset = os.path.getsize(part_path)
+        except OSError:
+            raise KeyError(upload_id)
+        return self._status(meta, offset)
+
+    def write_chunk(self, upload_id: str, offset: int, stream: BinaryIO, sha256: Optional[str] = None) -> Dict:
+        """Append the chunk read from ``stream`` at ``offset`` and return the new status.
+
+        A dropped connection keeps the bytes that did arrive, so the client
+        resumes from whatever ``offset`` the server reports.
+        """
+        meta = self._meta(upload_id)
+        part_path, _ = self._paths(upload_id)
+        digest = hashlib.sha256()
+        with open(part_path, 'r+b') as fp:
+            fcntl.flock(fp, fcntl.LOCK_EX)
+            current = os.fstat(fp.fileno()).st_size
+            if offset != current:
+                raise ChunkOffsetMismatch(current)
+            fp.seek(current)
+            remaining = meta['size'] - current
+            while True:
+                data = stream.read(CHUNK_SIZE)
+                if not data:
+                    break
+                if len(data) > remaining:
+                    fp.truncate(current)
+                    raise UploadError('El fragmento excede el tamaño declarado del archivo')
+                fp.write(data)
+                digest.update(data)
+                remaining -= len(data)
+            if sha256 is not None and digest.hexdigest() != sha256.lower():
+                fp.truncate(current)
+                raise UploadError('El fragmento llegó dañado (sha256 no coincide)')
+            fp.flush()
+            os.fsync(fp.fileno())
+            offset = fp.tell()
+        return self._status(meta, offset)
+
+    def finalize(self, upload_id: str) -> Tuple[Dict, str, Any]:
+        """Check the assembled file; returns (metadata, path, running SHA-256 of its bytes).
+
+        The part file is handed to the caller; the session itself is removed.
+        """
+        status = self.get(upload_id)
+        part_path, meta_path = self._paths(upload_id)
+        if not status['complete']:
+            raise UploadError(f"Faltan datos: recibidos {status['offset']} de {status['size']} bytes")
+        digest = hashlib.sha256()
+        with open(part_path, 'rb') as fp:
+            for data in iter(lambda: fp.read(CHUNK_SIZE), b''):
+                digest.update(data)
+        if status['sha256'] and digest.hexdigest() != status['sha256']:
+            self.discard(upload_id)
+            raise UploadError('El archivo ensamblado no coincide con su sha256; vuelva a subirlo')
+        os.remove(meta_path)
+        # Fresh mtime so purge_stale leaves the handed-over file alone while it is processed
+        os.utime(part_path, None)
+        return status, part_path, digest
+
+    def discard(self, upload_id: str) -> None:
+        for path in self._paths(upload_id):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def purge_stale(self) -> int:
+        """Remove sessions (and orphaned part files) not written to for ``ttl`` seconds."""
+        cutoff = time.time() - self.ttl
+        removed = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                upload_id, ext = os.path.splitext(entry.name)
+                if ext != '.part' or not _UPLOAD_ID.match(upload_id):
+                    continue
+                try:
+                    if entry.stat().st_mtime >= cutoff:
+                        continue
+                except OSError:
+                    continue
+                self.discard(upload_id)
+                removed += 1
+        return removed
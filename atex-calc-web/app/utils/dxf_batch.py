@@ -0,0 +1,111 @@
+import json
+import os
+import zipfile
+from typing import Dict, List, Tuple
+
+from app.utils.area_engine import SLAB_AREA_KEYS, slab_areas
+from app.utils.caseton_instances import MIN_INSTANCE_TOLERANCE, caseton_totals
+from app.utils.dxf_upload import UploadError, dxf_filename
+from app.utils.job_queue import JobFailed
+
+DEFAULT_BATCH_MAX_FILES = 50
+
+
+def zip_dxf_entries(archive: zipfile.ZipFile, max_files: int = DEFAULT_BATCH_MAX_FILES) -> List[zipfile.ZipInfo]:
+    """The DXF files (``.dxf``, ``.dxf.gz``, ``.dxf.zst``) of a project ZIP, in name order.
+
+    Folders, macOS resource forks and hidden files are skipped; the name of an
+    entry is its path inside the archive.
+    """
+    entries = []
+    for info in archive.infolist():
+        base = os.path.basename(info.filename)
+        if info.is_dir() or not base or base.startswith('.') or '__MACOSX/' in info.filename:
+            continue
+        if dxf_filename(base).lower().endswith('.dxf'):
+            entries.append(info)
+    if not entries:
+        raise UploadError('El ZIP no contiene archivos DXF')
+    if len(entries) > max_files:
+        raise UploadError(f'El ZIP contiene {len(entries)} archivos DXF; el máximo por lote es {max_files}')
+    return sorted(entries, key=lambda info: info.filename)
+
+
+def batch_file_error(result: Dict) -> str:
+    """Why a processed file cannot be priced ('' when it can)."""
+    return '; '.join(result.get('errores') or [])
+
+
+def batch_job_result(payload: str) -> str:
+    """The JSON result of a batch file's job, failing the job when the file cannot be priced."""
+    error = batch_file_error(json.loads(payload))
+    if error:
+        raise JobFailed(error)
+    return payload
+
+
+def combine_geometries(results: List[Tuple[str, Dict]]) -> Dict:
+    """One geometry set, as returned by ``/api/upload-dxf``, for every processed file of a batch.
+
+    Each file is a different floor, so areas and caseton counts add up.
+    Casetones are merged into one instanced set (prototype ids renumbered,
+    each group tagged with its file) and per-slab entries keep their file name,
+    so ``/api/calculate`` prices the whole project in one call.
+    """
+    areas = {
+        'superficieTotal': 0.0,
+        'superficieVacios': {'individuales': [], 'total': 0.0},
+        'superficieMacizos': {'individuales': [], 'total': 0.0},
+        'losa': {key: 0.0 for key in SLAB_AREA_KEYS},
+    }
+    prototipos: List[Dict] = []
+    grupos: List[Dict] = []
+    tolerancia = MIN_INSTANCE_TOLERANCE
+    cantidad = 0
+    area_casetones = 0.0
+    losas: List[Dict] = []
+    archivos: List[Dict] = []
+    warnings: List[str] = []
+
+    for filename, result in results:
+        file_areas = result.get('areas') or {}
+        areas['superficieTotal'] += float(file_areas.get('superficieTotal') or 0.0)
+        for layer in ('superficieVacios', 'superficieMacizos'):
+            layer_areas = file_areas.get(layer) or {}
+            areas[layer]['individuales'].extend(layer_areas.get('individuales') or [])
+            areas[layer]['total'] += float(layer_areas.get('total') or 0.0)
+        file_slab = slab_areas(result)
+        for key in SLAB_AREA_KEYS:
+            areas['losa'][key] += file_slab[key]
+
+        count, caseton_area = caseton_totals(result)
+        cantidad += count
+        area_casetones += caseton_area
+        instances = (result.get('geometria') or {}).get('casetonesInstanciados') or {}
+        tolerancia = max(tolerancia, float(instances.get('tolerancia') or 0.0))
+        offset = len(prototipos)
+        prototipos.extend(dict(prototype, id=prototype['id'] + offset) for prototype in instances.get('prototipos', []))
+        grupos.extend(
+            dict(group, prototipo=group['prototipo'] + offset, archivo=filename) for group in instances.get('grupos', [])
+        )
+
+        losas.extend(dict(losa, archivo=filename) for losa in result.get('losas') or [])
+        archivos.append({'archivo': filename, 'areas': file_slab, 'casetones': count})
+        warnings.extend(f"{filename}: {warning}" for warning in result.get('warnings') or [])
+
+    return {
+        'areas': areas,
+        'geometria': {
+            'casetonesInstanciados': {
+                'tolerancia': tolerancia,
+                'prototipos': prototipos,
+                'grupos': grupos,
+                'cantidad': cantidad,
+                'area_total': area_casetones,
+            }
+        },
+        'losas': losas,
+        'archivos': archivos,
+        'errores': [],
+        'warnings': warnings,
+    }
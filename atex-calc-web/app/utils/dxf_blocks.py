@@ -0,0 +1,317 @@
+import logging
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from ezdxf.entities import factory
+from ezdxf.entities.subentity import entity_linker
+from ezdxf.lldxf.extendedtags import ExtendedTags
+from ezdxf.lldxf.tagger import tag_compiler
+from ezdxf.lldxf.types import DXFTag
+
+logger = logging.getLogger(__name__)
+
+# Layer "0" inside a block takes the layer of the INSERT that places it
+INHERITED_LAYER = '0'
+
+_END_TAG = DXFTag(0, 'EOF')
+
+
+def load_entity(tags: List[DXFTag]):
+    """Build a DXF entity from the raw tags of one entity (as read by ascii_tags_loader)."""
+    # tag_compiler needs a lookahead tag to close a trailing point tag
+    compiled = list(tag_compiler(iter(tags + [_END_TAG])))
+    return factory.load(ExtendedTags(compiled[:-1]))
+
+
+class InsertRef(NamedTuple):
+    """Placement of one INSERT/MINSERT, in the coordinates of its owner."""
+    name: str
+    layer: str
+    x: float
+    y: float
+    xscale: float = 1.0
+    yscale: float = 1.0
+    rotation: float = 0.0
+    columns: int = 1
+    rows: int = 1
+    column_spacing: float = 0.0
+    row_spacing: float = 0.0
+    # Extrusion (0, 0, -1): the OCS x axis points along -X
+    mirrored: bool = False
+
+
+def insert_from_tags(tags: Sequence[DXFTag]) -> InsertRef:
+    """Read an INSERT straight from its raw tags, without building the entity."""
+    values: Dict[int, str] = {}
+    for tag in tags:
+        values.setdefault(tag.code, tag.value)
+    get = values.get
+    return InsertRef(
+        get(2, ''),
+        get(8, INHERITED_LAYER),
+        float(get(10, 0.0)),
+        float(get(20, 0.0)),
+        float(get(41, 1.0)),
+        float(get(42, 1.0)),
+        float(get(50, 0.0)),
+        int(get(70, 1)),
+        int(get(71, 1)),
+        float(get(44, 0.0)),
+        float(get(45, 0.0)),
+        float(get(230, 1.0)) < 0,
+    )
+
+
+def insert_from_entity(entity) -> InsertRef:
+    dxf = entity.dxf
+    return InsertRef(
+        name=dxf.name,
+        layer=dxf.layer,
+        x=dxf.insert[0],
+        y=dxf.insert[1],
+        xscale=dxf.get('xscale', 1.0),
+        yscale=dxf.get('yscale', 1.0),
+        rotation=dxf.get('rotation', 0.0),
+        columns=dxf.get('column_count', 1),
+        rows=dxf.get('row_count', 1),
+        column_spacing=dxf.get('column_spacing', 0.0),
+        row_spacing=dxf.get('row_spacing', 0.0),
+        mirrored=dxf.get('extrusion', (0, 0, 1))[2] < 0,
+    )
+
+
+def placement_transforms(inserts: Sequence[InsertRef], base: Tuple[float, float]) -> Tuple[np.ndarray, np.ndarray]:
+    """Affine transforms ``p -> A @ p + t`` of every placement, MINSERT cells expanded.
+
+    Returns ``A`` with shape (M, 2, 2) and ``t`` with shape (M, 2), where M is
+    the total number of placed copies.
+    """
+    params = np.array([
+        (ref.x, ref.y, ref.xscale, ref.yscale, ref.rotation, max(ref.columns, 1), max(ref.rows, 1),
+         ref.column_spacing, ref.row_spacing, -1.0 if ref.mirrored else 1.0)
+        for ref in inserts
+    ], dtype=float).reshape(-1, 10)
+
+    columns = params[:, 5].astype(np.intp)
+    cells = columns * params[:, 6].astype(np.intp)
+    owner = np.repeat(np.arange(len(params)), cells)
+    cell = np.arange(cells.sum()) - np.repeat(np.cumsum(cells) - cells, cells)
+    p = params[owner]
+
+    theta = np.radians(p[:, 4])
+    cos, sin = np.cos(theta), np.sin(theta)
+    rotation = np.empty((len(p), 2, 2))
+    rotation[:, 0, 0], rotation[:, 0, 1] = cos, -sin
+    rotation[:, 1, 0], rotation[:, 1, 1] = sin, cos
+    transform = rotation * p[:, None, 2:4]
+
+    # MINSERT offsets run along the rotated axes and are not scaled
+    offsets = np.stack([(cell % columns[owner]) * p[:, 7], (cell // columns[owner]) * p[:, 8]], axis=1)
+    translation = (
+        p[:, 0:2]
+        + np.einsum('mij,mj->mi', rotation, offsets)
+        - np.einsum('mij,j->mi', transform, np.asarray(base, dtype=float))
+    )
+
+    transform[:, 0, :] *= p[:, 9, None]
+    translation[:, 0] *= p[:, 9]
+    return transform, translation
+
+
+class BlockGeometry(NamedTuple):
+    """Closed rings of a block definition (nested inserts flattened), in block coordinates."""
+    base: Tuple[float, float]
+    points: np.ndarray        # (P, 2)
+    counts: np.ndarray        # points per ring
+    layers: List[str]         # layer per ring, INHERITED_LAYER if it follows the insert
+    circles: np.ndarray       # ring comes from a CIRCLE
+
+    def place(self, inserts: Sequence[InsertRef]) -> np.ndarray:
+        """Coordinates of every placed copy, shape (M, P, 2)."""
+        transform, translation = placement_transforms(inserts, self.base)
+        return np.einsum('mij,pj->mpi', transform, self.points) + translation[:, None, :]
+
+
+class BlockLibrary:
+    """Block definitions of one document; each block's rings are extracted once, on first use.
+
+    Blocks come either as raw tags from the streaming reader
+    (``add_raw_block``) or from a loaded ezdxf document (``attach_document``).
+    ``ring_of(entity)`` returns the closed ring of an entity of ``ring_types``
+    (LWPOLYLINE/POLYLINE/CIRCLE) or None. A block that cannot be read is
+    logged and skipped, it never fails the whole drawing.
+    """
+
+    def __init__(self, ring_of: Callable, ring_types: Sequence[str]):
+        self._ring_of = ring_of
+        self._ring_types = tuple(ring_types)
+        self._raw: Dict[str, Tuple[Tuple[float, float], List[List[DXFTag]]]] = {}
+        self._doc = None
+        self._geometry: Dict[str, Optional[BlockGeometry]] = {}
+        self._layer_sets: Dict[str, Set[str]] = {}
+
+    def add_raw_block(self, name: str, base: Tuple[float, float], entity_tags: List[List[DXFTag]]) -> None:
+        if entity_tags:
+            self._raw[name] = (base, entity_tags)
+
+    def attach_document(self, doc) -> None:
+        self._doc = doc
+
+    def _definition(self, name: str):
+        if self._doc is not None:
+            block = self._doc.blocks.get(name)
+            if block is None:
+                return None
+            base = block.block.dxf.base_point
+            return (base[0], base[1]), iter(block)
+        raw = self._raw.get(name)
+        if raw is None:
+            return None
+        base, entity_tags = raw
+        return base, self._load_raw(entity_tags)
+
+    @staticmethod
+    def _load_raw(entity_tags: List[List[DXFTag]]) -> Iterator:
+        linked_entity = entity_linker()
+        queued = None
+        for tags in entity_tags:
+            if tags[0].value == 'INSERT':
+                # Only the placement is needed; its ATTRIBs (66=1) are not kept, so it must not reach the linker
+                if queued is not None:
+                    yield queued
+                    queued = None
+                yield insert_from_tags(tags)
+                continue
+            entity = load_entity(tags)
+            if not linked_entity(entity):
+                if queued is not None:
+                    yield queued
+                queued = entity
+        if queued is not None:
+            yield queued
+
+    def _entity_summaries(self, name: str) -> Iterator[Tuple[str, str, str]]:
+        """``(type, layer, block name of an INSERT)`` of a block's entities, read without building them."""
+        if self._doc is not None:
+            block = self._doc.blocks.get(name)
+            for entity in block if block is not None else ():
+                entity_type = entity.dxftype()
+                yield entity_type, entity.dxf.get('layer', INHERITED_LAYER), entity.dxf.get('name', '') if entity_type == 'INSERT' else ''
+            return
+        _, entity_tags = self._raw.get(name, (None, ()))
+        for tags in entity_tags:
+            values: Dict[int, str] = {}
+            for tag in tags:
+                values.setdefault(tag.code, tag.value)
+            yield tags[0].value, values.get(8, INHERITED_LAYER), values.get(2, '')
+
+    def layers(self, name: str) -> Set[str]:
+        """Layers a block's rings can end up on, nested blocks included (INHERITED_LAYER: the insert's layer)."""
+        if name in self._layer_sets:
+            return self._layer_sets[name]
+        self._layer_sets[name] = set()
+        layers = set()
+        for entity_type, layer, child in self._entity_summaries(name):
+            if entity_type == 'INSERT':
+                layers.update(layer if child_layer == INHERITED_LAYER else child_layer for child_layer in self.layers(child))
+            elif entity_type in self._ring_types:
+                layers.add(layer)
+        self._layer_sets[name] = layers
+        return layers
+
+    def geometry(self, name: str) -> Optional[BlockGeometry]:
+        if name in self._geometry:
+            return self._geometry[name]
+        # Guards against self-referencing blocks while this one is being built
+        self._geometry[name] = None
+        definition = self._definition(name)
+        if definition is None:
+            return None
+        base, entities = definition
+
+        rings: List[np.ndarray] = []
+        layers: List[str] = []
+        circles: List[bool] = []
+        nested: List[InsertRef] = []
+        try:
+            for entity in entities:
+                if isinstance(entity, InsertRef):
+                    nested.append(entity)
+                    continue
+                entity_type = entity.dxftype()
+                if entity_type == 'INSERT':
+                    nested.append(insert_from_entity(entity))
+                    continue
+                ring = self._ring_of(entity)
+                if ring is not None:
+                    rings.append(np.asarray(ring, dtype=float))
+                    layers.append(entity.dxf.layer)
+                    circles.append(entity_type == 'CIRCLE')
+        except Exception as e:
+            logger.warning(f"Skipping block '{name}': {str(e)}")
+            return None
+
+        points = [np.concatenate(rings)] if rings else []
+        counts = [np.array([len(ring) for ring in rings], dtype=np.intp)]
+        circle_flags = [np.array(circles, dtype=bool)]
+        for ref in nested:
+            child = self.geometry(ref.name)
+            if child is None or not len(child.counts):
+                continue
+            placed = child.place([ref])
+            copies = len(placed)
+            points.append(placed.reshape(-1, 2))
+            counts.append(np.tile(child.counts, copies))
+            circle_flags.append(np.tile(child.circles, copies))
+            layers.extend([ref.layer if layer == INHERITED_LAYER else layer for layer in child.layers] * copies)
+
+        if not points:
+            return None
+        geometry = BlockGeometry(
+            base=base,
+            points=np.concatenate(points),
+            counts=np.concatenate(counts),
+            layers=layers,
+            circles=np.concatenate(circle_flags),
+        )
+        self._geometry[name] = geometry
+        return geometry
+
+    def expand(self, inserts: Iterable[InsertRef], resolve: Callable) -> Iterator[Tuple[str, np.ndarray, np.ndarray, str]]:
+        """Place every insert and yield ``(target, coords, counts, layer)`` ring batches.
+
+        Inserts are grouped by block and layer so each group is transformed with
+        one vectorized operation. CIRCLE rings only count for superficieCasetones.
+        """
+        groups: Dict[Tuple[str, str], List[InsertRef]] = {}
+        for ref in inserts:
+            groups.setdefault((ref.name, ref.layer), []).append(ref)
+
+        for (name, insert_layer), refs in groups.items():
+            # Title blocks, symbols and the like never reach a mapped layer; don't read them at all
+            effective_layers = {insert_layer if layer == INHERITED_LAYER else layer for layer in self.layers(name)}
+            if not any(resolve(layer) is not None for layer in effective_layers):
+                continue
+            geometry = self.geometry(name)
+            if geometry is None:
+                continue
+            placed = geometry.place(refs)
+            copies = len(placed)
+            ring_start = np.concatenate([[0], np.cumsum(geometry.counts)[:-1]])
+
+            by_target: Dict[Tuple[str, str], List[int]] = {}
+            for index, layer in enumerate(geometry.layers):
+                effective_layer = insert_layer if layer == INHERITED_LAYER else layer
+                target = resolve(effective_layer)
+                if target is None or (geometry.circles[index] and target != 'superficieCasetones'):
+                    continue
+                by_target.setdefault((target, effective_layer), []).append(index)
+
+            for (target, layer), ring_indices in by_target.items():
+                ring_counts = geometry.counts[ring_indices]
+                point_index = np.concatenate([
+                    np.arange(ring_start[i], ring_start[i] + geometry.counts[i]) for i in ring_indices
+                ])
+                coords = placed[:, point_index, :].reshape(-1, 2)
+                logger.info(f"Placed {copies} copies of block '{name}' ({len(ring_indices)} rings) in {target} from layer '{layer}'")
+                yield target, coords, np.tile(ring_counts, copies), layer
@@ -0,0 +1,109 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from typing import Dict, Optional
+
+from app.utils.dxf_processor import DXF_PROCESSING_VERSION, LAYER_MAPPING_VERSION
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+
+def dxf_cache_key(data: bytes, mapping_version: str = LAYER_MAPPING_VERSION) -> str:
+    """SHA-256 of the uploaded bytes plus the layer-mapping and processing versions they were processed with."""
+    return dxf_cache_key_from_digest(hashlib.sha256(data), mapping_version)
+
+
+def dxf_cache_key_from_digest(digest, mapping_version: str = LAYER_MAPPING_VERSION) -> str:
+    """``dxf_cache_key`` for bytes already fed to a running SHA-256 ``digest`` (left untouched)."""
+    digest = digest.copy()
+    digest.update(b'\0')
+    digest.update(mapping_version.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(DXF_PROCESSING_VERSION.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class DxfResultCache:
+    """On-disk cache of processed DXF results (geometry + preview), keyed by content hash.
+
+    Each entry is the serialized JSON response in ``<key>.json``. File mtimes
+    are the LRU clock: hits touch the entry and, once the directory grows
+    past ``max_bytes``, the least recently used entries are removed.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f'{key}.json')
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached JSON payload for ``key``, or None."""
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as fp:
+                payload = fp.read()
+            os.utime(path, None)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return payload
+
+    def put(self, key: str, result: Dict) -> str:
+        """Store ``result`` under ``key`` and return its JSON payload."""
+        payload = json.dumps(result)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as fp:
+                fp.write(payload)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            logger.warning(f"Could not write DXF cache entry {key}: {str(e)}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return payload
+        self._evict()
+        return payload
+
+    def _evict(self) -> None:
+        with self._lock:
+            entries = []
+            total = 0
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if not entry.name.endswith('.json'):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+            if total <= self.max_bytes:
+                return
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    continue
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'max_bytes': self.max_bytes}
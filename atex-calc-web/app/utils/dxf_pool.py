@@ -0,0 +1,255 @@
+import logging
+import multiprocessing
+import os
+import queue
+import resource
+import signal
+import threading
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Modules imported once in the fork server, so every worker starts warm
+PRELOAD_MODULES = ['app.utils.dxf_processor', 'app.utils.geometry_plotter', 'app.utils.dxf_pool']
+
+
+class DxfTaskError(Exception):
+    """A pooled DXF task failed; the message is safe to show to the user."""
+
+
+class DxfTaskLimitExceeded(DxfTaskError):
+    """The task hit its CPU-time, memory or wall-clock limit."""
+
+
+class DxfPoolBusy(DxfTaskError):
+    """No worker became free in time."""
+
+
+class _CpuLimitReached(BaseException):
+    # BaseException so the processors' own `except Exception` blocks do not swallow it
+    pass
+
+
+def _raise_cpu_limit(signum, frame):
+    raise _CpuLimitReached()
+
+
+def _cpu_time_used() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _set_cpu_soft_limit(seconds) -> None:
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if hard != resource.RLIM_INFINITY:
+        seconds = min(seconds, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (seconds, hard))
+
+
+def _current_address_space() -> int:
+    try:
+        with open('/proc/self/statm') as fp:
+            return int(fp.read().split()[0]) * resource.getpagesize()
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def process_upload(source, repair_invalid: bool = False, layer_resolver=None) -> dict:
+    """Worker task: process a DXF file (path or bytes) and render its preview."""
+    from app.utils.dxf_processor import process_dxf_file
+    from app.utils.geometry_plotter import generate_geometry_preview
+
+    result = process_dxf_file(source, repair_invalid=repair_invalid, layer_resolver=layer_resolver)
+    preview_data = generate_geometry_preview(result)
+    if preview_data:
+        result['preview'] = preview_data
+    return result
+
+
+def _worker_main(conn, cpu_seconds: int, memory_bytes: int) -> None:
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGXCPU, _raise_cpu_limit)
+    if memory_bytes:
+        # The budget is on top of what the preloaded libraries already map
+        limit = _current_address_space() + memory_bytes
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            return
+        if message is None:
+            return
+        func, args, kwargs = message
+        if cpu_seconds:
+            # RLIMIT_CPU counts the whole process lifetime; arm it for this task only
+            _set_cpu_soft_limit(int(_cpu_time_used()) + cpu_seconds)
+        try:
+            reply = ('ok', func(*args, **kwargs))
+        except _CpuLimitReached:
+            reply = ('limit', f'El procesamiento superó el límite de {cpu_seconds} s de CPU')
+        except MemoryError:
+            reply = ('limit', 'El procesamiento superó el límite de memoria')
+        except Exception as e:
+            reply = ('error', str(e))
+        finally:
+            if cpu_seconds:
+                _set_cpu_soft_limit(resource.RLIM_INFINITY)
+        try:
+            conn.send(reply)
+        except Exception as e:
+            conn.send(('error', f'Resultado no serializable: {str(e)}'))
+        if reply[0] == 'limit':
+            # Do not reuse a process that ran out of CPU or memory
+            return
+
+
+class _Worker:
+    def __init__(self, context, cpu_seconds: int, memory_bytes: int):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, args=(child_conn, cpu_seconds, memory_bytes), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.tasks = 0
+
+    def stop(self, kill: bool = False) -> None:
+        try:
+            if kill:
+                self.process.kill()
+            else:
+                self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(timeout=1)
+        self.conn.close()
+
+
+class DxfProcessPool:
+    """Fixed-size pool of pre-started worker processes for DXF work.
+
+    Each task runs with a CPU-time limit and inside an address-space limit
+    set for the worker, and the caller waits at most ``timeout`` seconds
+    before the worker is killed. Workers are replaced after ``max_tasks``
+    tasks, after hitting a limit and after dying. ``size=0`` runs tasks
+    inline, without isolation.
+    """
+
+    def __init__(self, size: int = 2, max_tasks: int = 50, timeout: float = 25.0,
+                 cpu_seconds: int = 20, memory_mb: int = 1024, start_method: Optional[str] = None):
+        self.size = size
+        self.max_tasks = max_tasks
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_bytes = memory_mb * 1024 * 1024 if memory_mb else 0
+        self._start_method = start_method
+        self._context = None
+        self._idle: 'queue.Queue[_Worker]' = queue.Queue()
+        self._lock = threading.Lock()
+        self._started = False
+        self._pid = None
+
+    def _get_context(self):
+        methods = multiprocessing.get_all_start_methods()
+        method = self._start_method or ('forkserver' if 'forkserver' in methods else 'spawn')
+        context = multiprocessing.get_context(method)
+        if method == 'forkserver':
+            context.set_forkserver_preload(PRELOAD_MODULES)
+        return context
+
+    def start(self) -> None:
+        """Start (pre-warm) the workers; called lazily by ``run``."""
+        with self._lock:
+            # A pool inherited through fork belongs to the parent process
+            if self._started and self._pid == os.getpid():
+                return
+            self._context = self._get_context()
+            self._idle = queue.Queue()
+            for _ in range(self.size):
+                self._idle.put(self._new_worker())
+            self._pid = os.getpid()
+            self._started = True
+
+    def prewarm(self) -> None:
+        """Start the workers now, unless this process is itself a multiprocessing child
+        (spawned children re-import the main module)."""
+        if self.size > 0 and multiprocessing.parent_process() is None:
+            self.start()
+
+    def _new_worker(self) -> _Worker:
+        return _Worker(self._context, self.cpu_seconds, self.memory_bytes)
+
+    def _replace(self, worker: _Worker, kill: bool = False) -> None:
+        """Stop ``worker`` and put a fresh one in its slot.
+
+        If the new process cannot be started the stopped worker keeps the
+        slot; ``run`` starts a replacement when it next picks it.
+        """
+        worker.stop(kill=kill)
+        try:
+            worker = self._new_worker()
+        except Exception as e:
+            logger.warning(f"Could not start a DXF worker: {str(e)}")
+        self._idle.put(worker)
+
+    def run(self, func: Callable, *args, **kwargs):
+        if self.size <= 0:
+            return func(*args, **kwargs)
+
+        self.start()
+        try:
+            worker = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise DxfPoolBusy('El servidor está procesando otros archivos DXF, intente nuevamente en unos segundos')
+
+        if not worker.process.is_alive():
+            worker.stop(kill=True)
+            try:
+                worker = self._new_worker()
+            except BaseException:
+                # Keep the slot; the next task tries again
+                self._idle.put(worker)
+                raise
+
+        try:
+            worker.conn.send((func, args, kwargs))
+            if not worker.conn.poll(self.timeout):
+                logger.warning(f"DXF task exceeded {self.timeout}s; killing worker {worker.process.pid}")
+                self._replace(worker, kill=True)
+                raise DxfTaskLimitExceeded(f'El procesamiento del DXF superó el tiempo máximo de {self.timeout:g} s')
+            status, payload = worker.conn.recv()
+        except (EOFError, OSError):
+            # The worker died (e.g. killed by the kernel at the hard CPU limit)
+            logger.warning(f"DXF worker {worker.process.pid} died during a task")
+            self._replace(worker, kill=True)
+            raise DxfTaskLimitExceeded('El procesamiento del DXF fue interrumpido por exceder los límites del servidor')
+        except BaseException:
+            # Anything else (a task that does not pickle, an interrupt) leaves the pipe in an unknown state
+            self._replace(worker, kill=True)
+            raise
+
+        worker.tasks += 1
+        if status == 'limit':
+            self._replace(worker)
+            raise DxfTaskLimitExceeded(payload)
+        if worker.tasks >= self.max_tasks:
+            self._replace(worker)
+        else:
+            self._idle.put(worker)
+        if status == 'error':
+            raise DxfTaskError(payload)
+        return payload
+
+    def shutdown(self) -> None:
+        with self._lock:
+            while True:
+                try:
+                    self._idle.get_nowait().stop()
+                except queue.Empty:
+                    break
+            self._started = False
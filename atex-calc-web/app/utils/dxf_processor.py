@@ -1,97 +1,374 @@
+import functools
+import io
 import json
 import os
 import ezdxf
-from shapely.geometry import Polygon
+from ezdxf.document import Drawing
+from ezdxf.entities.subentity import entity_linker
+from ezdxf.filemanagement import dxf_file_info, dxf_stream_info
+from ezdxf.lldxf.tagger import ascii_tags_loader, binary_tags_loader
+from ezdxf.lldxf.validator import is_binary_dxf_file
+import numpy as np
+import shapely
 import logging
 
+from app.utils.layer_mapping import DEFAULT_LAYER_RESOLVER
+from app.utils.caseton_instances import build_caseton_instances
+from app.utils.caseton_validation import validation_warnings
+from app.utils.slabs import compute_slabs
+from app.utils.arcs import DEFAULT_CHORD_TOLERANCE, bulge_ring, circle_ring
+from app.utils.dxf_blocks import BlockLibrary, insert_from_entity, insert_from_tags, load_entity
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def process_dxf_file(filepath):
-    """Process DXF file and extract slab geometry"""
-    try:
-        # Configuration of layers - include common variations
-        LAYER_MAPPING = {
-            # Spanish variations
-            "superficieTotal": ["superficieTotal", "superficie_total", "SuperficieTotal", "TOTAL", "total", "contorno", "perimetro"],
-            "superficieVacios": ["superficieVacios", "superficie_vacios", "SuperficieVacios", "VACIOS", "vacios", "huecos"],
-            "superficieMacizos": ["superficieMacizos", "superficie_macizos", "SuperficieMacizos", "MACIZOS", "macizos", "solidos"],
-            "superficieCasetones": ["superficieCasetones", "superficie_casetones", "SuperficieCasetones", "CASETONES", "casetones", "nervios"]
+# Changes whenever the default mapping changes; part of the processed-DXF cache key
+LAYER_MAPPING_VERSION = DEFAULT_LAYER_RESOLVER.version
+# Bump when processing changes the result for the same file (e.g. caseton validation); also part of the cache key
+DXF_PROCESSING_VERSION = '8'
+
+# Entity types that can carry slab geometry
+GEOMETRY_TYPES = ("LWPOLYLINE", "POLYLINE", "CIRCLE")
+
+# Sub-entities stored after their owner in the ENTITIES section (POLYLINE vertices, INSERT attributes)
+LINKED_TYPES = ("VERTEX", "SEQEND", "ATTRIB")
+
+BINARY_DXF_SENTINEL = b"AutoCAD Binary DXF\r\n\x1a\x00"
+
+
+# A DXF source is a file path or the file's bytes (small uploads are parsed without touching disk)
+def _is_in_memory(source):
+    return isinstance(source, (bytes, bytearray, memoryview))
+
+
+def _is_binary_source(source):
+    if _is_in_memory(source):
+        return bytes(source[:len(BINARY_DXF_SENTINEL)]) == BINARY_DXF_SENTINEL
+    return is_binary_dxf_file(source)
+
+
+def _open_text_source(source, encoding, errors='surrogateescape'):
+    if _is_in_memory(source):
+        return io.TextIOWrapper(io.BytesIO(source), encoding=encoding, errors=errors)
+    return open(source, mode='rt', encoding=encoding, errors=errors)
+
+
+def _source_info(source):
+    if _is_in_memory(source):
+        with _open_text_source(source, 'utf-8', errors='ignore') as fp:
+            return dxf_stream_info(fp)
+    return dxf_file_info(source)
+
+
+def _read_document(source):
+    if not _is_in_memory(source):
+        return ezdxf.readfile(source)
+    if _is_binary_source(source):
+        return Drawing.load(binary_tags_loader(bytes(source)))
+    with _open_text_source(source, _source_info(source).encoding) as fp:
+        return ezdxf.read(fp)
+
+
+def _entity_ring(entity, chord_tolerance=DEFAULT_CHORD_TOLERANCE):
+    """Closed ring of a LWPOLYLINE/POLYLINE/CIRCLE as a list of (x, y) points, or None.
+
+    Arcs (polyline bulges and circles) become chords no further than
+    ``chord_tolerance`` from the curve, placed so the ring keeps the exact
+    analytic area.
+    """
+    entity_type = entity.dxftype()
+    layer = entity.dxf.layer
+    if entity_type in ["LWPOLYLINE", "POLYLINE"]:
+        try:
+            if entity_type == "LWPOLYLINE":
+                vertices = [(p[0], p[1], p[2]) for p in entity.get_points('xyb')]
+                is_closed = entity.closed
+            else:  # POLYLINE
+                vertices = [(v.dxf.location[0], v.dxf.location[1], v.dxf.get('bulge', 0.0)) for v in entity.vertices]
+                is_closed = entity.is_closed if hasattr(entity, 'is_closed') else entity.closed
+
+            puntos = [(x, y) for x, y, _ in vertices]
+            bulges = [b for _, _, b in vertices]
+            if is_closed and any(bulges):
+                if len(puntos) > 2 and puntos[0] == puntos[-1]:
+                    # The closing vertex repeats the first; its segment has zero length
+                    puntos, bulges = puntos[:-1], bulges[:-1]
+                puntos = bulge_ring(puntos, bulges, chord_tolerance)
+
+            if is_closed and len(puntos) >= 3:
+                # A ring needs 4 coordinates once closed
+                if len(puntos) + (puntos[0] != puntos[-1]) >= 4:
+                    return puntos
+                logger.warning(f"Degenerate polygon in layer '{layer}'")
+            else:
+                logger.warning(f"Entity not closed or insufficient points in layer '{layer}'")
+        except Exception as e:
+            logger.error(f"Error processing entity in layer '{layer}': {str(e)}")
+
+    elif entity_type == "CIRCLE":
+        try:
+            center = entity.dxf.center
+            return circle_ring(center[0], center[1], entity.dxf.radius, chord_tolerance)
+        except Exception as e:
+            logger.error(f"Error processing circle in layer '{layer}': {str(e)}")
+    return None
+
+
+def _iter_document_entities(filepath, resolve, entity_counts, found_layers, blocks, inserts):
+    """Load the whole document with ezdxf and yield the geometry entities on mapped layers.
+
+    INSERT references are collected into ``inserts`` and the document's block
+    definitions are made available through ``blocks``.
+    """
+    doc = _read_document(filepath)
+    blocks.attach_document(doc)
+    for entity in doc.modelspace():
+        entity_type = entity.dxftype()
+        entity_counts[entity_type] = entity_counts.get(entity_type, 0) + 1
+        if not hasattr(entity.dxf, 'layer'):
+            continue
+        found_layers.add(entity.dxf.layer)
+        if entity_type == 'INSERT':
+            inserts.append(insert_from_entity(entity))
+        elif entity_type in GEOMETRY_TYPES and resolve(entity.dxf.layer) is not None:
+            yield entity
+
+
+def _iter_streamed_entities(filepath, resolve, entity_counts, found_layers, blocks, inserts):
+    """Stream the BLOCKS and ENTITIES sections tag by tag and yield the geometry entities on mapped layers.
+
+    Entities are only counted from their raw tags; DXF objects are built just
+    for LWPOLYLINE/POLYLINE/CIRCLE on a mapped layer (plus the VERTEX/SEQEND
+    of those polylines), so annotation, hatches and other layers never leave
+    the tag stream. Block definitions keep the raw tags of their geometry and
+    INSERT entities for ``blocks``; modelspace INSERTs are read from their tags
+    into ``inserts``. The header, tables and objects sections are skipped.
+    """
+    info = _source_info(filepath)
+    linked_entity = entity_linker()
+    queued = None
+    keep_linked = False
+    section = None
+    prev_code, prev_value = -1, ''
+    tags = []
+    # (name, base point, raw entity tags) of the block being read
+    block = None
+
+    with _open_text_source(filepath, info.encoding) as fp:
+        for tag in ascii_tags_loader(fp):
+            code, value = tag.code, tag.value
+            if section not in ('BLOCKS', 'ENTITIES'):
+                if code == 2 and prev_code == 0 and prev_value == 'SECTION':
+                    section = value
+                prev_code, prev_value = code, value
+                continue
+            if code != 0:
+                tags.append(tag)
+                continue
+
+            if tags and section == 'BLOCKS':
+                entity_type = tags[0].value
+                if entity_type == 'BLOCK':
+                    values = {}
+                    for block_tag in tags:
+                        values.setdefault(block_tag.code, block_tag.value)
+                    block = (values.get(2, ''), (float(values.get(10, 0.0)), float(values.get(20, 0.0))), [])
+                    keep_linked = False
+                elif entity_type == 'ENDBLK':
+                    if block is not None:
+                        blocks.add_raw_block(*block)
+                    block = None
+                elif block is not None:
+                    if entity_type in LINKED_TYPES:
+                        wanted = keep_linked
+                    else:
+                        wanted = entity_type in GEOMETRY_TYPES or entity_type == 'INSERT'
+                        keep_linked = entity_type == 'POLYLINE'
+                    if wanted:
+                        block[2].append(tags)
+
+            elif tags:
+                entity_type = tags[0].value
+                if entity_type in LINKED_TYPES:
+                    wanted = keep_linked
+                else:
+                    layer = '0'
+                    paperspace = False
+                    for entity_tag in tags:
+                        if entity_tag.code == 8:
+                            layer = entity_tag.value
+                        elif entity_tag.code == 67:
+                            paperspace = entity_tag.value.strip() == '1'
+                    wanted = False
+                    if not paperspace:
+                        entity_counts[entity_type] = entity_counts.get(entity_type, 0) + 1
+                        found_layers.add(layer)
+                        if entity_type == 'INSERT':
+                            inserts.append(insert_from_tags(tags))
+                        else:
+                            wanted = entity_type in GEOMETRY_TYPES and resolve(layer) is not None
+                    keep_linked = wanted and entity_type == 'POLYLINE'
+
+                if wanted:
+                    entity = load_entity(tags)
+                    # VERTEX/SEQEND are attached to the queued POLYLINE by the linker
+                    if not linked_entity(entity):
+                        if queued is not None:
+                            yield queued
+                        queued = entity
+
+            if value == 'ENDSEC':
+                if section == 'ENTITIES':
+                    break
+                section = None
+                prev_code, prev_value = code, value
+                tags = []
+                continue
+            tags = [tag]
+
+    if queued is not None:
+        yield queued
+
+
+def _build_polygons(rings, batches=(), repair_invalid=False):
+    """Build the polygons of one target layer in bulk.
+
+    ``rings`` are ``(points, layer)`` pairs of single entities and ``batches``
+    ``(coords, counts, layer)`` runs of rings placed from blocks. Invalid
+    polygons are dropped, or with ``repair_invalid`` replaced in place by the
+    polygonal parts of ``shapely.make_valid``.
+    """
+    if not rings and not batches:
+        return np.empty(0, dtype=object)
+
+    chunk_counts = [np.fromiter((len(points) for points, _ in rings), dtype=np.intp, count=len(rings))]
+    chunk_counts += [counts for _, counts, _ in batches]
+    chunk_layers = [layer for _, layer in rings] + [layer for _, _, layer in batches]
+    chunk_sizes = [1] * len(rings) + [len(counts) for _, counts, _ in batches]
+    counts = np.concatenate(chunk_counts)
+    coords = np.concatenate(
+        [np.asarray(points, dtype=float) for points, _ in rings] + [coords for coords, _, _ in batches]
+    )
+    polygons = shapely.polygons(shapely.linearrings(coords, indices=np.repeat(np.arange(len(counts)), counts)))
+
+    valid = shapely.is_valid(polygons)
+    if valid.all():
+        return polygons
+
+    ring_layers = np.repeat(np.array(chunk_layers, dtype=object), chunk_sizes)
+    invalid_layers = sorted(set(ring_layers[~valid]))
+    if not repair_invalid:
+        logger.warning(f"Dropped {int((~valid).sum())} invalid polygons in layers {invalid_layers}")
+        return polygons[valid]
+
+    logger.warning(f"Repairing {int((~valid).sum())} invalid polygons in layers {invalid_layers}")
+    repaired = shapely.make_valid(polygons[~valid])
+    # make_valid may return multi-part or mixed collections; keep the polygon parts
+    parts, owners = shapely.get_parts(repaired, return_index=True)
+    parts, part_owners = shapely.get_parts(parts, return_index=True)
+    owners = owners[part_owners]
+    is_polygon = shapely.get_type_id(parts) == shapely.GeometryType.POLYGON
+    is_polygon &= ~shapely.is_empty(parts)
+
+    # Put each repaired part back at the position of the polygon it came from
+    positions = np.concatenate([np.flatnonzero(valid), np.flatnonzero(~valid)[owners[is_polygon]]])
+    merged = np.concatenate([polygons[valid], parts[is_polygon]])
+    return merged[np.argsort(positions, kind='stable')]
+
+
+def _casetones_info(casetones):
+    """Per-caseton bounds and area, as returned before the instanced form existed."""
+    bounds = shapely.bounds(casetones).reshape(-1, 4)
+    minx, miny, maxx, maxy = (bounds[:, i].tolist() for i in range(4))
+    dist_x = (bounds[:, 2] - bounds[:, 0]).tolist()
+    dist_y = (bounds[:, 3] - bounds[:, 1]).tolist()
+    caseton_areas = shapely.area(casetones).tolist()
+    return [
+        {
+            "id": i,
+            "x_min": minx[i],
+            "x_max": maxx[i],
+            "distX": dist_x[i],
+            "y_min": miny[i],
+            "y_max": maxy[i],
+            "distY": dist_y[i],
+            "area": caseton_areas[i]
         }
-        
-        # Initialize layers dictionary
-        LAYERS = {
+        for i in range(len(casetones))
+    ]
+
+
+def process_dxf_file(filepath, streaming=True, repair_invalid=False, layer_resolver=None, instanced=True,
+                     chord_tolerance=DEFAULT_CHORD_TOLERANCE):
+    """Process DXF file and extract slab geometry
+
+    ``filepath`` is a path or the file's bytes. With ``streaming`` (the default) ASCII files are read with a tag-level
+    reader that only materializes the geometry on mapped layers; binary DXF
+    files and ``streaming=False`` load the full document with ezdxf.
+    Layer names are classified with ``layer_resolver`` (the built-in
+    LAYER_MAPPING by default).
+
+    With ``instanced`` casetones are returned as prototypes plus grids or
+    translations in ``geometria.casetonesInstanciados``; otherwise every
+    caseton is listed in ``casetones`` and ``geometria.superficieCasetones``.
+
+    Circles and bulged polyline segments are tessellated to ``chord_tolerance``
+    (drawing units) or a fraction of the radius, whichever is larger (see
+    ``arcs.arc_segments``), with their exact areas preserved.
+    """
+    try:
+        # Closed rings per target layer, as (points, source layer); polygons are built in bulk
+        RINGS = {
             "superficieTotal": [],
             "superficieVacios": [],
             "superficieMacizos": [],
             "superficieCasetones": []
         }
         
-        # Read DXF
-        logger.info(f"Reading DXF file: {filepath}")
-        doc = ezdxf.readfile(filepath)
-        msp = doc.modelspace()
-        
+        layer_resolver = layer_resolver or DEFAULT_LAYER_RESOLVER
+        resolve = layer_resolver.bind()
+
         # Count entities by type for debugging
         entity_counts = {}
         found_layers = set()
-        
-        for entity in msp:
-            entity_type = entity.dxftype()
-            entity_counts[entity_type] = entity_counts.get(entity_type, 0) + 1
-            
-            # Get layer name
-            if hasattr(entity.dxf, 'layer'):
-                layer = entity.dxf.layer
-                found_layers.add(layer)
-                
-                # Check if this layer matches any of our expected layers
-                for target_layer, variations in LAYER_MAPPING.items():
-                    if layer in variations:
-                        if entity_type in ["LWPOLYLINE", "POLYLINE"]:
-                            try:
-                                if entity_type == "LWPOLYLINE":
-                                    puntos = [(p[0], p[1]) for p in entity.get_points()]
-                                    is_closed = entity.closed
-                                else:  # POLYLINE
-                                    puntos = [(p[0], p[1]) for p in entity.vertices]
-                                    is_closed = entity.is_closed if hasattr(entity, 'is_closed') else entity.closed
-                                
-                                if is_closed and len(puntos) >= 3:
-                                    poly = Polygon(puntos)
-                                    if poly.is_valid:
-                                        LAYERS[target_layer].append(poly)
-                                        logger.info(f"Added polygon to {target_layer} from layer '{layer}': {len(puntos)} points, area={poly.area:.2f}")
-                                    else:
-                                        logger.warning(f"Invalid polygon in layer '{layer}'")
-                                else:
-                                    logger.warning(f"Entity not closed or insufficient points in layer '{layer}'")
-                            except Exception as e:
-                                logger.error(f"Error processing entity in layer '{layer}': {str(e)}")
-                        
-                        # Also check for CIRCLE entities that might represent casetones
-                        elif entity_type == "CIRCLE" and target_layer == "superficieCasetones":
-                            try:
-                                center = entity.dxf.center
-                                radius = entity.dxf.radius
-                                # Approximate circle as polygon with many points
-                                import math
-                                num_points = 32
-                                puntos = []
-                                for i in range(num_points):
-                                    angle = 2 * math.pi * i / num_points
-                                    x = center[0] + radius * math.cos(angle)
-                                    y = center[1] + radius * math.sin(angle)
-                                    puntos.append((x, y))
-                                
-                                poly = Polygon(puntos)
-                                if poly.is_valid:
-                                    LAYERS[target_layer].append(poly)
-                                    logger.info(f"Added circle to {target_layer} from layer '{layer}': radius={radius:.2f}, area={poly.area:.2f}")
-                            except Exception as e:
-                                logger.error(f"Error processing circle in layer '{layer}': {str(e)}")
-        
+        ring_of = functools.partial(_entity_ring, chord_tolerance=chord_tolerance)
+        blocks = BlockLibrary(ring_of, GEOMETRY_TYPES)
+        inserts = []
+
+        # Read DXF
+        if _is_in_memory(filepath):
+            logger.info(f"Reading DXF from memory ({len(filepath)} bytes)")
+        else:
+            logger.info(f"Reading DXF file: {filepath}")
+        use_streaming = streaming and not _is_binary_source(filepath)
+        if use_streaming:
+            entities = _iter_streamed_entities(filepath, resolve, entity_counts, found_layers, blocks, inserts)
+        else:
+            entities = _iter_document_entities(filepath, resolve, entity_counts, found_layers, blocks, inserts)
+
+        for entity in entities:
+            # Check if this layer matches any of our expected layers
+            target_layer = resolve(entity.dxf.layer)
+            if target_layer is None:
+                continue
+            # CIRCLE entities only represent casetones
+            if entity.dxftype() == "CIRCLE" and target_layer != "superficieCasetones":
+                continue
+            puntos = ring_of(entity)
+            if puntos is not None:
+                RINGS[target_layer].append((puntos, entity.dxf.layer))
+
+        # Block references: each definition is read once, every placement is one affine transform
+        BATCHES = {target_layer: [] for target_layer in RINGS}
+        for target_layer, coords, counts, layer in blocks.expand(inserts, resolve):
+            BATCHES[target_layer].append((coords, counts, layer))
+
+        LAYERS = {
+            target_layer: _build_polygons(rings, BATCHES[target_layer], repair_invalid)
+            for target_layer, rings in RINGS.items()
+        }
+
         logger.info(f"Entity types found: {entity_counts}")
         logger.info(f"All layers found in DXF: {sorted(found_layers)}")
         
@@ -99,8 +376,8 @@ def process_dxf_file(filepath):
         errors = []
         warnings = []
         
-        if len(LAYERS["superficieTotal"]) != 1:
-            errors.append(f"Debe existir exactamente un polígono en superficieTotal (encontrados: {len(LAYERS['superficieTotal'])})")
+        if len(LAYERS["superficieTotal"]) < 1:
+            errors.append(f"Debe existir al menos un polígono en superficieTotal (encontrados: {len(LAYERS['superficieTotal'])})")
             # Suggest possible matching layers
             possible_total_layers = [l for l in found_layers if any(v in l.lower() for v in ['total', 'contorno', 'perimetro', 'borde'])]
             if possible_total_layers:
@@ -116,28 +393,18 @@ def process_dxf_file(filepath):
         # Log layer information
         for layer_name, polygons in LAYERS.items():
             logger.info(f"Layer {layer_name}: {len(polygons)} polygons")
-        
-        # Process casetones
-        casetones_info = []
-        
-        for i, poly in enumerate(LAYERS["superficieCasetones"], start=0):
-            minx, miny, maxx, maxy = poly.bounds
-            
-            info = {
-                "id": i,
-                "x_min": minx,
-                "x_max": maxx,
-                "distX": maxx - minx,
-                "y_min": miny,
-                "y_max": maxy,
-                "distY": maxy - miny,
-                "area": poly.area
-            }
-            casetones_info.append(info)
+
+        # Every superficieTotal outline is a slab: casetones are de-duplicated and clipped
+        # to its usable area, then its exact areas are measured
+        losas = compute_slabs(LAYERS)
+        LAYERS["superficieCasetones"] = losas.casetones
+        validacion = losas.validation
+        warnings.extend(losas.warnings)
+        warnings.extend(validation_warnings(validacion))
         
         # Calculate void and solid areas
-        areas_vacios = [p.area for p in LAYERS["superficieVacios"]]
-        areas_macizos = [p.area for p in LAYERS["superficieMacizos"]]
+        areas_vacios = shapely.area(LAYERS["superficieVacios"]).tolist()
+        areas_macizos = shapely.area(LAYERS["superficieMacizos"]).tolist()
         
         area_total_vacios = sum(areas_vacios)
         area_total_macizos = sum(areas_macizos)
@@ -145,7 +412,7 @@ def process_dxf_file(filepath):
         # Prepare output
         salida = {
             "areas": {
-                "superficieTotal": LAYERS["superficieTotal"][0].area if LAYERS["superficieTotal"] else 0.0,
+                "superficieTotal": float(shapely.area(LAYERS["superficieTotal"]).sum()),
                 "superficieVacios": {
                     "individuales": areas_vacios,
                     "total": area_total_vacios
@@ -153,34 +420,44 @@ def process_dxf_file(filepath):
                 "superficieMacizos": {
                     "individuales": areas_macizos,
                     "total": area_total_macizos
-                }
+                },
+                "losa": losas.areas
             },
-            "casetones": casetones_info,
+            "losas": losas.slabs,
             "errores": errors,
             "warnings": warnings,
+            "validacionCasetones": validacion,
             "debug_info": {
                 "entity_counts": entity_counts,
                 "layers_found": sorted(found_layers),
-                "layer_mapping": LAYER_MAPPING
+                "layer_mapping": layer_resolver.describe(),
+                "layer_rules": layer_resolver.rules,
+                "layer_profile": layer_resolver.profile,
+                "reader": "streaming" if use_streaming else "document"
             }
         }
         
         # Serialize geometries
         def serializar_poligonos(polys):
-            salida = []
-            for i, poly in enumerate(polys, start=0):
-                salida.append({
-                    "id": i,
-                    "coordenadas": list(poly.exterior.coords)
-                })
-            return salida
+            coords, index = shapely.get_coordinates(shapely.get_exterior_ring(polys), return_index=True)
+            splits = np.flatnonzero(np.diff(index)) + 1
+            return [
+                {"id": i, "coordenadas": ring.tolist()}
+                for i, ring in enumerate(np.split(coords, splits) if len(coords) else [])
+            ]
         
         geometria = {
             "superficieTotal": serializar_poligonos(LAYERS["superficieTotal"]),
             "superficieVacios": serializar_poligonos(LAYERS["superficieVacios"]),
-            "superficieMacizos": serializar_poligonos(LAYERS["superficieMacizos"]),
-            "superficieCasetones": serializar_poligonos(LAYERS["superficieCasetones"])
+            "superficieMacizos": serializar_poligonos(LAYERS["superficieMacizos"])
         }
+
+        # Process casetones
+        if instanced:
+            geometria["casetonesInstanciados"] = build_caseton_instances(LAYERS["superficieCasetones"])
+        else:
+            geometria["superficieCasetones"] = serializar_poligonos(LAYERS["superficieCasetones"])
+            salida["casetones"] = _casetones_info(LAYERS["superficieCasetones"])
         
         salida["geometria"] = geometria
         
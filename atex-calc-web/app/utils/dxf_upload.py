@@ -0,0 +1,176 @@
+import hashlib
+import io
+import os
+import tempfile
+import zlib
+from typing import BinaryIO, Iterator, Optional, Union
+
+import zstandard
+
+CHUNK_SIZE = 64 * 1024
+DEFAULT_MEMORY_THRESHOLD = 4 * 1024 * 1024
+DEFAULT_MAX_DXF_BYTES = 128 * 1024 * 1024
+
+COMPRESSED_SUFFIXES = {'.gz': 'gzip', '.zst': 'zstd'}
+
+
+class UploadError(ValueError):
+    """The upload is not acceptable; the message is safe to show to the user."""
+
+
+def upload_encoding(filename: str, content_encoding: Optional[str] = None) -> Optional[str]:
+    """Compression of an upload, from its Content-Encoding or a ``.dxf.gz``/``.dxf.zst`` name."""
+    content_encoding = (content_encoding or '').strip().lower()
+    if content_encoding in ('gzip', 'x-gzip'):
+        return 'gzip'
+    if content_encoding == 'zstd':
+        return 'zstd'
+    if content_encoding not in ('', 'identity'):
+        raise UploadError(f'Content-Encoding no soportado: {content_encoding}')
+    _, suffix = os.path.splitext(filename.lower())
+    return COMPRESSED_SUFFIXES.get(suffix)
+
+
+def dxf_filename(filename: str) -> str:
+    """Upload name without its compression suffix (``plano.dxf.gz`` -> ``plano.dxf``)."""
+    root, suffix = os.path.splitext(filename)
+    return root if suffix.lower() in COMPRESSED_SUFFIXES else filename
+
+
+def iter_decoded_chunks(stream: BinaryIO, encoding: Optional[str] = None,
+                        chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Read ``stream`` in fixed-size chunks, decompressing gzip or zstd on the fly."""
+    if encoding is None:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    if encoding == 'zstd':
+        reader = zstandard.ZstdDecompressor().stream_reader(stream, read_size=chunk_size, read_across_frames=True)
+        try:
+            while True:
+                chunk = reader.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+        except zstandard.ZstdError as e:
+            raise UploadError(f'Archivo zstd inválido: {str(e)}')
+
+    # gzip, possibly several concatenated members
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    member_started = False
+    try:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            while chunk:
+                member_started = True
+                # Bounded output per call keeps memory flat even for highly compressible input
+                data = decompressor.decompress(chunk, chunk_size)
+                if data:
+                    yield data
+                chunk = decompressor.unconsumed_tail
+                if decompressor.eof:
+                    # Input past the end of this member (the next member) is all in unused_data
+                    chunk = decompressor.unused_data
+                    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                    member_started = False
+    except zlib.error as e:
+        raise UploadError(f'Archivo gzip inválido: {str(e)}')
+    if member_started:
+        raise UploadError('Archivo gzip incompleto')
+
+
+class SpooledDxfUpload:
+    """Uploaded DXF bytes held in memory up to ``memory_threshold``, spooled to a file beyond.
+
+    Chunks are hashed as they arrive (``digest`` feeds the result-cache key)
+    and the total is capped at ``max_bytes`` after decompression. ``source``
+    is what ``process_dxf_file`` takes: the bytes, or the spool file's path.
+    After ``save_to`` the upload belongs to the new path and ``discard`` does nothing.
+    """
+
+    def __init__(self, directory: str, memory_threshold: int = DEFAULT_MEMORY_THRESHOLD,
+                 max_bytes: int = DEFAULT_MAX_DXF_BYTES):
+        self.directory = directory
+        self.memory_threshold = memory_threshold
+        self.max_bytes = max_bytes
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self._buffer: Optional[io.BytesIO] = io.BytesIO()
+        self._spool_path: Optional[str] = None
+        self._file = None
+
+    @classmethod
+    def receive(cls, stream: BinaryIO, directory: str, encoding: Optional[str] = None,
+                memory_threshold: int = DEFAULT_MEMORY_THRESHOLD,
+                max_bytes: int = DEFAULT_MAX_DXF_BYTES) -> 'SpooledDxfUpload':
+        upload = cls(directory, memory_threshold=memory_threshold, max_bytes=max_bytes)
+        try:
+            for chunk in iter_decoded_chunks(stream, encoding):
+                upload.write(chunk)
+            upload.finish()
+        except BaseException:
+            upload.discard()
+            raise
+        return upload
+
+    @classmethod
+    def from_file(cls, path: str, digest, directory: Optional[str] = None) -> 'SpooledDxfUpload':
+        """Take over an already assembled, uncompressed file whose bytes were fed to ``digest``."""
+        upload = cls(directory or os.path.dirname(path))
+        upload.digest = digest
+        upload.size = os.path.getsize(path)
+        upload._buffer = None
+        upload._spool_path = path
+        return upload
+
+    @property
+    def in_memory(self) -> bool:
+        return self._buffer is not None
+
+    def write(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise UploadError(f'El archivo DXF supera el máximo de {self.max_bytes // (1024 * 1024)} MB')
+        self.digest.update(chunk)
+        if self._file is None and self.size > self.memory_threshold:
+            fd, self._spool_path = tempfile.mkstemp(dir=self.directory, suffix='.dxf.part')
+            self._file = os.fdopen(fd, 'wb')
+            self._file.write(self._buffer.getbuffer())
+            self._buffer = None
+        if self._file is not None:
+            self._file.write(chunk)
+        else:
+            self._buffer.write(chunk)
+
+    def finish(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @property
+    def source(self) -> Union[bytes, str]:
+        return self._buffer.getvalue() if self.in_memory else self._spool_path
+
+    def save_to(self, path: str) -> None:
+        """Persist the upload at ``path`` (a rename when it is already spooled to disk)."""
+        if self.in_memory:
+            with open(path, 'wb') as fp:
+                fp.write(self._buffer.getbuffer())
+        else:
+            os.replace(self._spool_path, path)
+        self._buffer = None
+        self._spool_path = None
+
+    def discard(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._spool_path is not None and os.path.exists(self._spool_path):
+            os.remove(self._spool_path)
+        self._spool_path = None
+        self._buffer = None
@@ -3,11 +3,18 @@ import io
 from typing import Dict, List, Tuple
 
 import matplotlib
+import numpy as np
 
 # Use non-interactive backend for server environments
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import matplotlib.patches as mpatches
+from matplotlib.collections import PolyCollection
+
+from app.utils.caseton_instances import expand_translations, instance_rings
+
+# Above this many casetones the preview skips per-caseton labels
+MAX_NUMBERED_CASETONES = 200
 
 LAYER_COLORS = {
     "superficieTotal": "#4F6F52",
@@ -77,6 +84,39 @@ def _plot_casetones(ax, casetones: List[Dict]):
         ax.add_patch(rect)
 
 
+def _plot_caseton_instances(ax, instances: Dict):
+    """Draw instanced casetones with two collections instead of one artist per caseton."""
+    coords, counts = instance_rings(instances)
+    if not len(counts):
+        return
+    rings = np.split(coords, np.cumsum(counts)[:-1])
+    ax.add_collection(PolyCollection(
+        rings, facecolors=LAYER_COLORS["superficieCasetones"], alpha=0.55, edgecolors="black", linewidths=0.8
+    ))
+
+    prototype_ids, translations = expand_translations(instances)
+    sizes = np.array([[p["distX"], p["distY"]] for p in instances["prototipos"]], dtype=float)[prototype_ids]
+    corners = np.array([[0.0, 0.0], [1.0, 0.0], [1.0, 1.0], [0.0, 1.0]])
+    rectangles = translations[:, None, :] + corners[None, :, :] * sizes[:, None, :]
+    ax.add_collection(PolyCollection(
+        rectangles, facecolors="#93c5fd", alpha=0.65, edgecolors="#1f2937", linewidths=0.6
+    ))
+
+    if len(counts) <= MAX_NUMBERED_CASETONES:
+        for i, ring in enumerate(rings):
+            cx, cy = ring[:-1].mean(axis=0)
+            ax.text(
+                cx,
+                cy,
+                f"P{i}",
+                fontsize=9,
+                ha="center",
+                va="center",
+                bbox=dict(boxstyle="round,pad=0.2", facecolor="white", edgecolor="black", linewidth=0.6),
+            )
+    ax.autoscale_view()
+
+
 def generate_geometry_preview(geometry_result: Dict) -> Dict:
     """Generate a PNG preview of the DXF geometry and return as base64."""
     geometry_data = geometry_result.get("geometria", {})
@@ -100,6 +140,9 @@ def generate_geometry_preview(geometry_result: Dict) -> Dict:
     if casetones_info:
         _plot_casetones(ax, casetones_info)
 
+    if geometry_data.get("casetonesInstanciados"):
+        _plot_caseton_instances(ax, geometry_data["casetonesInstanciados"])
+
     ax.set_aspect("equal", adjustable="box")
     ax.set_title("Distribución geométrica del DXF", fontsize=14, color="#0f172a", pad=16)
     ax.set_xlabel("X (m)")
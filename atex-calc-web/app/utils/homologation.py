@@ -1,8 +1,15 @@
+import copy
+import os
 import sqlite3
-import re
-from typing import List, Dict, Optional
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from typing import List, Dict, Optional, Tuple
 
-from app.utils.section_plotter import generate_section_plot
+import numpy as np
+
+from app.utils.caseton_catalog import get_caseton_catalog
+from app.utils.section_plotter import compute_section_properties, compute_section_properties_batch
 
 DEFAULT_BF_CM = 80.0
 DEFAULT_BS_CM = 12.0
@@ -12,69 +19,64 @@ DEFAULT_HF_CM = 5.0
 
 HF_OPTIONS_CM = [5.0, 6.0, 7.0, 7.5, 8.0, 9.0, 10.0, 11.0, 12.0]
 
+HOMOLOGATION_MODES = ('full', 'minimum', 'pareto')
+SOLVER_TOLERANCE_CM = 1e-4
+
+HOMOLOGATION_CACHE_SIZE = int(os.getenv('HOMOLOGATION_CACHE_SIZE', '256'))
+HOMOLOGATION_RATIO_DECIMALS = 6
+
+
+class _ResultCache:
+    """Thread-safe LRU of scored homologation results with hit/miss counters."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+            }
 
-def _normalize_caseton_name(value: Optional[str]) -> str:
-    if not value:
-        return ''
-    normalized = str(value).strip().lower()
-    normalized = normalized.replace('á', 'a').replace('é', 'e').replace('í', 'i').replace('ó', 'o').replace('ú', 'u')
-    normalized = normalized.replace('atex', '')
-    normalized = normalized.replace('casetón', '').replace('caseton', '')
-    normalized = normalized.replace(' ', '')
-    normalized = normalized.replace('-', '')
-    return normalized
-
-
-_CASETON_NAME_PATTERN = re.compile(
-    r'^(?P<w>\d+(?:[\.,]\d+)?)(?P<suffix>[a-z]+)?x(?P<h>\d+(?:[\.,]\d+)?)$'
-)
-
-
-def _expand_caseton_keys(value: Optional[str]) -> List[str]:
-    normalized = _normalize_caseton_name(value)
-    if not normalized:
-        return []
-
-    keys = {normalized}
-    match = _CASETON_NAME_PATTERN.match(normalized)
-    if not match:
-        return list(keys)
-
-    raw_w = match.group('w')
-    raw_h = match.group('h')
-    suffix = match.group('suffix') or ''
-    try:
-        w = float(raw_w.replace(',', '.'))
-        h = float(raw_h.replace(',', '.'))
-    except ValueError:
-        return list(keys)
-
-    def _add_variant(w_value: float, h_value: float, suffix_value: str) -> None:
-        w_int = int(round(w_value))
-        h_int = int(round(h_value))
-        keys.add(_normalize_caseton_name(f"{w_int}{suffix_value}x{h_int}"))
-        keys.add(_normalize_caseton_name(f"{w_int}x{h_int}"))
-
-    _add_variant(w, h, suffix)
-
-    if w >= 200 and h >= 200:
-        _add_variant(w / 10.0, h / 10.0, suffix)
-
-    if w <= 200 and h <= 200:
-        _add_variant(w * 10.0, h * 10.0, suffix)
 
-    return list(keys)
+_result_cache = _ResultCache(HOMOLOGATION_CACHE_SIZE)
 
 
-def _fetch_casetones(database_path: str) -> List[tuple]:
-    conn = sqlite3.connect(database_path)
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT id, name, side1, side2, height, bw, bs, system, consumption, rental_price FROM casetones ORDER BY name"
-    )
-    rows = cursor.fetchall()
-    conn.close()
-    return rows
+def homologation_cache_stats() -> Dict:
+    """Return hit/miss counters of this process' homologation result cache."""
+    return _result_cache.stats()
 
 
 def _build_properties(section_metrics: Optional[Dict]) -> Optional[List[Dict]]:
@@ -104,7 +106,7 @@ def _derive_section_metrics(section_metrics: Optional[Dict], fallback_params: Op
     hf_cm = float(params.get('hf_cm') or params.get('hf') or DEFAULT_HF_CM)
     he_cm = hv_cm + hf_cm
 
-    section = generate_section_plot('aligerada', bf_cm, bs_cm, bw_cm, hv_cm, hf_cm, he_cm)
+    section = compute_section_properties('aligerada', bf_cm, bs_cm, bw_cm, hv_cm, hf_cm, he_cm)
     return {
         'bf_cm': bf_cm,
         'bs_cm': bs_cm,
@@ -120,6 +122,359 @@ def _derive_section_metrics(section_metrics: Optional[Dict], fallback_params: Op
     }
 
 
+def _build_option(candidate: tuple, hf_cm: float, inertia: float, value_ratio: float, consumption: float, check: bool) -> Dict:
+    caseton_id, name, system_label, bf_cm, bs_cm, bw_cm, hv_cm, _, rental_price = candidate
+    return {
+        'caseton_id': caseton_id,
+        'caseton': name,
+        'caseton_label': f"{int(round(bf_cm))}x{int(round(hv_cm))}",
+        'bf_cm': bf_cm,
+        'bs_cm': bs_cm,
+        'bw_cm': bw_cm,
+        'hv_cm': hv_cm,
+        'hf_cm': hf_cm,
+        'slab_height_cm': hv_cm + hf_cm,
+        'inertia_cm4': inertia,
+        'value_ratio': value_ratio,
+        'consumption_m3_m2': consumption,
+        'rental_price': rental_price,
+        'system': system_label,
+        'check': check,
+    }
+
+
+def _compute_section_grid(candidates: List[tuple], hf_options: List[float]):
+    """Score every caseton x hf combination in a single vectorized pass.
+
+    Returns (properties, consumptions) as flat arrays in caseton-major order.
+    """
+    hf_count = len(hf_options)
+    dimensions = np.array([candidate[3:8] for candidate in candidates], dtype=float)
+    bf_arr, bs_arr, bw_arr, hv_arr, consumption_arr = (np.repeat(dimensions[:, i], hf_count) for i in range(5))
+    hf_arr = np.tile(np.asarray(hf_options, dtype=float), len(candidates))
+
+    properties = compute_section_properties_batch('aligerada', bf_arr, bs_arr, bw_arr, hv_arr, hf_arr)
+    consumptions = consumption_arr + np.maximum((hf_arr / 100.0) - 0.05, 0.0)
+    return properties, consumptions
+
+
+def _score_candidates(candidates: List[tuple], hf_options: List[float], target_value_ratio: Optional[float]):
+    properties, consumptions = _compute_section_grid(candidates, hf_options)
+    if target_value_ratio is None:
+        checks = np.ones(consumptions.shape, dtype=bool)
+    else:
+        checks = properties.value_ratio <= target_value_ratio
+
+    inertias = properties.inertia_cm4.tolist()
+    value_ratios = properties.value_ratio.tolist()
+    consumptions_list = consumptions.tolist()
+    checks_list = checks.tolist()
+
+    options: List[Dict] = []
+    hf_count = len(hf_options)
+    for i, candidate in enumerate(candidates):
+        for j, hf_cm in enumerate(hf_options):
+            k = i * hf_count + j
+            options.append(_build_option(candidate, hf_cm, inertias[k], value_ratios[k], consumptions_list[k], checks_list[k]))
+
+    recommended_option = None
+    if checks.any():
+        # argmin keeps the first option on ties, matching catalog order
+        passing = np.where(checks, consumptions, np.inf)
+        recommended_option = options[int(np.argmin(passing))]
+    return options, recommended_option
+
+
+def solve_minimum_hf(candidates: List[tuple], target_value_ratio: float, hf_min: float, hf_max: float, tolerance: float = SOLVER_TOLERANCE_CM) -> np.ndarray:
+    """Find, per caseton, the smallest hf in [hf_min, hf_max] whose value ratio meets the target.
+
+    The centroidal inertia grows monotonically with hf, so all casetones are
+    bisected together, one batched section evaluation per iteration. Casetones
+    that cannot reach the target within hf_max get NaN.
+    """
+    dimensions = np.array([candidate[3:7] for candidate in candidates], dtype=float)
+    bf_arr, bs_arr, bw_arr, hv_arr = (dimensions[:, i] for i in range(4))
+
+    def _passes(hf_arr: np.ndarray) -> np.ndarray:
+        return compute_section_properties_batch('aligerada', bf_arr, bs_arr, bw_arr, hv_arr, hf_arr).value_ratio <= target_value_ratio
+
+    lo = np.full(len(candidates), float(hf_min))
+    hi = np.full(len(candidates), float(hf_max))
+    passes_at_min = _passes(lo)
+    reachable = _passes(hi)
+
+    iterations = int(np.ceil(np.log2(max(hf_max - hf_min, tolerance) / tolerance)))
+    for _ in range(iterations):
+        mid = 0.5 * (lo + hi)
+        passes = _passes(mid)
+        hi = np.where(passes, mid, hi)
+        lo = np.where(passes, lo, mid)
+
+    return np.where(passes_at_min, hf_min, np.where(reachable, hi, np.nan))
+
+
+def _solve_candidates(candidates: List[tuple], hf_options: List[float], target_value_ratio: Optional[float]):
+    """Return one option per caseton at its minimum allowed hf that meets the target."""
+    allowed_hf = np.unique(np.asarray(hf_options, dtype=float))
+    if target_value_ratio is None:
+        hf_required = np.full(len(candidates), allowed_hf[0])
+    else:
+        hf_required = solve_minimum_hf(candidates, target_value_ratio, allowed_hf[0], allowed_hf[-1])
+
+    # Snap up to the allowed thickness set; unreachable casetones show their thickest option
+    snap_index = np.searchsorted(allowed_hf, np.nan_to_num(hf_required, nan=np.inf) - SOLVER_TOLERANCE_CM, side='left')
+    snapped_hf = allowed_hf[np.minimum(snap_index, len(allowed_hf) - 1)]
+
+    dimensions = np.array([candidate[3:8] for candidate in candidates], dtype=float)
+    properties = compute_section_properties_batch(
+        'aligerada', dimensions[:, 0], dimensions[:, 1], dimensions[:, 2], dimensions[:, 3], snapped_hf
+    )
+    consumptions = dimensions[:, 4] + np.maximum((snapped_hf / 100.0) - 0.05, 0.0)
+    if target_value_ratio is None:
+        checks = np.ones(len(candidates), dtype=bool)
+    else:
+        checks = properties.value_ratio <= target_value_ratio
+
+    options: List[Dict] = []
+    for i, candidate in enumerate(candidates):
+        option = _build_option(
+            candidate,
+            float(snapped_hf[i]),
+            float(properties.inertia_cm4[i]),
+            float(properties.value_ratio[i]),
+            float(consumptions[i]),
+            bool(checks[i]),
+        )
+        option['hf_required_cm'] = None if np.isnan(hf_required[i]) else float(hf_required[i])
+        options.append(option)
+
+    recommended_option = None
+    if checks.any():
+        passing = np.where(checks, consumptions, np.inf)
+        recommended_option = options[int(np.argmin(passing))]
+    return options, recommended_option
+
+
+def pareto_frontier(options: List[Dict]) -> List[Dict]:
+    """Return the options not dominated on consumption, slab height and rental price.
+
+    Sort-and-sweep: options are visited by ascending consumption while a
+    staircase of (slab height, rental price) keeps the best trade-offs seen so
+    far, so each option is checked with a binary search.
+    """
+    ordered = sorted(options, key=lambda item: (item['consumption_m3_m2'], item['slab_height_cm'], item['rental_price']))
+    heights: List[float] = []
+    rentals: List[float] = []
+    frontier: List[Dict] = []
+    for option in ordered:
+        height = option['slab_height_cm']
+        rental = option['rental_price']
+        position = bisect_right(heights, height) - 1
+        if position >= 0 and rentals[position] <= rental:
+            continue
+        frontier.append(option)
+        start = bisect_left(heights, height)
+        end = start
+        while end < len(heights) and rentals[end] >= rental:
+            end += 1
+        heights[start:end] = [height]
+        rentals[start:end] = [rental]
+    return frontier
+
+
+def _caseton_candidate(row: tuple) -> Optional[tuple]:
+    caseton_id, name, side1, side2, height, bw, bs, system_label, consumption_base, rental_price = row
+    bf_cm = float(side1) if side1 else float(side2 or 0)
+    if bf_cm <= 0:
+        return None
+    return (caseton_id, name, system_label, bf_cm, float(bs), float(bw), float(height), float(consumption_base), float(rental_price or 0.0))
+
+
+def ensure_caseton_sections(conn: sqlite3.Connection) -> None:
+    """Create the materialized caseton_sections table and its invalidation triggers."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS caseton_sections (
+            caseton_id INTEGER NOT NULL,
+            hf_cm REAL NOT NULL,
+            inertia REAL NOT NULL,
+            value_ratio REAL NOT NULL,
+            consumption REAL NOT NULL,
+            PRIMARY KEY (caseton_id, hf_cm)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_caseton_sections_value_ratio ON caseton_sections (value_ratio)")
+    # Edited or removed casetones drop their rows; refresh_caseton_sections recomputes missing ones
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS caseton_sections_on_update AFTER UPDATE ON casetones
+        BEGIN
+            DELETE FROM caseton_sections WHERE caseton_id = OLD.id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS caseton_sections_on_delete AFTER DELETE ON casetones
+        BEGIN
+            DELETE FROM caseton_sections WHERE caseton_id = OLD.id;
+        END
+    """)
+
+
+def refresh_caseton_sections(conn: sqlite3.Connection, full: bool = False) -> int:
+    """Materialize section metrics for casetones without rows in caseton_sections.
+
+    With ``full`` every row is recomputed. Returns the number of rows written.
+    """
+    ensure_caseton_sections(conn)
+    if full:
+        conn.execute("DELETE FROM caseton_sections")
+    rows = conn.execute(
+        "SELECT id, name, side1, side2, height, bw, bs, system, consumption, rental_price FROM casetones "
+        "WHERE id NOT IN (SELECT DISTINCT caseton_id FROM caseton_sections) ORDER BY name"
+    ).fetchall()
+    candidates = [candidate for candidate in (_caseton_candidate(row) for row in rows) if candidate]
+    if not candidates:
+        return 0
+
+    properties, consumptions = _compute_section_grid(candidates, HF_OPTIONS_CM)
+    caseton_ids = np.repeat([candidate[0] for candidate in candidates], len(HF_OPTIONS_CM)).tolist()
+    hf_values = HF_OPTIONS_CM * len(candidates)
+    records = list(zip(
+        caseton_ids,
+        hf_values,
+        properties.inertia_cm4.tolist(),
+        properties.value_ratio.tolist(),
+        consumptions.tolist(),
+    ))
+    conn.executemany(
+        "INSERT OR REPLACE INTO caseton_sections (caseton_id, hf_cm, inertia, value_ratio, consumption) VALUES (?, ?, ?, ?, ?)",
+        records,
+    )
+    conn.commit()
+    return len(records)
+
+
+# Catalog version each database's caseton_sections were last refreshed at
+_sections_versions: Dict[str, int] = {}
+_sections_lock = threading.Lock()
+
+
+def _ensure_sections_current(conn: sqlite3.Connection, database_path: str, catalog_version: int) -> None:
+    """Materialize missing caseton_sections rows once per catalog version, not on every read."""
+    if _sections_versions.get(database_path) == catalog_version:
+        return
+    with _sections_lock:
+        if _sections_versions.get(database_path) != catalog_version:
+            refresh_caseton_sections(conn)
+            _sections_versions[database_path] = catalog_version
+
+
+def _query_caseton_sections(database_path: str, catalog_version: int, candidates: List[tuple], hf_options: List[float],
+                            target_value_ratio: Optional[float]):
+    """Read scored options from the materialized table.
+
+    Returns None when the requested hf options are not materialized so the
+    caller can fall back to computing them.
+    """
+    if not set(hf_options).issubset(HF_OPTIONS_CM):
+        return None
+
+    candidates_by_id = {candidate[0]: candidate for candidate in candidates}
+    conn = sqlite3.connect(database_path)
+    try:
+        _ensure_sections_current(conn, database_path, catalog_version)
+        id_placeholders = ','.join('?' * len(candidates_by_id))
+        hf_placeholders = ','.join('?' * len(hf_options))
+        base_query = (
+            "SELECT s.caseton_id, s.hf_cm, s.inertia, s.value_ratio, s.consumption "
+            "FROM caseton_sections s JOIN casetones c ON c.id = s.caseton_id "
+            f"WHERE s.caseton_id IN ({id_placeholders}) AND s.hf_cm IN ({hf_placeholders}) {{condition}} "
+            "ORDER BY s.consumption, c.name, s.hf_cm"
+        )
+        params = list(candidates_by_id) + [float(hf) for hf in hf_options]
+        if target_value_ratio is None:
+            passing = conn.execute(base_query.format(condition=''), params).fetchall()
+            failing = []
+        else:
+            passing = conn.execute(base_query.format(condition='AND s.value_ratio <= ?'), params + [target_value_ratio]).fetchall()
+            failing = conn.execute(base_query.format(condition='AND s.value_ratio > ?'), params + [target_value_ratio]).fetchall()
+    finally:
+        conn.close()
+
+    options = [
+        _build_option(candidates_by_id[caseton_id], hf_cm, inertia, value_ratio, consumption, check)
+        for rows, check in ((passing, True), (failing, False))
+        for caseton_id, hf_cm, inertia, value_ratio, consumption in rows
+    ]
+    recommended_option = options[0] if passing else None
+    return options, recommended_option
+
+
+def _resolve_allowed_ids(catalog, allowed_casetones: Optional[List[str]], system_key: Optional[str], country: Optional[str]):
+    """Return (allowed caseton ids, unresolved names) for an explicit list or the country default."""
+    if allowed_casetones is not None:
+        return catalog.resolve_aliases(allowed_casetones, system_key)
+    allowed_ids = catalog.country_ids(country, system_key) if country else None
+    if allowed_ids is None:
+        allowed_ids = catalog.ids_for_system(system_key)
+    return allowed_ids, []
+
+
+def _collect_candidates(catalog, allowed_ids) -> List[tuple]:
+    candidates: List[tuple] = []
+    for record in catalog.records:
+        if record.id not in allowed_ids:
+            continue
+        candidate = _caseton_candidate(record.row)
+        if candidate is not None:
+            candidates.append(candidate)
+    return candidates
+
+
+def _score_catalog(
+    database_path: str,
+    catalog,
+    target_value_ratio: Optional[float],
+    allowed_ids,
+    hf_options: tuple,
+    mode: str,
+    top_k: Optional[int],
+    offset: int,
+    limit: Optional[int],
+) -> Dict:
+    hf_options = list(hf_options)
+    candidates = _collect_candidates(catalog, allowed_ids)
+    options: List[Dict] = []
+    recommended_option: Optional[Dict] = None
+
+    if candidates and hf_options and mode in ('minimum', 'pareto'):
+        # Thicker hf only adds consumption and height, so the frontier lives in the per-caseton minimums
+        options, recommended_option = _solve_candidates(candidates, hf_options, target_value_ratio)
+    elif candidates and hf_options:
+        scored = _query_caseton_sections(database_path, catalog.version, candidates, hf_options, target_value_ratio)
+        if scored is None:
+            scored = _score_candidates(candidates, hf_options, target_value_ratio)
+        options, recommended_option = scored
+
+    options.sort(key=lambda item: (not item['check'], item['consumption_m3_m2']))
+
+    if mode == 'pareto':
+        passing = [option for option in options if option['check']]
+        options = pareto_frontier(passing or options)
+        if top_k:
+            options = options[:top_k]
+
+    total_options = len(options)
+    if offset or limit:
+        options = options[offset:offset + limit] if limit else options[offset:]
+    next_offset = offset + len(options) if offset + len(options) < total_options else None
+
+    return {
+        'options': options,
+        'total_options': total_options,
+        'next_offset': next_offset,
+        'recommended': recommended_option,
+    }
+
+
 def generate_homologation_analysis(
     database_path: str,
     section_metrics: Optional[Dict] = None,
@@ -127,130 +482,178 @@ def generate_homologation_analysis(
     allowed_casetones: Optional[List[str]] = None,
     hf_options_cm: Optional[List[float]] = None,
     system: Optional[str] = None,
+    country: Optional[str] = None,
+    mode: str = 'full',
+    top_k: Optional[int] = None,
+    offset: int = 0,
+    limit: Optional[int] = None,
 ) -> Dict[str, Optional[Dict]]:
+    """Score the caseton catalog against the original section.
+
+    ``mode='full'`` returns every caseton x hf option; ``mode='minimum'`` solves
+    for the thinnest allowed hf per caseton and returns one option each;
+    ``mode='pareto'`` keeps only the consumption / slab height / rental price
+    frontier, optionally cut to ``top_k``. ``offset``/``limit`` page the result.
+    Without ``allowed_casetones`` the country's default availability applies.
+    """
+    if mode not in HOMOLOGATION_MODES:
+        raise ValueError(f"Modo de homologación no soportado: {mode}")
+
     derived_metrics = _derive_section_metrics(section_metrics, fallback_params)
     target_value_ratio = derived_metrics.get('value_ratio')
 
-    casetones = _fetch_casetones(database_path)
-    options: List[Dict] = []
-    recommended_option: Optional[Dict] = None
+    catalog = get_caseton_catalog(database_path)
     hf_options = list(hf_options_cm) if hf_options_cm else HF_OPTIONS_CM
     system_key = str(system).strip().lower() if system else None
 
-    allowed_keys = None
-    strict_allowed_names = None
-    if allowed_casetones is not None:
-        raw_allowed = set(
-            _normalize_caseton_name(name)
-            for name in allowed_casetones
-            if name
+    allowed_ids, unresolved_casetones = _resolve_allowed_ids(catalog, allowed_casetones, system_key, country)
+
+    rounded_target = None if target_value_ratio is None else round(float(target_value_ratio), HOMOLOGATION_RATIO_DECIMALS)
+    allowed_ids = frozenset(allowed_ids)
+    offset = max(int(offset or 0), 0)
+    cache_key = (rounded_target, allowed_ids, tuple(hf_options), system_key, catalog.version, mode, top_k, offset, limit)
+    scored = _result_cache.get(cache_key)
+    if scored is None:
+        scored = _score_catalog(
+            database_path, catalog, rounded_target, allowed_ids, tuple(hf_options), mode, top_k, offset, limit
         )
-        db_name_keys = set()
-        for row in casetones:
-            name = row[1]
-            system_label = row[7]
-            if system_key is not None and str(system_label or '').strip().lower() != system_key:
-                continue
-            db_name_keys.add(_normalize_caseton_name(name))
-
-        if raw_allowed.intersection(db_name_keys):
-            strict_allowed_names = raw_allowed
-            allowed_keys = raw_allowed
-        else:
-            expanded: List[str] = []
-            for name in allowed_casetones:
-                expanded.extend(_expand_caseton_keys(name))
-            allowed_keys = set(key for key in expanded if key)
-
-    for row in casetones:
-        (
-            caseton_id,
-            name,
-            side1,
-            side2,
-            height,
-            bw,
-            bs,
-            system_label,
-            consumption_base,
-            rental_price,
-        ) = row
-
-        if system_key is not None and str(system_label or '').strip().lower() != system_key:
-            continue
+        _result_cache.put(cache_key, scored)
+    # Callers adjust the option dicts (pricing, labels); the cached entry must stay as scored
+    scored = copy.deepcopy(scored)
+
+    return {
+        'options': scored['options'],
+        'total_options': scored['total_options'],
+        'next_offset': scored['next_offset'],
+        'recommended': scored['recommended'],
+        'target_value_ratio': target_value_ratio,
+        'hf_options_cm': hf_options,
+        'mode': mode,
+        'unresolved_casetones': unresolved_casetones,
+        'properties': _build_properties(derived_metrics),
+        'original_metrics': derived_metrics,
+    }
 
-        if strict_allowed_names is not None:
-            if _normalize_caseton_name(name) not in strict_allowed_names:
-                continue
 
-        bf_cm = float(side1) if side1 else float(side2 or 0)
-        if bf_cm <= 0:
+def _parse_section_geometry(geometry: Dict) -> Tuple[str, float, float, float, float, float, float]:
+    """Return (type, bf, bs, bw, hv, hf, he) in cm for an original slab section."""
+    def _to_float(key):
+        try:
+            return float(geometry.get(key))
+        except (TypeError, ValueError):
+            return None
+
+    section_type = str(geometry.get('type') or 'aligerada').lower()
+    if section_type == 'maciza':
+        he_cm = _to_float('h_cm')
+        if he_cm is None:
+            he_cm = _to_float('he_cm')
+        if he_cm is None or he_cm <= 0:
+            raise ValueError('Complete el espesor total de la losa maciza (h en cm).')
+        return 'maciza', 100.0, 0.0, 0.0, 0.0, 0.0, he_cm
+
+    bf_cm, bs_cm, bw_cm, hv_cm, hf_cm = (_to_float(key) for key in ('bf_cm', 'bs_cm', 'bw_cm', 'hv_cm', 'hf_cm'))
+    slab_height_cm = _to_float('slab_height_cm')
+    if hf_cm is None and slab_height_cm is not None and hv_cm is not None:
+        hf_cm = slab_height_cm - hv_cm
+    if any(v is None or v <= 0 for v in (bf_cm, bs_cm, bw_cm, hv_cm, hf_cm)):
+        raise ValueError('Complete los datos de la sección de losa original (bf, bs, bw, hv, hf en cm).')
+    return 'aligerada', bf_cm, bs_cm, bw_cm, hv_cm, hf_cm, hv_cm + hf_cm
+
+
+def _section_metrics_batch(sections: List[Tuple]) -> List[Dict]:
+    """Compute original-section metrics for many zones, one NumPy pass per section type."""
+    metrics: List[Optional[Dict]] = [None] * len(sections)
+    for section_type in ('aligerada', 'maciza'):
+        indices = [i for i, section in enumerate(sections) if section[0] == section_type]
+        if not indices:
             continue
-        hv_cm = float(height)
-        bw_cm = float(bw)
-        bs_cm = float(bs)
-        consumption_base = float(consumption_base)
-
-        if strict_allowed_names is None and allowed_keys is not None:
-            caseton_label_cm = f"{int(round(bf_cm))}x{int(round(hv_cm))}"
-            caseton_label_mm = f"{int(round(bf_cm * 10.0))}x{int(round(hv_cm * 10.0))}"
-            candidate_keys = set(_expand_caseton_keys(name))
-            candidate_keys.update(_expand_caseton_keys(caseton_label_cm))
-            candidate_keys.update(_expand_caseton_keys(caseton_label_mm))
-            if allowed_keys.isdisjoint(candidate_keys):
-                continue
-
-        for hf_cm in hf_options:
-            try:
-                section = generate_section_plot(
-                    'aligerada',
-                    bf_cm,
-                    bs_cm,
-                    bw_cm,
-                    hv_cm,
-                    hf_cm,
-                    hv_cm + hf_cm,
-                )
-            except Exception:
-                continue
-
-            value_ratio = section.value_ratio
-            check = True if target_value_ratio is None else value_ratio <= target_value_ratio
-            extra_consumption = max((hf_cm / 100.0) - 0.05, 0.0)
-            consumption = consumption_base + extra_consumption
-
-            option = {
-                'caseton_id': caseton_id,
-                'caseton': name,
-                'caseton_label': f"{int(round(bf_cm))}x{int(round(hv_cm))}",
+        dims = np.array([sections[i][1:] for i in indices], dtype=float)
+        properties = compute_section_properties_batch(section_type, *(dims[:, k] for k in range(6)))
+        for j, i in enumerate(indices):
+            _, bf_cm, bs_cm, bw_cm, hv_cm, hf_cm, he_cm = sections[i]
+            metrics[i] = {
                 'bf_cm': bf_cm,
                 'bs_cm': bs_cm,
                 'bw_cm': bw_cm,
                 'hv_cm': hv_cm,
                 'hf_cm': hf_cm,
-                'slab_height_cm': hv_cm + hf_cm,
-                'inertia_cm4': section.inertia_cm4,
-                'value_ratio': value_ratio,
-                'consumption_m3_m2': consumption,
-                'system': system_label,
-                'check': check,
+                'total_thickness_cm': he_cm,
+                'inertia_cm4': float(properties.inertia_cm4[j]),
+                'area_cm2': float(properties.area_cm2[j]),
+                'value_ratio': float(properties.value_ratio[j]),
+                'equivalent_solid_height_cm': float(properties.equivalent_solid_height_cm[j]),
+                'slab_type': section_type.capitalize(),
             }
-            options.append(option)
+    return metrics
 
-            if check:
-                if (
-                    recommended_option is None
-                    or option['consumption_m3_m2'] < recommended_option['consumption_m3_m2']
-                ):
-                    recommended_option = option
 
-    options.sort(key=lambda item: (not item['check'], item['consumption_m3_m2']))
+def generate_batch_homologation(
+    database_path: str,
+    sections: List[Dict],
+    allowed_casetones: Optional[List[str]] = None,
+    hf_options_cm: Optional[List[float]] = None,
+    system: Optional[str] = None,
+    country: Optional[str] = None,
+) -> Dict:
+    """Homologate several original sections (slab zones) against the catalog at once.
+
+    The caseton x hf grid is scored once and compared with every zone's target
+    value ratio as a (zones x options) matrix.
+    """
+    parsed = []
+    for index, geometry in enumerate(sections):
+        if not isinstance(geometry, dict):
+            raise ValueError(f"Zona {index + 1}: sección inválida")
+        try:
+            parsed.append(_parse_section_geometry(geometry))
+        except ValueError as e:
+            raise ValueError(f"Zona {index + 1}: {e}")
+    zone_metrics = _section_metrics_batch(parsed)
+
+    catalog = get_caseton_catalog(database_path)
+    hf_options = list(hf_options_cm) if hf_options_cm else HF_OPTIONS_CM
+    system_key = str(system).strip().lower() if system else None
+    allowed_ids, unresolved_casetones = _resolve_allowed_ids(catalog, allowed_casetones, system_key, country)
+    candidates = _collect_candidates(catalog, allowed_ids)
+
+    zones: List[Dict] = []
+    if candidates and hf_options:
+        properties, consumptions = _compute_section_grid(candidates, hf_options)
+        targets = np.array([metrics['value_ratio'] for metrics in zone_metrics], dtype=float)
+        checks = properties.value_ratio[np.newaxis, :] <= targets[:, np.newaxis]
+        best = np.argmin(np.where(checks, consumptions[np.newaxis, :], np.inf), axis=1)
+        passing_counts = checks.sum(axis=1)
+    else:
+        checks = None
+
+    hf_count = len(hf_options)
+    for z, metrics in enumerate(zone_metrics):
+        recommended = None
+        passing = 0
+        if checks is not None and checks[z].any():
+            k = int(best[z])
+            recommended = _build_option(
+                candidates[k // hf_count],
+                hf_options[k % hf_count],
+                float(properties.inertia_cm4[k]),
+                float(properties.value_ratio[k]),
+                float(consumptions[k]),
+                True,
+            )
+            passing = int(passing_counts[z])
+        zones.append({
+            'zone': sections[z].get('name') or f"Zona {z + 1}",
+            'target_value_ratio': metrics['value_ratio'],
+            'original_metrics': metrics,
+            'properties': _build_properties(metrics),
+            'recommended': recommended,
+            'passing_options': passing,
+        })
 
     return {
-        'options': options,
-        'recommended': recommended_option,
-        'target_value_ratio': target_value_ratio,
+        'zones': zones,
         'hf_options_cm': hf_options,
-        'properties': _build_properties(derived_metrics),
-        'original_metrics': derived_metrics,
+        'evaluated_options': len(candidates) * hf_count,
+        'unresolved_casetones': unresolved_casetones,
     }
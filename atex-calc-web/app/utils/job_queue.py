@@ -0,0 +1,405 @@
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEASE_SECONDS = 300
+DEFAULT_RESULT_TTL = 3600
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_RETRY_DELAY = 5.0
+# Workers record a heartbeat this often; one silent for three intervals counts as gone
+DEFAULT_HEARTBEAT_INTERVAL = 10.0
+
+JOB_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    files TEXT NOT NULL DEFAULT '[]',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    worker TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    run_after REAL NOT NULL,
+    locked_until REAL,
+    expires_at REAL,
+    batch TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_pending ON jobs (status, run_after);
+CREATE INDEX IF NOT EXISTS idx_jobs_expires ON jobs (expires_at);
+CREATE TABLE IF NOT EXISTS workers (
+    id TEXT PRIMARY KEY,
+    kinds TEXT NOT NULL,
+    heartbeat_at REAL NOT NULL
+);
+"""
+
+
+class JobFailed(Exception):
+    """A job handler failed in a way retrying cannot fix (bad input, resource limit)."""
+
+
+class JobQueue:
+    """Durable job queue in a SQLite file.
+
+    Producers ``enqueue`` and return the job id at once; any number of worker
+    processes (on this box, or on other nodes sharing the file) ``claim`` jobs
+    under a lease. A job whose worker dies is claimed again once its lease runs
+    out. Failed attempts are retried with exponential backoff up to
+    ``max_attempts``. Finished jobs, and the files registered with them, are
+    purged ``result_ttl`` seconds after they finish.
+    """
+
+    def __init__(self, path: str, lease_seconds: float = DEFAULT_LEASE_SECONDS,
+                 result_ttl: float = DEFAULT_RESULT_TTL, retry_delay: float = DEFAULT_RETRY_DELAY):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.result_ttl = result_ttl
+        self.retry_delay = retry_delay
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        conn = self._connect()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript(JOB_SCHEMA)
+        # Queues created before batches existed
+        if 'batch' not in {row['name'] for row in conn.execute('PRAGMA table_info(jobs)')}:
+            conn.execute('ALTER TABLE jobs ADD COLUMN batch TEXT')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_batch ON jobs (batch)')
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread and process; autocommit, transactions are explicit
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def enqueue(self, kind: str, payload: Dict, max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                files: Iterable[str] = (), batch: Optional[str] = None) -> str:
+        """Queue a job and return its id. ``files`` are removed when the job is purged;
+        jobs enqueued with the same ``batch`` id are listed together by ``batch_jobs``."""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._connect().execute(
+            """
+            INSERT INTO jobs (id, kind, status, payload, files, max_attempts, created_at, updated_at, run_after, batch)
+            VALUES (?, ?, 'queued', ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (job_id, kind, json.dumps(payload), json.dumps(list(files)), max(int(max_attempts), 1), now, now, now,
+             batch)
+        )
+        return job_id
+
+    def claim(self, kinds: Iterable[str], worker: str, batch: Optional[str] = None) -> Optional[Dict]:
+        """Lease the oldest runnable job of one of ``kinds`` (of ``batch``, if given) to ``worker``."""
+        kinds = list(kinds)
+        if not kinds:
+            return None
+        placeholders = ','.join(['?'] * len(kinds))
+        batch_filter = 'AND batch = ?' if batch is not None else ''
+        batch_args = (batch,) if batch is not None else ()
+        conn = self._connect()
+        while True:
+            now = time.time()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute(
+                    f"""
+                    SELECT id, kind, payload, attempts, max_attempts FROM jobs
+                    WHERE kind IN ({placeholders}) {batch_filter}
+                      AND ((status = 'queued' AND run_after <= ?) OR (status = 'running' AND locked_until < ?))
+                    ORDER BY run_after
+                    LIMIT 1
+                    """,
+                    (*kinds, *batch_args, now, now)
+                ).fetchone()
+                if row is None:
+                    conn.execute('COMMIT')
+                    return None
+                if row['attempts'] >= row['max_attempts']:
+                    # Its last worker died or stalled past the lease
+                    conn.execute(
+                        """
+                        UPDATE jobs SET status = 'failed', error = ?, worker = NULL, locked_until = NULL,
+                                        updated_at = ?, expires_at = ?
+                        WHERE id = ?
+                        """,
+                        ('El procesamiento fue interrumpido repetidamente', now, now + self.result_ttl, row['id'])
+                    )
+                    conn.execute('COMMIT')
+                    continue
+                conn.execute(
+                    """
+                    UPDATE jobs SET status = 'running', attempts = attempts + 1, worker = ?,
+                                    locked_until = ?, updated_at = ?
+                    WHERE id = ?
+                    """,
+                    (worker, now + self.lease_seconds, now, row['id'])
+                )
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            return {
+                'id': row['id'],
+                'kind': row['kind'],
+                'payload': json.loads(row['payload']),
+                'attempt': row['attempts'] + 1,
+                'max_attempts': row['max_attempts'],
+            }
+
+    def complete(self, job_id: str, worker: str, result, files: Iterable[str] = ()) -> bool:
+        """Store the result of a leased job; ``result`` may already be serialized JSON.
+
+        Returns False when the lease was lost (the job was handed to another worker).
+        """
+        result_json = result if isinstance(result, str) else json.dumps(result)
+        now = time.time()
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                "SELECT files FROM jobs WHERE id = ? AND worker = ? AND status = 'running'",
+                (job_id, worker)
+            ).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return False
+            all_files = json.loads(row['files']) + list(files)
+            conn.execute(
+                """
+                UPDATE jobs SET status = 'done', result = ?, error = NULL, files = ?, locked_until = NULL,
+                                updated_at = ?, expires_at = ?
+                WHERE id = ?
+                """,
+                (result_json, json.dumps(all_files), now, now + self.result_ttl, job_id)
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return True
+
+    def fail(self, job_id: str, worker: str, error: str, retry: bool = True) -> Optional[str]:
+        """Record a failed attempt; requeue it with backoff while attempts remain.
+
+        Returns the job's new status, or None when the lease was lost.
+        """
+        now = time.time()
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                "SELECT attempts, max_attempts FROM jobs WHERE id = ? AND worker = ? AND status = 'running'",
+                (job_id, worker)
+            ).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+            if retry and row['attempts'] < row['max_attempts']:
+                status = 'queued'
+                delay = self.retry_delay * (2 ** (row['attempts'] - 1))
+                conn.execute(
+                    """
+                    UPDATE jobs SET status = 'queued', error = ?, worker = NULL, locked_until = NULL,
+                                    updated_at = ?, run_after = ?
+                    WHERE id = ?
+                    """,
+                    (error, now, now + delay, job_id)
+                )
+            else:
+                status = 'failed'
+                conn.execute(
+                    """
+                    UPDATE jobs SET status = 'failed', error = ?, worker = NULL, locked_until = NULL,
+                                    updated_at = ?, expires_at = ?
+                    WHERE id = ?
+                    """,
+                    (error, now, now + self.result_ttl, job_id)
+                )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return status
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Job status; ``result`` is the stored JSON text, not decoded."""
+        row = self._connect().execute(
+            """
+            SELECT id, kind, status, result, error, attempts, max_attempts, created_at, updated_at, expires_at
+            FROM jobs WHERE id = ?
+            """,
+            (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        if job['expires_at'] is not None and job['expires_at'] <= time.time():
+            return None
+        return job
+
+    def batch_jobs(self, batch: str) -> List[Dict]:
+        """Jobs of a batch in the order they were enqueued, with their payload but without results."""
+        rows = self._connect().execute(
+            """
+            SELECT id, kind, status, payload, error, attempts, max_attempts, updated_at, expires_at
+            FROM jobs WHERE batch = ? ORDER BY created_at, rowid
+            """,
+            (batch,)
+        ).fetchall()
+        now = time.time()
+        return [
+            dict(row, payload=json.loads(row['payload']))
+            for row in rows
+            if row['expires_at'] is None or row['expires_at'] > now
+        ]
+
+    def purge_expired(self) -> int:
+        """Delete finished jobs past their TTL and the files registered with them."""
+        now = time.time()
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            rows = conn.execute(
+                'SELECT id, files FROM jobs WHERE expires_at IS NOT NULL AND expires_at <= ?', (now,)
+            ).fetchall()
+            conn.executemany('DELETE FROM jobs WHERE id = ?', [(row['id'],) for row in rows])
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        for row in rows:
+            for path in json.loads(row['files']):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        return len(rows)
+
+    def heartbeat(self, worker: str, kinds: Iterable[str]) -> None:
+        """Record that ``worker`` is alive and serving ``kinds``."""
+        self._connect().execute(
+            'INSERT OR REPLACE INTO workers (id, kinds, heartbeat_at) VALUES (?, ?, ?)',
+            (worker, json.dumps(list(kinds)), time.time())
+        )
+
+    def remove_worker(self, worker: str) -> None:
+        self._connect().execute('DELETE FROM workers WHERE id = ?', (worker,))
+
+    def has_worker(self, kind: str, max_age: float = 3 * DEFAULT_HEARTBEAT_INTERVAL) -> bool:
+        """Whether a worker serving ``kind`` sent a heartbeat in the last ``max_age`` seconds."""
+        rows = self._connect().execute(
+            'SELECT kinds FROM workers WHERE heartbeat_at >= ?', (time.time() - max_age,)
+        ).fetchall()
+        return any(kind in json.loads(row['kinds']) for row in rows)
+
+    def stats(self) -> Dict[str, int]:
+        rows = self._connect().execute('SELECT status, COUNT(*) AS n FROM jobs GROUP BY status').fetchall()
+        return {row['status']: row['n'] for row in rows}
+
+
+def default_worker_id() -> str:
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def run_worker(job_queue: JobQueue, handlers: Dict[str, Callable[[Dict], object]],
+               worker_id: Optional[str] = None, poll_interval: float = 0.5,
+               purge_interval: float = 60.0, stop: Optional[threading.Event] = None,
+               heartbeat_interval: float = DEFAULT_HEARTBEAT_INTERVAL) -> None:
+    """Claim and run jobs until ``stop`` is set.
+
+    A background thread keeps the worker's heartbeat fresh, even during long
+    jobs, so producers can tell whether anyone will pick their jobs up.
+
+    ``handlers`` maps job kinds to callables taking the job payload. A handler
+    returns the result (a JSON-serializable value or JSON text); a dict result
+    with a ``file`` key has that file removed together with the job. Raising
+    ``JobFailed`` fails the job at once, any other exception is retried.
+    """
+    worker_id = worker_id or default_worker_id()
+    stop = stop or threading.Event()
+    kinds: List[str] = list(handlers)
+    logger.info(f"Job worker {worker_id} serving {', '.join(kinds)}")
+
+    def beat():
+        while True:
+            try:
+                job_queue.heartbeat(worker_id, kinds)
+            except sqlite3.Error as e:
+                logger.warning(f"Could not record the worker heartbeat: {str(e)}")
+            if stop.wait(heartbeat_interval):
+                return
+
+    threading.Thread(target=beat, name='job-heartbeat', daemon=True).start()
+    try:
+        _serve(job_queue, handlers, worker_id, kinds, poll_interval, purge_interval, stop)
+    finally:
+        stop.set()
+        try:
+            job_queue.remove_worker(worker_id)
+        except sqlite3.Error:
+            pass
+
+
+def _serve(job_queue: JobQueue, handlers: Dict[str, Callable[[Dict], object]], worker_id: str, kinds: List[str],
+           poll_interval: float, purge_interval: float, stop: threading.Event) -> None:
+    next_purge = 0.0
+    while not stop.is_set():
+        if time.time() >= next_purge:
+            try:
+                job_queue.purge_expired()
+            except sqlite3.Error as e:
+                logger.warning(f"Could not purge expired jobs: {str(e)}")
+            next_purge = time.time() + purge_interval
+
+        try:
+            job = job_queue.claim(kinds, worker_id)
+        except sqlite3.Error as e:
+            logger.warning(f"Could not claim a job: {str(e)}")
+            job = None
+        if job is None:
+            stop.wait(poll_interval)
+            continue
+
+        run_job(job_queue, handlers, job, worker_id)
+
+
+def run_job(job_queue: JobQueue, handlers: Dict[str, Callable[[Dict], object]], job: Dict, worker_id: str) -> None:
+    """Run one claimed job with its handler and record the outcome."""
+    started = time.time()
+    try:
+        result = handlers[job['kind']](job['payload'])
+    except JobFailed as e:
+        job_queue.fail(job['id'], worker_id, str(e), retry=False)
+        logger.info(f"Job {job['id']} ({job['kind']}) failed: {str(e)}")
+        return
+    except Exception as e:
+        status = job_queue.fail(job['id'], worker_id, str(e))
+        logger.warning(f"Job {job['id']} ({job['kind']}) attempt {job['attempt']} failed, now {status}: {str(e)}")
+        return
+
+    files = [result['file']] if isinstance(result, dict) and result.get('file') else []
+    if not job_queue.complete(job['id'], worker_id, result, files=files):
+        logger.warning(f"Job {job['id']} finished after its lease expired; result discarded")
+        for path in files:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    else:
+        logger.info(f"Job {job['id']} ({job['kind']}) done in {time.time() - started:.2f}s")
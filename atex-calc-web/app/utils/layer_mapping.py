@@ -0,0 +1,242 @@
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LAYER_PROFILE = 'default'
+
+# Configuration of layers - include common variations
+LAYER_MAPPING = {
+    # Spanish variations
+    "superficieTotal": ["superficieTotal", "superficie_total", "SuperficieTotal", "TOTAL", "total", "contorno", "perimetro"],
+    "superficieVacios": ["superficieVacios", "superficie_vacios", "SuperficieVacios", "VACIOS", "vacios", "huecos"],
+    "superficieMacizos": ["superficieMacizos", "superficie_macizos", "SuperficieMacizos", "MACIZOS", "macizos", "solidos"],
+    "superficieCasetones": ["superficieCasetones", "superficie_casetones", "SuperficieCasetones", "CASETONES", "casetones", "nervios"]
+}
+
+TARGET_LAYERS = tuple(LAYER_MAPPING)
+
+
+def _layer_key(layer: str) -> str:
+    return str(layer).strip().casefold()
+
+
+class LayerResolver:
+    """Compiled layer-name -> target-layer lookup.
+
+    Exact names are matched case-insensitively through one dict; regex rules
+    (``(pattern, target)``, tried in order) only run for names the dict does
+    not know; a rule whose pattern does not compile is logged and skipped.
+    ``version`` fingerprints the mapping for cache keys.
+    """
+
+    def __init__(self, mapping: Dict[str, Sequence[str]], rules: Sequence[Tuple[str, str]] = (), profile: str = DEFAULT_LAYER_PROFILE):
+        self.profile = profile
+        self.mapping = {target: list(names) for target, names in mapping.items()}
+        self.rules = []
+        self._compiled = []
+        for pattern, target in rules:
+            try:
+                self._compiled.append((re.compile(pattern, re.IGNORECASE), target))
+            except re.error as e:
+                logger.warning(f"Skipping invalid layer pattern {pattern!r} of profile '{profile}': {str(e)}")
+                continue
+            self.rules.append((pattern, target))
+        self._exact: Dict[str, str] = {}
+        for target, names in self.mapping.items():
+            for name in names:
+                self._exact.setdefault(_layer_key(name), target)
+        fingerprint = json.dumps([self.mapping, self.rules], sort_keys=True)
+        self.version = hashlib.sha256(fingerprint.encode('utf-8')).hexdigest()[:16]
+
+    def resolve(self, layer: Optional[str]) -> Optional[str]:
+        if layer is None:
+            return None
+        target = self._exact.get(_layer_key(layer))
+        if target is not None:
+            return target
+        for pattern, rule_target in self._compiled:
+            if pattern.search(layer):
+                return rule_target
+        return None
+
+    def bind(self) -> Callable[[Optional[str]], Optional[str]]:
+        """Return a resolve function with its own memo, meant to live for one document."""
+        cache: Dict[Optional[str], Optional[str]] = {}
+
+        def resolve(layer):
+            try:
+                return cache[layer]
+            except KeyError:
+                target = cache[layer] = self.resolve(layer)
+                return target
+
+        return resolve
+
+    def describe(self) -> Dict:
+        return {target: list(names) for target, names in self.mapping.items()}
+
+
+DEFAULT_LAYER_RESOLVER = LayerResolver(LAYER_MAPPING)
+
+
+def ensure_layer_profiles(conn: sqlite3.Connection) -> None:
+    """Create the mapping profile tables and seed the default profile."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS layer_mapping_profiles (
+            name TEXT PRIMARY KEY,
+            description TEXT
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS layer_mapping_rules (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            profile TEXT NOT NULL,
+            target TEXT NOT NULL,
+            pattern TEXT NOT NULL,
+            is_regex INTEGER NOT NULL DEFAULT 0,
+            priority INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (profile) REFERENCES layer_mapping_profiles (name)
+        )
+    """)
+    inserted = conn.execute(
+        "INSERT OR IGNORE INTO layer_mapping_profiles (name, description) VALUES (?, ?)",
+        (DEFAULT_LAYER_PROFILE, 'Nombres de capa estándar ATEX')
+    ).rowcount
+    if inserted:
+        conn.executemany(
+            "INSERT INTO layer_mapping_rules (profile, target, pattern, is_regex, priority) VALUES (?, ?, ?, 0, 0)",
+            [(DEFAULT_LAYER_PROFILE, target, name) for target, names in LAYER_MAPPING.items() for name in names]
+        )
+
+
+def list_layer_profiles(database_path: str) -> List[Dict]:
+    conn = sqlite3.connect(database_path)
+    try:
+        rows = conn.execute("""
+            SELECT p.name, p.description, COUNT(r.id)
+            FROM layer_mapping_profiles p
+            LEFT JOIN layer_mapping_rules r ON r.profile = p.name
+            GROUP BY p.name
+            ORDER BY p.name
+        """).fetchall()
+    except sqlite3.OperationalError:
+        rows = []
+    finally:
+        conn.close()
+    if not rows:
+        return [{'name': DEFAULT_LAYER_PROFILE, 'description': None, 'rules': sum(len(v) for v in LAYER_MAPPING.values())}]
+    return [{'name': name, 'description': description, 'rules': count} for name, description, count in rows]
+
+
+def validate_layer_rules(rules: Sequence[Dict]) -> List[Tuple[str, str, int, int]]:
+    """Check a profile's rules (``target``, ``pattern``, ``regex``, ``priority``) before they are stored.
+
+    Returns ``(target, pattern, is_regex, priority)`` rows; raises ValueError
+    with a message for the user on unknown layers, empty or invalid patterns.
+    """
+    rows = []
+    for position, rule in enumerate(rules, start=1):
+        if not isinstance(rule, dict):
+            raise ValueError(f'Regla {position}: formato inválido')
+        target = rule.get('target')
+        pattern = rule.get('pattern')
+        if target not in TARGET_LAYERS:
+            raise ValueError(f"Regla {position}: capa destino desconocida: {target}")
+        if not isinstance(pattern, str) or not pattern.strip():
+            raise ValueError(f'Regla {position}: el patrón está vacío')
+        is_regex = bool(rule.get('regex') or rule.get('is_regex'))
+        if is_regex:
+            try:
+                re.compile(pattern, re.IGNORECASE)
+            except re.error as e:
+                raise ValueError(f'Regla {position}: expresión regular inválida {pattern!r}: {str(e)}')
+        try:
+            priority = int(rule.get('priority') or 0)
+        except (TypeError, ValueError):
+            raise ValueError(f'Regla {position}: prioridad inválida')
+        rows.append((target, pattern if is_regex else pattern.strip(), int(is_regex), priority))
+    return rows
+
+
+def save_layer_profile(database_path: str, name: str, rules: Sequence[Dict], description: Optional[str] = None) -> Dict:
+    """Create or replace a mapping profile and its rules; invalid rules raise ValueError and nothing is stored."""
+    name = (name or '').strip()
+    if not name:
+        raise ValueError('El perfil necesita un nombre')
+    rows = validate_layer_rules(rules)
+    conn = sqlite3.connect(database_path)
+    try:
+        ensure_layer_profiles(conn)
+        conn.execute(
+            "INSERT OR REPLACE INTO layer_mapping_profiles (name, description) VALUES (?, ?)", (name, description)
+        )
+        conn.execute("DELETE FROM layer_mapping_rules WHERE profile = ?", (name,))
+        conn.executemany(
+            "INSERT INTO layer_mapping_rules (profile, target, pattern, is_regex, priority) VALUES (?, ?, ?, ?, ?)",
+            [(name, *row) for row in rows]
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    return {'name': name, 'description': description, 'rules': len(rows)}
+
+
+_resolvers: Dict[Tuple[str, str], Tuple[tuple, LayerResolver]] = {}
+_resolvers_lock = threading.Lock()
+
+
+def get_layer_resolver(database_path: str, profile: Optional[str] = None) -> Optional[LayerResolver]:
+    """Return the compiled resolver of a stored profile, or None if it does not exist.
+
+    A profile's exact names extend (and override) the built-in LAYER_MAPPING;
+    its regex rules are tried by ascending priority. Resolvers are rebuilt only
+    when the profile's rows change.
+    """
+    profile = (profile or DEFAULT_LAYER_PROFILE).strip()
+    conn = sqlite3.connect(database_path)
+    try:
+        exists = conn.execute("SELECT 1 FROM layer_mapping_profiles WHERE name = ?", (profile,)).fetchone()
+        rows = tuple(conn.execute(
+            "SELECT target, pattern, is_regex FROM layer_mapping_rules WHERE profile = ? ORDER BY priority, id",
+            (profile,)
+        ).fetchall())
+    except sqlite3.OperationalError:
+        # Databases created before mapping profiles existed
+        return DEFAULT_LAYER_RESOLVER if profile == DEFAULT_LAYER_PROFILE else None
+    finally:
+        conn.close()
+    if not exists:
+        return DEFAULT_LAYER_RESOLVER if profile == DEFAULT_LAYER_PROFILE else None
+
+    key = (database_path, profile)
+    cached = _resolvers.get(key)
+    if cached is not None and cached[0] == rows:
+        return cached[1]
+
+    mapping = {target: [] for target in TARGET_LAYERS}
+    overridden = set()
+    rules = []
+    for target, pattern, is_regex in rows:
+        if target not in mapping:
+            continue
+        if is_regex:
+            rules.append((pattern, target))
+        else:
+            mapping[target].append(pattern)
+            overridden.add(_layer_key(pattern))
+    for target, names in LAYER_MAPPING.items():
+        for name in names:
+            if _layer_key(name) not in overridden:
+                mapping[target].append(name)
+                overridden.add(_layer_key(name))
+
+    resolver = LayerResolver(mapping, rules, profile=profile)
+    with _resolvers_lock:
+        _resolvers[key] = (rows, resolver)
+    return resolver
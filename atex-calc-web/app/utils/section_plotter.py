@@ -4,6 +4,7 @@ from dataclasses import dataclass
 from typing import Dict, List, Tuple
 
 import matplotlib
+import numpy as np
 
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
@@ -18,28 +19,56 @@ class SectionResult:
     equivalent_solid_height_cm: float
 
 
-def _polygon_inertia(vertices: List[Tuple[float, float]]) -> Tuple[float, float, float]:
-    """Return (Ix centroidal, area, centroid_y)."""
-    area = 0.0
-    ix = 0.0
-    cy = 0.0
-    n = len(vertices)
-    for i in range(n):
-        x0, y0 = vertices[i]
-        x1, y1 = vertices[(i + 1) % n]
-        det = x0 * y1 - x1 * y0
-        area += det
-        cy += (y0 + y1) * det
-        ix += (y0 ** 2 + y0 * y1 + y1 ** 2) * det
-    area *= 0.5
-    if area == 0:
-        return 0.0, 0.0, 0.0
-    cy /= (6.0 * area)
-    ix /= 12.0
-    ix_centroidal = ix - area * (cy ** 2)
+@dataclass
+class SectionProperties:
+    area_cm2: float
+    centroid_y_cm: float
+    inertia_cm4: float
+    value_ratio: float
+    equivalent_solid_height_cm: float
+
+
+@dataclass
+class SectionPropertiesBatch:
+    area_cm2: np.ndarray
+    centroid_y_cm: np.ndarray
+    inertia_cm4: np.ndarray
+    value_ratio: np.ndarray
+    equivalent_solid_height_cm: np.ndarray
+
+
+def _polygon_inertia_batch(vertices: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return (Ix centroidal, area, centroid_y) for an (N, V, 2) array of polygons."""
+    x0 = vertices[:, :, 0]
+    y0 = vertices[:, :, 1]
+    x1 = np.roll(x0, -1, axis=1)
+    y1 = np.roll(y0, -1, axis=1)
+    det = x0 * y1 - x1 * y0
+    area = 0.5 * det.sum(axis=1)
+    ix = ((y0 ** 2 + y0 * y1 + y1 ** 2) * det).sum(axis=1) / 12.0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cy = np.where(area != 0, ((y0 + y1) * det).sum(axis=1) / (6.0 * area), 0.0)
+    ix_centroidal = np.where(area != 0, ix - area * (cy ** 2), 0.0)
     return ix_centroidal, area, cy
 
 
+def _build_vertices_batch(section_type: str, bf: np.ndarray, bs: np.ndarray, bw: np.ndarray, hv: np.ndarray, hf: np.ndarray, he: np.ndarray) -> np.ndarray:
+    section_type = section_type.lower()
+    zeros = np.zeros_like(bf)
+    if section_type == 'maciza':
+        xs = [zeros, bf, bf, zeros]
+        ys = [zeros, zeros, he, he]
+    else:
+        x2 = (bf - bs) / 2.0
+        x3 = x2 + ((bs - bw) / 2.0)
+        x4 = x3 + bw
+        x5 = x4 + ((bs - bw) / 2.0)
+        y3 = hv + hf
+        xs = [zeros, x2, x3, x4, x5, bf, bf, zeros]
+        ys = [hv, hv, zeros, zeros, hv, hv, y3, y3]
+    return np.stack([np.stack(xs, axis=1), np.stack(ys, axis=1)], axis=2)
+
+
 def _build_vertices(section_type: str, bf: float, bs: float, bw: float, hv: float, hf: float, he: float) -> List[Tuple[float, float]]:
     section_type = section_type.lower()
     if section_type == 'maciza':
@@ -101,25 +130,64 @@ def _plot_section(vertices: List[Tuple[float, float]], section_type: str) -> str
     return f"data:image/png;base64,{base64.b64encode(buffer.read()).decode('utf-8')}"
 
 
-def generate_section_plot(section_type: str, bf: float, bs: float, bw: float, hv: float, hf: float, he: float) -> SectionResult:
-    vertices = _build_vertices(section_type, bf, bs, bw, hv, hf, he)
-    ix_centroidal, area, _ = _polygon_inertia(vertices)
+def compute_section_properties_batch(section_type: str, bf, bs, bw, hv, hf, he=None) -> SectionPropertiesBatch:
+    """Compute section properties for many sections of the same type in one NumPy pass.
+
+    Dimensions are broadcast against each other; ``he`` defaults to ``hv + hf``.
+    """
+    bf, bs, bw, hv, hf = np.broadcast_arrays(*(np.atleast_1d(np.asarray(v, dtype=float)) for v in (bf, bs, bw, hv, hf)))
+    he = hv + hf if he is None else np.broadcast_to(np.asarray(he, dtype=float), bf.shape)
+
+    vertices = _build_vertices_batch(section_type, bf, bs, bw, hv, hf, he)
+    ix_centroidal, area, centroid_y = _polygon_inertia_batch(vertices)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if section_type.lower() == 'maciza':
+            # Simple rectangle inertia (about base) then convert to centroidal already handled
+            inertia_cm4 = bf * (he ** 3) / 12.0
+            equivalent_height = np.array(he, dtype=float)
+        else:
+            inertia_cm4 = ix_centroidal
+            equivalent_height = np.where(
+                (bf != 0) & (inertia_cm4 > 0),
+                np.cbrt(inertia_cm4 * 12 / bf),
+                0.0,
+            )
+        value_ratio = np.where(inertia_cm4 != 0, bf / inertia_cm4 * 1000, 0.0)
+
+    return SectionPropertiesBatch(
+        area_cm2=area,
+        centroid_y_cm=centroid_y,
+        inertia_cm4=inertia_cm4,
+        value_ratio=value_ratio,
+        equivalent_solid_height_cm=equivalent_height,
+    )
+
+
+def compute_section_properties(section_type: str, bf: float, bs: float, bw: float, hv: float, hf: float, he: float) -> SectionProperties:
+    """Return the section properties analytically, without rendering any image."""
+    batch = compute_section_properties_batch(section_type, bf, bs, bw, hv, hf, he)
+    return SectionProperties(
+        area_cm2=float(batch.area_cm2[0]),
+        centroid_y_cm=float(batch.centroid_y_cm[0]),
+        inertia_cm4=float(batch.inertia_cm4[0]),
+        value_ratio=float(batch.value_ratio[0]),
+        equivalent_solid_height_cm=float(batch.equivalent_solid_height_cm[0]),
+    )
 
-    if section_type.lower() == 'maciza':
-        # Simple rectangle inertia (about base) then convert to centroidal already handled
-        inertia_cm4 = bf * (he ** 3) / 12.0
-        value_ratio = bf / inertia_cm4 * 1000 if inertia_cm4 else 0.0
-        equivalent_height = he
-    else:
-        inertia_cm4 = ix_centroidal
-        value_ratio = bf / inertia_cm4 * 1000 if inertia_cm4 else 0.0
-        equivalent_height = (inertia_cm4 * 12 / bf) ** (1 / 3) if bf and inertia_cm4 > 0 else 0.0
 
+def generate_section_plot(section_type: str, bf: float, bs: float, bw: float, hv: float, hf: float, he: float) -> SectionResult:
+    """Compute the section properties and render the section as a PNG.
+
+    Callers that only need the metrics should use ``compute_section_properties``.
+    """
+    properties = compute_section_properties(section_type, bf, bs, bw, hv, hf, he)
+    vertices = _build_vertices(section_type, bf, bs, bw, hv, hf, he)
     image = _plot_section(vertices, section_type)
     return SectionResult(
         image_base64=image,
-        inertia_cm4=inertia_cm4,
-        area_cm2=area,
-        value_ratio=value_ratio,
-        equivalent_solid_height_cm=equivalent_height,
+        inertia_cm4=properties.inertia_cm4,
+        area_cm2=properties.area_cm2,
+        value_ratio=properties.value_ratio,
+        equivalent_solid_height_cm=properties.equivalent_solid_height_cm,
     )
@@ -0,0 +1,145 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple
+
+import numpy as np
+import shapely
+
+from app.utils.area_engine import SLAB_AREA_KEYS, exact_slab_areas
+from app.utils.caseton_validation import AREA_TOLERANCE, MAX_REPORTED_ISSUES, validate_casetones
+
+logger = logging.getLogger(__name__)
+
+# Slabs are computed on several threads (shapely releases the GIL) once the file has this many casetones
+PARALLEL_MIN_CASETONES = 2000
+MAX_SLAB_THREADS = 4
+
+# Layers split between the superficieTotal outlines
+SLAB_LAYERS = ('superficieVacios', 'superficieMacizos', 'superficieCasetones')
+
+
+class SlabResults(NamedTuple):
+    """All slabs of one file: kept casetones and aggregates, plus one entry per outline."""
+    casetones: np.ndarray     # validated casetones of every slab, slab by slab
+    validation: Dict          # merged caseton validation report, ids into the input casetones
+    areas: Dict[str, float]   # exact areas summed over the slabs
+    slabs: List[Dict]         # per-slab areas, caseton totals and validation summary
+    warnings: List[str]
+
+
+def assign_to_outlines(polygons: np.ndarray, outlines: np.ndarray, tree: shapely.STRtree) -> np.ndarray:
+    """Index of the outline each polygon belongs to.
+
+    A polygon belongs to the smallest outline containing a point on its
+    surface; polygons outside every outline go to the nearest one (and are
+    then clipped or reported by the caseton validation).
+    """
+    owner = np.full(len(polygons), -1, dtype=np.intp)
+    if not len(polygons):
+        return owner
+    points = shapely.point_on_surface(polygons)
+    inside, outline = tree.query(points, predicate='within')
+    order = np.argsort(shapely.area(outlines)[outline], kind='stable')
+    members, first = np.unique(inside[order], return_index=True)
+    owner[members] = outline[order][first]
+
+    missing = np.flatnonzero(owner < 0)
+    if len(missing):
+        nearest, outline = tree.query_nearest(points[missing])
+        members, first = np.unique(nearest, return_index=True)
+        owner[missing[members]] = outline[first]
+    return owner
+
+
+def _compute_slab(outline, vacios: np.ndarray, macizos: np.ndarray, casetones: np.ndarray):
+    total = np.array([outline], dtype=object)
+    kept, report = validate_casetones(casetones, total, vacios, macizos)
+    areas = exact_slab_areas(total, vacios, macizos, kept,
+                             casetones_disjoint=report['resumen']['superpuestos'] == 0)
+    return kept, report, areas
+
+
+def _merge_reports(reports: List[Dict], caseton_indices: List[np.ndarray]) -> Dict:
+    summary: Dict = {}
+    issues = []
+    for slab, (report, indices) in enumerate(zip(reports, caseton_indices)):
+        for key, value in report['resumen'].items():
+            summary[key] = summary.get(key, 0) + value
+        for issue in report['incidencias']:
+            issue = dict(issue, losa=slab)
+            for key in ('id', 'con', 'duplicadoDe'):
+                if key in issue:
+                    issue[key] = int(indices[issue[key]])
+            issues.append(issue)
+    issues.sort(key=lambda issue: issue['id'])
+    return {
+        'resumen': summary,
+        'incidencias': issues[:MAX_REPORTED_ISSUES],
+        'truncado': len(issues) > MAX_REPORTED_ISSUES or any(report['truncado'] for report in reports),
+    }
+
+
+def compute_slabs(layers: Dict[str, np.ndarray]) -> SlabResults:
+    """Treat every superficieTotal outline as its own slab and compute them independently.
+
+    Vacíos, macizos and casetones are assigned to outlines through an STRtree
+    of the outlines. Each slab's casetones are validated and its exact areas
+    computed on its own, in parallel threads for large files.
+    """
+    outlines = layers['superficieTotal']
+    casetones = layers['superficieCasetones']
+    if not len(outlines):
+        _, report = validate_casetones(casetones, outlines, layers['superficieVacios'], layers['superficieMacizos'])
+        return SlabResults(casetones, report, {key: 0.0 for key in SLAB_AREA_KEYS}, [], [])
+
+    warnings = []
+    tree = shapely.STRtree(outlines)
+    left, right = tree.query(outlines, predicate='intersects')
+    keep = left < right
+    overlap = shapely.area(shapely.intersection(outlines[left[keep]], outlines[right[keep]]))
+    if (overlap > AREA_TOLERANCE).any():
+        warnings.append(
+            f"Hay {int((overlap > AREA_TOLERANCE).sum())} pares de contornos de superficieTotal superpuestos; "
+            "el área común se cuenta en cada losa"
+        )
+
+    owners = {name: assign_to_outlines(layers[name], outlines, tree) for name in SLAB_LAYERS}
+    members = {name: [np.flatnonzero(owner == slab) for slab in range(len(outlines))] for name, owner in owners.items()}
+    inputs = [
+        (outlines[slab], layers['superficieVacios'][members['superficieVacios'][slab]],
+         layers['superficieMacizos'][members['superficieMacizos'][slab]],
+         casetones[members['superficieCasetones'][slab]])
+        for slab in range(len(outlines))
+    ]
+
+    threads = min(len(outlines), MAX_SLAB_THREADS, os.cpu_count() or 1)
+    if threads > 1 and len(casetones) >= PARALLEL_MIN_CASETONES:
+        logger.info(f"Computing {len(outlines)} slabs on {threads} threads")
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            results = list(executor.map(lambda args: _compute_slab(*args), inputs))
+    else:
+        results = [_compute_slab(*args) for args in inputs]
+
+    slabs = []
+    for slab, ((outline, vacios, macizos, _), (kept, report, areas)) in enumerate(zip(inputs, results)):
+        areas_vacios = shapely.area(vacios).tolist()
+        areas_macizos = shapely.area(macizos).tolist()
+        slabs.append({
+            "id": slab,
+            "superficieTotal": float(shapely.area(outline)),
+            "superficieVacios": {"individuales": areas_vacios, "total": sum(areas_vacios)},
+            "superficieMacizos": {"individuales": areas_macizos, "total": sum(areas_macizos)},
+            "losa": areas,
+            "casetones": {"cantidad": len(kept), "area_total": float(shapely.area(kept).sum())},
+            "validacionCasetones": report['resumen'],
+        })
+
+    kept = [result[0] for result in results]
+    return SlabResults(
+        casetones=np.concatenate(kept) if kept else casetones[:0],
+        validation=_merge_reports([result[1] for result in results], members['superficieCasetones']),
+        areas={key: sum(result[2][key] for result in results) for key in SLAB_AREA_KEYS},
+        slabs=slabs,
+        warnings=warnings,
+    )
@@ -0,0 +1,29 @@
+import ezdxf
+
+# Slab drawn with block references, including a title block whose nested INSERT carries attributes
+doc = ezdxf.new('R2010')
+msp = doc.modelspace()
+
+msp.add_lwpolyline([(0, 0), (10, 0), (10, 8), (0, 8)], close=True, dxfattribs={'layer': 'superficieTotal'})
+
+# Caseton block placed on a grid
+caseton = doc.blocks.new('CASETON')
+caseton.add_lwpolyline([(0, 0), (2, 0), (2, 2), (0, 2)], close=True, dxfattribs={'layer': '0'})
+for x in (1, 4, 7):
+    for y in (1, 4):
+        msp.add_blockref('CASETON', (x, y), dxfattribs={'layer': 'superficieCasetones'})
+
+# Title block: a nested, attributed INSERT followed by more geometry, on unmapped layers
+label = doc.blocks.new('ROTULO')
+label.add_attdef('PLANO', (0, 0), dxfattribs={'height': 0.2})
+label.add_lwpolyline([(0, 0), (3, 0), (3, 1), (0, 1)], close=True)
+
+title = doc.blocks.new('CAJETIN')
+nested = title.add_blockref('ROTULO', (0, 0), dxfattribs={'layer': 'rotulo'})
+nested.add_attrib('PLANO', 'Losa piso 1', (0, 0))
+title.add_lwpolyline([(0, 0), (4, 0), (4, 2), (0, 2)], close=True, dxfattribs={'layer': 'rotulo'})
+title.add_circle((2, 1), 0.5, dxfattribs={'layer': 'rotulo'})
+msp.add_blockref('CAJETIN', (12, 0), dxfattribs={'layer': 'rotulo'})
+
+doc.saveas('test_bloques.dxf')
+print("Test DXF file created: test_bloques.dxf")
@@ -80,11 +80,34 @@ Restart=always
 WantedBy=multi-user.target
 EOF
 
+# Create job worker service (DXF processing and PDF generation run outside gunicorn)
+cat > "/etc/systemd/system/$SERVICE_NAME-worker@.service" << EOF
+[Unit]
+Description=Atex Calculator job worker %i
+After=network.target
+
+[Service]
+User=ubuntu
+Group=ubuntu
+WorkingDirectory=$APP_DIR
+Environment="PATH=$VENV_DIR/bin"
+ExecStart=$VENV_DIR/bin/python worker.py
+Restart=always
+TimeoutStopSec=150
+
+[Install]
+WantedBy=multi-user.target
+EOF
+
 # Reload systemd and start service
 echo "Starting application service..."
 systemctl daemon-reload
 systemctl enable "$SERVICE_NAME"
 systemctl restart "$SERVICE_NAME"
+for i in 1 2; do
+    systemctl enable "$SERVICE_NAME-worker@$i"
+    systemctl restart "$SERVICE_NAME-worker@$i"
+done
 
 # Create nginx configuration
 echo "Configuring Nginx..."
@@ -93,6 +116,9 @@ server {
     listen 80;
     server_name $DOMAIN;
 
+    # DXF uploads (compressed or not) up to the app's MAX_UPLOAD_MB
+    client_max_body_size 50M;
+
     # Serve static files directly
     location /static {
         alias $APP_DIR/app/static;
@@ -145,6 +171,7 @@ echo "Your application should be available at: http://$DOMAIN"
 echo ""
 echo "Useful commands:"
 echo "  - Check logs: sudo journalctl -u $SERVICE_NAME -f"
+echo "  - Check worker logs: sudo journalctl -u '$SERVICE_NAME-worker@*' -f"
 echo "  - Restart service: sudo systemctl restart $SERVICE_NAME"
 echo "  - Check status: sudo systemctl status $SERVICE_NAME"
 echo "  - View nginx logs: sudo tail -f /var/log/nginx/error.log"
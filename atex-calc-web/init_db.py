@@ -2,6 +2,10 @@ import sqlite3
 import json
 import os
 
+from app.utils.caseton_catalog import ensure_catalog_version
+from app.utils.homologation import refresh_caseton_sections
+from app.utils.layer_mapping import ensure_layer_profiles
+
 # Get the absolute path of the directory where this file is located
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATABASE_PATH = os.path.join(BASE_DIR, 'database', 'atex_calculations.db')
@@ -73,6 +77,9 @@ def init_database():
     existing_columns = [row[1] for row in cursor.fetchall()]
     if 'system' not in existing_columns:
         cursor.execute("ALTER TABLE casetones ADD COLUMN system TEXT DEFAULT 'bidireccional'")
+
+    # Version row bumped by triggers so running workers reload their catalog snapshot
+    ensure_catalog_version(conn)
     
     # Reset casetones data with canonical list
     cursor.execute("DELETE FROM casetones")
@@ -112,7 +119,44 @@ def init_database():
         "INSERT OR IGNORE INTO casetones (name, side1, side2, height, bw, bs, system, consumption, rental_price) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
         casetones
     )
+
+    # Casetones available by default in each country (others can be enabled manually in the UI)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS country_casetones (
+            country TEXT NOT NULL,
+            caseton_name TEXT NOT NULL,
+            PRIMARY KEY (country, caseton_name)
+        )
+    """)
+    ensure_catalog_version(conn)
+    cursor.execute("DELETE FROM country_casetones")
+
+    country_casetones = [
+        ('Paraguay', ['610x210', '610x260', '610x300', '660x180', '660x210', '660x260', '660x300', '755Ux200', '755Ux250', '755Ux300', '755Ux350', '755Ux400']),
+        ('Brasil', ['610x210', '610x260', '610x300', '755Ux200', '755Ux250', '755Ux300', '755Ux350', '755Ux400']),
+        ('Colombia', ['800x200', '800x250', '800x300', '800x350', '800x400', '755Ux200', '755Ux250', '755Ux300', '755Ux350', '755Ux400']),
+        ('Panamá', ['610x210', '610x260', '610x300', '700x260', '755Ux200', '755Ux250', '755Ux300', '755Ux350', '755Ux400']),
+        ('República Dominicana', ['610x210', '610x260', '610x300', '755Ux200', '755Ux250', '755Ux300', '755Ux350', '755Ux400']),
+        ('México', ['610x210', '610x260', '610x300', '660x180', '660x210', '660x260', '660x300', '700x260', '610Ux210', '610Ux260', '610Ux300', '655Ux180', '655Ux210', '655Ux260', '655Ux300', '755Ux200', '755Ux250', '755Ux300', '755Ux350', '755Ux400']),
+        ('Perú', ['610x210', '610x260', '610x300', '660x180', '660x210', '660x260', '660x300', '700x260', '800x200', '800x250', '610Ux210', '610Ux260', '610Ux300', '655Ux180', '655Ux210', '655Ux260', '655Ux300']),
+        ('Chile', ['610x210', '610x260', '610x300', '660x180', '660x210', '660x260', '660x300', '800x200', '800x250', '800x300', '610Ux210', '610Ux260', '610Ux300', '655Ux180', '655Ux210', '655Ux260', '655Ux300']),
+        ('Ecuador', ['610x210', '610x260', '610x300', '700x260', '610Ux210', '610Ux260', '610Ux300', '755Ux200', '755Ux250', '755Ux300']),
+        ('Argentina', ['610x210', '610x260', '610x300', '660x180', '660x210', '660x260', '660x300', '800x200', '800x250', '800x300', '800x350', '610Ux210', '610Ux260', '610Ux300', '655Ux180', '655Ux210', '655Ux260', '655Ux300', '755Ux200', '755Ux250', '755Ux300']),
+        ('España', ['610x210', '610x260', '610x300', '660x180', '660x210', '660x260', '660x300', '700x260', '800x200', '800x250', '800x300', '800x350', '800x400', '610Ux210', '610Ux260', '610Ux300', '655Ux180', '655Ux210', '655Ux260', '655Ux300', '755Ux200', '755Ux250', '755Ux300', '755Ux350', '755Ux400']),
+        ('Estados Unidos', ['610x210', '610x260', '610x300', '660x180', '660x210', '660x260', '660x300', '700x260', '800x200', '800x250', '800x300', '800x350', '800x400', '610Ux210', '610Ux260', '610Ux300', '655Ux180', '655Ux210', '655Ux260', '655Ux300', '755Ux200', '755Ux250', '755Ux300', '755Ux350', '755Ux400']),
+    ]
+
+    cursor.executemany(
+        "INSERT OR IGNORE INTO country_casetones (country, caseton_name) VALUES (?, ?)",
+        [(country, name) for country, names in country_casetones for name in names]
+    )
+
+    # Precompute section metrics for the homologation lookup
+    refresh_caseton_sections(conn, full=True)
     
+    # Layer mapping profiles for DXF uploads (custom profiles are kept between runs)
+    ensure_layer_profiles(conn)
+
     # Create calculations table for saved calculations
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS calculations (
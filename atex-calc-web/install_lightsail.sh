@@ -10,11 +10,13 @@ APP_DIR=${APP_DIR:-/var/www/atex-calc-web}
 SERVICE_NAME=${SERVICE_NAME:-atex-calc}
 DOMAIN_NAME=${DOMAIN_NAME:-_}
 GUNICORN_WORKERS=${GUNICORN_WORKERS:-3}
+JOB_WORKERS=${JOB_WORKERS:-2}
 PYTHON_BIN=${PYTHON_BIN:-python3}
 APP_USER=${APP_USER:-ubuntu}
 SCRIPT_SRC_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 VENV_DIR="$APP_DIR/venv"
 SYSTEMD_UNIT="/etc/systemd/system/${SERVICE_NAME}.service"
+WORKER_UNIT="/etc/systemd/system/${SERVICE_NAME}-worker@.service"
 
 require_root() {
     if [[ $EUID -ne 0 ]]; then
@@ -111,6 +113,32 @@ EOF
     systemctl restart "$SERVICE_NAME"
 }
 
+create_worker_service() {
+    echo "Creando $JOB_WORKERS workers de la cola de trabajos (${SERVICE_NAME}-worker@)..."
+    cat >"$WORKER_UNIT" <<EOF
+[Unit]
+Description=Atex Calculator job worker %i
+After=network.target
+
+[Service]
+User=$APP_USER
+Group=www-data
+WorkingDirectory=$APP_DIR
+Environment="PATH=$VENV_DIR/bin"
+ExecStart=$VENV_DIR/bin/python worker.py
+Restart=always
+TimeoutStopSec=150
+
+[Install]
+WantedBy=multi-user.target
+EOF
+    systemctl daemon-reload
+    for i in $(seq 1 "$JOB_WORKERS"); do
+        systemctl enable "${SERVICE_NAME}-worker@$i"
+        systemctl restart "${SERVICE_NAME}-worker@$i"
+    done
+}
+
 configure_nginx() {
     echo "Configurando Nginx..."
     local nginx_conf
@@ -173,6 +201,7 @@ main() {
     setup_virtualenv
     initialize_database
     create_systemd_service
+    create_worker_service
     configure_nginx
 
     cat <<INFO
@@ -181,6 +210,7 @@ Instalación completada.
 
 - Código desplegado en: $APP_DIR
 - Servicio systemd: $SERVICE_NAME (systemctl status $SERVICE_NAME)
+- Workers de la cola: ${SERVICE_NAME}-worker@1..$JOB_WORKERS (systemctl status '${SERVICE_NAME}-worker@*')
 - Gunicorn running on: 127.0.0.1:8000
 - Configuración Nginx: ver archivo generado en /etc/nginx/
 
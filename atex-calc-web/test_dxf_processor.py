@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
+import os
 import sys
 sys.path.append('/Users/robinklaiss/Dev/atex-calc-new/atex-calc-web')
 
 from app.utils.dxf_processor import process_dxf_file
+from app.utils.caseton_instances import caseton_totals
 import json
 
 # Test the DXF processor
@@ -10,10 +12,43 @@ try:
     result = process_dxf_file('/Users/robinklaiss/Dev/atex-calc-new/atex-calc-web/test_losa.dxf')
     print("DXF processing successful!")
     print(f"Total area: {result['areas']['superficieTotal']:.2f} m²")
-    print(f"Number of casetones: {len(result['casetones'])}")
+    print(f"Number of casetones: {caseton_totals(result)[0]}")
     print(f"Errors: {result['errores']}")
     if 'debug_info' in result:
         print(f"Entity counts: {result['debug_info']['entity_counts']}")
         print(f"Layers found: {result['debug_info']['layers_found']}")
 except Exception as e:
     print(f"Error: {str(e)}")
+
+# Block references: a title block with an attributed nested INSERT (test_bloques.dxf,
+# from create_test_blocks_dxf.py) must read the same streamed as fully loaded
+blocks_dxf = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test_bloques.dxf')
+try:
+    streamed = process_dxf_file(blocks_dxf)
+    loaded = process_dxf_file(blocks_dxf, streaming=False)
+    assert caseton_totals(streamed) == caseton_totals(loaded) == (6, 24.0), (caseton_totals(streamed), caseton_totals(loaded))
+    print(f"Block DXF processing successful! Casetones: {caseton_totals(streamed)[0]}")
+except Exception as e:
+    print(f"Error: {str(e)}")
+
+# Circles are tessellated relative to their radius: a 30 cm circle must not get more
+# vertices than the old fixed 32-vertex polygon whether the plan is drawn in m, cm or mm
+try:
+    import io
+    import ezdxf
+
+    for unit, scale in (('m', 1.0), ('cm', 100.0), ('mm', 1000.0)):
+        doc = ezdxf.new('R2010')
+        msp = doc.modelspace()
+        msp.add_lwpolyline([(0, 0), (scale, 0), (scale, scale), (0, scale)], close=True,
+                           dxfattribs={'layer': 'superficieTotal'})
+        msp.add_circle((0.5 * scale, 0.5 * scale), 0.15 * scale, dxfattribs={'layer': 'superficieCasetones'})
+        buffer = io.StringIO()
+        doc.write(buffer)
+        result = process_dxf_file(buffer.getvalue().encode('utf-8'))
+        prototype = result['geometria']['casetonesInstanciados']['prototipos'][0]
+        vertices = len(prototype['coordenadas']) - 1
+        assert vertices <= 32, (unit, vertices)
+        print(f"Circle drawn in {unit}: {vertices} vertices")
+except Exception as e:
+    print(f"Error: {str(e)}")
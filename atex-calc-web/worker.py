@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Background worker for queued DXF processing and PDF generation.
+
+Run one or more of these next to the web app (or on other nodes that share
+the database/ and uploads/ directories):
+
+    python worker.py                 # serves dxf and pdf jobs
+    python worker.py --kinds pdf     # only PDF jobs
+"""
+import argparse
+import logging
+import os
+import signal
+import threading
+
+from app.utils.job_queue import JobQueue, JobFailed, run_worker, DEFAULT_LEASE_SECONDS, DEFAULT_RESULT_TTL
+from app.utils.dxf_pool import DxfProcessPool, DxfPoolBusy, DxfTaskError, process_upload
+from app.utils.dxf_cache import DxfResultCache, DEFAULT_CACHE_MAX_BYTES
+from app.utils.dxf_batch import batch_job_result
+from app.utils.layer_mapping import get_layer_resolver
+from app.utils.pdf_generator import generate_pdf_report
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATABASE_PATH = os.path.join(BASE_DIR, 'database', 'atex_calculations.db')
+JOB_DATABASE_PATH = os.getenv('JOB_DATABASE', os.path.join(BASE_DIR, 'database', 'jobs.db'))
+UPLOAD_FOLDER = os.path.join(BASE_DIR, 'uploads')
+
+
+def build_handlers():
+    # Outside the web request cycle the limits can be looser than gunicorn's timeout
+    dxf_pool = DxfProcessPool(
+        size=int(os.getenv('DXF_POOL_SIZE', '1')),
+        max_tasks=int(os.getenv('DXF_POOL_MAX_TASKS', '50')),
+        timeout=float(os.getenv('DXF_TASK_TIMEOUT', '120')),
+        cpu_seconds=int(os.getenv('DXF_TASK_CPU_SECONDS', '100')),
+        memory_mb=int(os.getenv('DXF_WORKER_MEMORY_MB', '1024'))
+    )
+    dxf_result_cache = DxfResultCache(
+        os.path.join(UPLOAD_FOLDER, 'dxf-cache'),
+        max_bytes=int(os.getenv('DXF_CACHE_MAX_BYTES', DEFAULT_CACHE_MAX_BYTES))
+    )
+    pdf_folder = os.path.join(UPLOAD_FOLDER, 'pdf')
+    os.makedirs(pdf_folder, exist_ok=True)
+
+    def handle_dxf(payload):
+        result_payload = process_dxf(payload)
+        return batch_job_result(result_payload) if payload.get('batch') else result_payload
+
+    def process_dxf(payload):
+        # Batches queue every file; one processed before (another batch, an earlier attempt) is not redone
+        cached_payload = dxf_result_cache.get(payload['cache_key'])
+        if cached_payload is not None:
+            return cached_payload
+        layer_resolver = get_layer_resolver(DATABASE_PATH, payload.get('layer_profile'))
+        if layer_resolver is None:
+            raise JobFailed(f"Unknown layer mapping profile: {payload.get('layer_profile')}")
+        try:
+            result = dxf_pool.run(
+                process_upload, payload['filepath'],
+                repair_invalid=payload.get('repair_invalid', False), layer_resolver=layer_resolver
+            )
+        except DxfPoolBusy:
+            raise
+        except DxfTaskError as e:
+            # Limits and processing errors are properties of the file, retrying will not help
+            raise JobFailed(str(e))
+        return dxf_result_cache.put(payload['cache_key'], result)
+
+    def handle_pdf(payload):
+        pdf_path = generate_pdf_report(
+            results=payload.get('results', {}),
+            project_data=payload.get('project_data', {}),
+            output_dir=pdf_folder
+        )
+        return {'file': pdf_path, 'download_name': payload.get('download_name') or 'informe.pdf'}
+
+    return {'dxf': handle_dxf, 'pdf': handle_pdf}, dxf_pool
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Atex background job worker')
+    parser.add_argument('--kinds', default='dxf,pdf', help='comma-separated job kinds to serve')
+    parser.add_argument('--poll-interval', type=float, default=float(os.getenv('JOB_POLL_INTERVAL', '0.5')))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    job_queue = JobQueue(
+        JOB_DATABASE_PATH,
+        lease_seconds=float(os.getenv('JOB_LEASE_SECONDS', DEFAULT_LEASE_SECONDS)),
+        result_ttl=float(os.getenv('JOB_RESULT_TTL', DEFAULT_RESULT_TTL))
+    )
+    handlers, dxf_pool = build_handlers()
+    kinds = [kind.strip() for kind in args.kinds.split(',') if kind.strip()]
+    unknown = [kind for kind in kinds if kind not in handlers]
+    if unknown:
+        parser.error(f"unknown job kinds: {', '.join(unknown)}")
+
+    stop = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: stop.set())
+    try:
+        run_worker(
+            job_queue, {kind: handlers[kind] for kind in kinds},
+            poll_interval=args.poll_interval, stop=stop
+        )
+    finally:
+        dxf_pool.shutdown()
+
+
+if __name__ == '__main__':
+    main()